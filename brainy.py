@@ -1,20 +1,23 @@
 import logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",handlers=[
-            logging.FileHandler("/home/pi/estevan/log/esteban.log"),
-            logging.StreamHandler()  # Optional: log to console
-            ])
-import threading
+import asyncio
 import redis
+from eventbus import EventBus
+from service_client import ServiceClient
+from motor_channel import MotorChannelClient
+from brainy_utility.engine import BehaviourEngine
 from brainy_utility.ok_behaviour import OKBehaviour  # Import from brainy_utility
 from brainy_utility.open_palm_behaviour import OpenPalmBehaviour
+from brainy_utility.centering import CenteringController
 
 class Brainy:
     def __init__(self, settings):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.settings = settings["Brainy"]
         self.queue_settings = settings["queue"]
-        self.camerabot_port = settings["CameraBot"]["fastapi_port"]
-        self.dummy_api_port = settings["Dummy"]["api_port"]
+        # Pooled clients shared by every behaviour
+        self.camerabot = ServiceClient.for_service(settings, "CameraBot")
+        self.dummy = ServiceClient.for_service(settings, "Dummy")
+        self.motors = MotorChannelClient(settings["Dummy"]["motor_socket"])
 
         
         # Initialize Redis connection
@@ -26,27 +29,40 @@ class Brainy:
         
         # Initialize behaviours
         self.behaviours = [
-            OKBehaviour(self.redis_conn, self.camerabot_port,  self.dummy_api_port,cooldown=self.settings.get("ok_cooldown", 5)),
-            OpenPalmBehaviour(self.redis_conn, self.dummy_api_port, cooldown=self.settings.get("open_palm_cooldown", 5))
+            OKBehaviour(self.redis_conn, self.camerabot, self.dummy, cooldown=self.settings.get("ok_cooldown", 5),
+                        capture_mode=self.settings.get("ok_capture_mode", "precapture"),
+                        precapture_before=self.settings.get("ok_precapture_before", 0.0),
+                        precapture_after=self.settings.get("ok_precapture_after", 0.0)),
+            OpenPalmBehaviour(self.redis_conn, self.motors, CenteringController.from_settings(self.settings),
+                              cooldown=self.settings.get("open_palm_cooldown", 5),
+                              home=self.settings.get("home_position", (90.0, 90.0)))
 
         ]
+        self.bus = EventBus.from_settings(self.redis_conn, self.queue_settings)
+        self.engine = BehaviourEngine(self.bus, self.behaviours)
         self.logger.info("Brainy initialized with behaviours.")
 
-    def start_behaviour_threads(self):
-        threads = []
-        for behaviour in self.behaviours:
-            thread = threading.Thread(target=behaviour.action, daemon=True)
-            thread.start()
-            threads.append(thread)
-            self.logger.info("%s behaviour started in a new thread.", behaviour.__class__.__name__)
-        return threads
+    async def main(self):
+        heartbeat = asyncio.create_task(self.heartbeat())
+        try:
+            await self.engine.run()
+        finally:
+            heartbeat.cancel()
+
+    async def heartbeat(self):
+        # Brainy serves no HTTP, Esteban checks this key to know its event loop is alive
+        interval = self.settings.get("heartbeat_interval", 1.0)
+        while True:
+            try:
+                self.redis_conn.set(self.settings["heartbeat_key"], 1, px=int(interval * 3000))
+            except Exception as e:
+                self.logger.error("Error refreshing heartbeat: %s", e)
+            await asyncio.sleep(interval)
 
     def run(self):
         try:
             self.logger.info("Starting Brainy service.")
-            threads = self.start_behaviour_threads()
-            for thread in threads:
-                thread.join()  # Wait for each thread to complete
+            asyncio.run(self.main())
             self.logger.info("Brainy service completed all behaviours.")
         except Exception as e:
             self.logger.error("Error running Brainy service: %s", e)
@@ -1,25 +1,41 @@
 # behaviour.py
 import abc
+import asyncio
 import time
 import logging
+from eventbus import GestureEvent, HandPositionEvent, HandsEvent, gesture_code
+from brainy_utility.gesture_chain import ChainEvent
 
 class Behaviour(abc.ABC):
+    priority = 0  # Reactions of a higher priority behaviour pre-empt lower ones
+    chains = ()  # Gesture chains this behaviour reacts to, reaction() then gets their ChainEvent
+
     def __init__(self, redis_conn, cooldown=5):
         self.redis_conn = redis_conn
         self.cooldown = cooldown
         self.last_triggered = 0
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.gesture = None
+        self.hand_position = None
+        self.hands = None  # Latest HandsEvent, every hand in the frame
+        self.position_updated = asyncio.Event()
 
     @abc.abstractmethod
-    def action(self):
+    def action(self, event):
         """Define the condition to listen for specific events."""
         pass
 
     @abc.abstractmethod
-    def reaction(self):
+    async def reaction(self, event):
         """Define the response to an event."""
         pass
 
+    def wants(self, event):
+        """Whether this behaviour reacts to a gesture or chain completed event."""
+        if isinstance(event, ChainEvent):
+            return any(chain.name == event.chain for chain in self.chains)
+        return self.action(event)
+
     def check_cooldown(self):
         """Check if cooldown period has passed since the last trigger."""
         current_time = time.time()
@@ -27,3 +43,29 @@ class Behaviour(abc.ABC):
             self.last_triggered = current_time
             return True
         return False
+
+    def observe(self, event):
+        """Keep track of the latest gesture and hand position seen on the bus."""
+        if isinstance(event, GestureEvent):
+            self.gesture = event.gesture
+        elif isinstance(event, HandPositionEvent):
+            self.hand_position = event
+            self.position_updated.set()
+        elif isinstance(event, HandsEvent):
+            self.hands = event
+
+    def hands_with_gesture(self, gesture):
+        """Rows of the latest hands record making the given gesture, most confident first."""
+        if self.hands is None:
+            return []
+        hands = self.hands.hands[self.hands.hands["gesture"] == gesture_code(gesture)]
+        return sorted(hands, key=lambda hand: hand["score"], reverse=True)
+
+    async def next_hand_position(self, timeout):
+        """Latest hand position not returned yet, waiting for one up to timeout, None if none arrives."""
+        try:
+            await asyncio.wait_for(self.position_updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.position_updated.clear()
+        return self.hand_position
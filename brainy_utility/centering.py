@@ -0,0 +1,122 @@
+# brainy_utility/centering.py
+import logging
+import math
+from brainy_utility.pid import PID
+
+class CenteringMetrics:
+    """Time-to-center and overshoot of one tracking run, measured on frame timestamps."""
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        self.start_ns = None
+        self.centered_ns = None
+        self.initial_sign = [0, 0]
+        self.overshoot = [0.0, 0.0]
+        self.samples = 0
+
+    def record(self, timestamp_ns, errors):
+        if self.start_ns is None:
+            self.start_ns = timestamp_ns
+            self.initial_sign = [int(math.copysign(1, error)) if abs(error) > self.tolerance else 0 for error in errors]
+        self.samples += 1
+        if self.centered_ns is None and all(abs(error) <= self.tolerance for error in errors):
+            self.centered_ns = timestamp_ns
+        for axis, error in enumerate(errors):
+            # Overshoot is error past the center, on the opposite side of where the hand started
+            if self.initial_sign[axis] and error * self.initial_sign[axis] < 0:
+                self.overshoot[axis] = max(self.overshoot[axis], abs(error))
+
+    def summary(self):
+        return {
+            "samples": self.samples,
+            "time_to_center": (self.centered_ns - self.start_ns) / 1e9 if self.centered_ns is not None else None,
+            "overshoot_pan": self.overshoot[0],
+            "overshoot_tilt": self.overshoot[1],
+        }
+
+
+class CenteringController:
+    """Turns hand positions into pan/tilt corrections that bring the hand to the frame center.
+
+    Errors are converted to degrees through the camera field of view. Moves commanded after a
+    frame was captured are not visible in it yet, so they are subtracted from its error before
+    the PID sees it, which keeps the pipeline latency from turning into overshoot. Positions
+    Palmist predicted between frames are used the same way, against the frame they extrapolate.
+    """
+
+    def __init__(self, pan_pid, tilt_pid, fov=(66.0, 41.0), center_tolerance=2.0, max_age=1.0):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.pids = (pan_pid, tilt_pid)
+        self.fov = fov
+        self.max_age_ns = int(max_age * 1e9)  # Positions older than this are not worth acting on
+        self.metrics = CenteringMetrics(center_tolerance)
+        self.commands = []  # (sensor timestamp ns, pan degrees, tilt degrees) commanded so far
+        self.last_frame_id = None
+        self.last_frame_ns = 0  # Capture time of the last measured frame
+        self.last_predicted_ns = 0
+        self.latency_total = 0.0
+        self.latency_count = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        options = dict(deadband=settings.get("pid_deadband", 1.0),
+                       output_limit=settings.get("pid_output_limit", 15.0),
+                       integral_limit=settings.get("pid_integral_limit", 10.0))
+        return cls(PID.from_settings(settings.get("pid_pan", {}), **options),
+                   PID.from_settings(settings.get("pid_tilt", {}), **options),
+                   fov=tuple(settings.get("camera_fov", (66.0, 41.0))),
+                   center_tolerance=settings.get("center_tolerance", 2.0))
+
+    def reset(self):
+        for pid in self.pids:
+            pid.reset()
+        self.metrics.reset()
+        self.commands = []
+        self.latency_total = 0.0
+        self.latency_count = 0
+
+    def errors(self, hand_position):
+        """Angular offset of the hand from the frame center, as the pan/tilt move that centers it."""
+        return ((0.5 - hand_position.x) * self.fov[0], (0.5 - hand_position.y) * self.fov[1])
+
+    def update(self, hand_position, now_ns):
+        """Correction in degrees for a new hand position, None when the position is stale or repeated.
+
+        now_ns is the sensor clock time of the decision, it also paces the PID.
+        """
+        timestamp_ns = hand_position.timestamp_ns
+        if now_ns - timestamp_ns > self.max_age_ns:
+            return None
+        if hand_position.predicted:
+            # Only extrapolations of the newest frame, in order
+            if hand_position.frame_id != self.last_frame_id or timestamp_ns <= max(self.last_predicted_ns, self.last_frame_ns):
+                return None
+            self.last_predicted_ns = timestamp_ns
+            frame_ns = self.last_frame_ns
+        else:
+            if timestamp_ns <= self.last_frame_ns:
+                return None
+            self.last_frame_id = hand_position.frame_id
+            self.last_frame_ns = frame_ns = timestamp_ns
+            self.latency_total += (now_ns - timestamp_ns) / 1e9
+            self.latency_count += 1
+
+        errors = self.errors(hand_position)
+        if not hand_position.predicted:
+            self.metrics.record(timestamp_ns, errors)
+        # Moves sent after the frame was captured already work on its error
+        self.commands = [command for command in self.commands if command[0] > frame_ns]
+        in_flight = (sum(command[1] for command in self.commands), sum(command[2] for command in self.commands))
+        seconds = now_ns / 1e9
+        pan, tilt = (pid.update(error - moving, seconds) for pid, error, moving in zip(self.pids, errors, in_flight))
+        if pan or tilt:
+            self.commands.append((now_ns, pan, tilt))
+        return pan, tilt
+
+    def summary(self):
+        summary = self.metrics.summary()
+        summary["mean_latency"] = self.latency_total / self.latency_count if self.latency_count else None
+        return summary
@@ -0,0 +1,78 @@
+# brainy_utility/engine.py
+import asyncio
+import logging
+from eventbus import GESTURE_STREAM, HAND_POSITION_STREAM, HAND_PREDICTION_STREAM, HANDS_STREAM, GestureEvent
+from frame_ring import sensor_time_ns
+from brainy_utility.gesture_chain import ChainEvent, ChainMatcher
+
+class BehaviourEngine:
+    """Reads bus events once and dispatches them to behaviours, one motor owner at a time."""
+
+    def __init__(self, bus, behaviours, block_ms=1000):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.bus = bus
+        self.behaviours = sorted(behaviours, key=lambda behaviour: behaviour.priority, reverse=True)
+        self.block_ms = block_ms
+        self.active_behaviour = None
+        self.active_task = None
+        # Chains declared by all behaviours share one matcher
+        self.chains = ChainMatcher([chain for behaviour in self.behaviours for chain in behaviour.chains])
+
+    async def run(self):
+        # Predicted hand positions come on their own stream, only the centering uses them
+        last_ids = {GESTURE_STREAM: "$", HAND_POSITION_STREAM: "$", HAND_PREDICTION_STREAM: "$", HANDS_STREAM: "$"}
+        self.logger.info("Behaviour engine started with %s.", [b.__class__.__name__ for b in self.behaviours])
+        while True:
+            try:
+                # Blocking read in a worker thread, the loop stays free for running reactions
+                events = await asyncio.to_thread(self.bus.read, last_ids, self.block_ms)
+            except Exception as e:
+                self.logger.error("Error reading events from the bus: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for event in events:
+                self.dispatch(event)
+            for chain_event in self.chains.tick(sensor_time_ns()):
+                self.arbitrate(chain_event)
+
+    def dispatch(self, event):
+        for behaviour in self.behaviours:
+            behaviour.observe(event)
+        if isinstance(event, GestureEvent):
+            self.arbitrate(event)
+            for chain_event in self.chains.feed(event):
+                self.arbitrate(chain_event)
+
+    def is_busy(self):
+        return self.active_task is not None and not self.active_task.done()
+
+    def arbitrate(self, event):
+        # Behaviours are sorted by priority, the first one willing to react wins
+        for behaviour in self.behaviours:
+            if not behaviour.wants(event):
+                continue
+            # A completed chain is deliberate: it may interrupt its own behaviour and skips the cooldown,
+            # which only damps repeated single gestures
+            chain = isinstance(event, ChainEvent)
+            if self.is_busy() and self.active_behaviour.priority >= behaviour.priority and \
+                    not (chain and self.active_behaviour is behaviour):
+                return
+            if not chain and not behaviour.check_cooldown():
+                continue
+            self.start_reaction(behaviour, event)
+            return
+
+    def start_reaction(self, behaviour, event):
+        if self.is_busy():
+            self.logger.info("%s pre-empts %s.", behaviour.__class__.__name__, self.active_behaviour.__class__.__name__)
+            self.active_task.cancel()
+        self.active_behaviour = behaviour
+        self.active_task = asyncio.create_task(behaviour.reaction(event))
+        self.active_task.add_done_callback(self.reaction_done)
+
+    def reaction_done(self, task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error:
+            self.logger.error("Reaction failed: %s", error)
@@ -0,0 +1,152 @@
+# brainy_utility/gesture_chain.py
+import bisect
+import logging
+from collections import namedtuple
+
+# Gestures that separate the steps of a chain instead of being a step themselves
+GAP_GESTURES = ("No gesture", "None")
+
+Step = namedtuple("Step", "gesture min_duration max_gap", defaults=(0.0, None))
+Step.__doc__ = """One gesture of a chain, held at least min_duration seconds and started at most
+max_gap seconds after the previous step ended (None for no limit)."""
+Chain = namedtuple("Chain", "name steps")
+ChainEvent = namedtuple("ChainEvent", "chain timestamp_ns")
+
+
+class ChainMatcher:
+    """Matches declared gesture chains against the gesture stream with one compiled automaton.
+
+    The stream is read as segments, a gesture held until the next different one. Every segment
+    becomes a symbol made of its gesture and a duration class, gaps between gestures become gap
+    symbols of a gap class, the classes being the intervals between the durations the chains care
+    about. All chains are compiled into a single DFA over these symbols, so each segment costs one
+    table lookup however many chains are declared.
+    """
+
+    def __init__(self, chains):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.chains = list(chains)
+        self.compile()
+        self.state = self.start
+        self.segment_gesture = None
+        self.segment_start_ns = None
+        self.segment_fired = False
+
+    def compile(self):
+        # Duration thresholds per gesture and for gaps, symbols only record which ones were reached
+        self.min_durations = {}
+        max_gaps = set()
+        for chain in self.chains:
+            for step in chain.steps:
+                self.min_durations.setdefault(step.gesture, set()).add(float(step.min_duration))
+                if step.max_gap is not None:
+                    max_gaps.add(float(step.max_gap))
+        self.min_durations = {gesture: sorted(values) for gesture, values in self.min_durations.items()}
+        self.max_gaps = sorted(max_gaps)
+
+        # Trie of steps, each node being the prefix of one or more chains
+        children = [[]]  # node -> [(step, child node)]
+        accepting = [[]]  # node -> chain names completed there
+        for chain in self.chains:
+            node = 0
+            for step in chain.steps:
+                for existing, child in children[node]:
+                    if existing == step:
+                        node = child
+                        break
+                else:
+                    children.append([])
+                    accepting.append([])
+                    children[node].append((step, len(children) - 1))
+                    node = len(children) - 1
+            accepting[node].append(chain.name)
+
+        # NFA states are (node, gap class), gap class -1 while no gap followed the node's step.
+        # The root is active in every state so a chain can start at any segment.
+        root = (0, -1)
+
+        def move(states, symbol):
+            kind, gesture, value = symbol
+            result = {root}
+            for node, gap in states:
+                if kind == "gap":
+                    if node != 0 and gap == -1:
+                        result.add((node, value))
+                    continue
+                for step, child in children[node]:
+                    if step.gesture != gesture:
+                        continue
+                    if self.min_durations[gesture].index(float(step.min_duration)) > value:
+                        continue
+                    if node != 0 and gap >= 0 and step.max_gap is not None and \
+                            gap > self.max_gaps.index(float(step.max_gap)):
+                        continue
+                    result.add((child, -1))
+            return frozenset(result)
+
+        symbols = [("gap", None, value) for value in range(len(self.max_gaps) + 1)]
+        for gesture, thresholds in self.min_durations.items():
+            symbols += [("gesture", gesture, value) for value in range(len(thresholds))]
+
+        # Subset construction, the table only holds transitions that leave the start state
+        start = frozenset({root})
+        ids = {start: 0}
+        pending = [start]
+        self.table = {}
+        self.completes = [[]]
+        while pending:
+            states = pending.pop()
+            for symbol in symbols:
+                target = move(states, symbol)
+                if target not in ids:
+                    ids[target] = len(ids)
+                    pending.append(target)
+                    self.completes.append([name for node, gap in target if gap == -1 for name in accepting[node]])
+                if ids[target] != 0:
+                    self.table[(ids[states], symbol)] = ids[target]
+        self.start = 0
+        self.logger.info("Compiled %s gesture chain(s) into %s states.", len(self.chains), len(ids))
+
+    def symbol(self, gesture, duration):
+        if gesture in GAP_GESTURES:
+            return ("gap", None, bisect.bisect_left(self.max_gaps, duration))
+        thresholds = self.min_durations.get(gesture)
+        if thresholds is None:
+            return None
+        value = bisect.bisect_right(thresholds, duration) - 1
+        return ("gesture", gesture, value) if value >= 0 else None
+
+    def step(self, state, gesture, duration):
+        symbol = self.symbol(gesture, duration)
+        return self.table.get((state, symbol), self.start) if symbol else self.start
+
+    def feed(self, event):
+        """Advance on a gesture event, returning the chains it completed."""
+        if event.gesture == self.segment_gesture:
+            return []
+        if event.gesture in GAP_GESTURES and self.segment_gesture in GAP_GESTURES:
+            return []  # "None" and "No gesture" are the same gap
+        completed = self.close_segment(event.timestamp_ns)
+        self.segment_gesture = event.gesture
+        self.segment_start_ns = event.timestamp_ns
+        self.segment_fired = False
+        return completed
+
+    def close_segment(self, now_ns):
+        if self.segment_gesture is None:
+            return []
+        duration = (now_ns - self.segment_start_ns) / 1e9
+        self.state = self.step(self.state, self.segment_gesture, duration)
+        if self.segment_fired:
+            return []
+        return [ChainEvent(name, now_ns) for name in self.completes[self.state]]
+
+    def tick(self, now_ns):
+        """Report chains whose last step is being held long enough, without waiting for it to end."""
+        if self.segment_gesture is None or self.segment_fired or self.segment_gesture in GAP_GESTURES:
+            return []
+        duration = (now_ns - self.segment_start_ns) / 1e9
+        names = self.completes[self.step(self.state, self.segment_gesture, duration)]
+        if names:
+            self.segment_fired = True
+        return [ChainEvent(name, now_ns) for name in names]
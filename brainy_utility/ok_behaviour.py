@@ -1,39 +1,55 @@
 # brainy_utility/ok_behaviour.py
-import requests
-import time
-from brainy_utility.behaviour import Behaviour  
+import asyncio
+from brainy_utility.behaviour import Behaviour
 
 class OKBehaviour(Behaviour):
-    def __init__(self, redis_conn, camerabot_port,dummy_api_port, cooldown=5):
+    priority = 2  # A photo request interrupts hand tracking
+
+    def __init__(self, redis_conn, camerabot, dummy, cooldown=5, capture_mode="precapture", precapture_before=0.0, precapture_after=0.0):
         super().__init__(redis_conn, cooldown)
-        self.camerabot_port = camerabot_port
-        self.dummy_api_url = f"http://localhost:{dummy_api_port}"
+        self.camerabot = camerabot
+        self.dummy = dummy
+        self.capture_mode = capture_mode  # "precapture" saves the posed frame, "countdown" beeps and waits
+        self.precapture_before = precapture_before
+        self.precapture_after = precapture_after
 
 
-    def action(self):
-        """Listen for the 'OK' gesture on the Redis queue."""
-        while True:
-            gesture = self.redis_conn.lindex("gesture_queue", -1)
-            if gesture and gesture.decode("utf-8") == "Thumb_Up":
-                if self.check_cooldown():
-                    self.reaction()
-            time.sleep(0.1)  # Small delay to prevent excessive CPU usage
+    def action(self, event):
+        """React to the 'OK' gesture."""
+        return event.gesture == "Thumb_Up"
 
-    def reaction(self):
-        """Trigger the take_photo action via CameraBot."""
+    async def reaction(self, event):
+        if self.capture_mode == "countdown":
+            await self.countdown_capture()
+        else:
+            await self.precapture(event)
+
+    async def precapture(self, event):
+        """Save the frame captured when the gesture was made, without any delay."""
         try:
-            url = f"{self.dummy_api_url}/ok_triggered"
+            params = {"timestamp_ns": event.timestamp_ns, "before": self.precapture_before,
+                      "after": self.precapture_after, "source": "gesture"}
+            response = await self.camerabot.apost("/precapture", params=params)
+            if response.status_code == 200:
+                self.logger.info("OK gesture detected, pre-captured photo saved.")
+            else:
+                self.logger.error("Failed to save pre-captured photo, status code: %s", response.status_code)
+        except Exception as e:
+            self.logger.error("Error triggering pre-captured photo: %s", e)
 
+    async def countdown_capture(self):
+        """Trigger the take_photo action via CameraBot."""
+        try:
             try:
-                # Make request to dummy server with the step size
-                response = requests.post(url)
+                # Beeps through the countdown while we wait
+                response = await self.dummy.apost("/play", json={"pattern": "countdown"})
             except Exception as e:
                 self.logger.error("Error triggering take photo sound: %s", e)
-                return {"error": str(e)}
-            
-            time.sleep(2)
+                return
+
+            await asyncio.sleep(2)
 
-            response = requests.get(f"http://localhost:{self.camerabot_port}/take_photo")
+            response = await self.camerabot.apost("/take_photo", params={"source": "gesture"})
             if response.status_code == 200:
                 self.logger.info("OK gesture detected, photo taken successfully.")
             else:
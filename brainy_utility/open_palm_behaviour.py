@@ -1,64 +1,84 @@
 # brainy_utility/open_palm_behaviour.py
-import requests
-import time
-import json
 import logging
 from brainy_utility.behaviour import Behaviour
+from brainy_utility.gesture_chain import Chain, ChainEvent, Step
+from eventbus import HandPositionEvent
+from frame_ring import sensor_time_ns
 
 class OpenPalmBehaviour(Behaviour):
-    def __init__(self, redis_conn, dummy_api_port, cooldown=5):
+    priority = 1
+    # Closing the open hand into a fist sends the camera back to its home position
+    chains = (Chain("palm_then_fist", (Step("Open_Palm", min_duration=0.5),
+                                       Step("Closed_Fist", min_duration=0.5, max_gap=1.0))),)
+
+    def __init__(self, redis_conn, motors, centering, cooldown=5, home=(90.0, 90.0)):
         super().__init__(redis_conn, cooldown)
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.dummy_api_url = f"http://localhost:{dummy_api_port}"
-
-    def action(self):
-        while True:
-            gesture = self.redis_conn.lindex("gesture_queue", -1)
-            if gesture and gesture.decode("utf-8") == "Open_Palm":
-                if self.check_cooldown():
-                    self.reaction()
-            time.sleep(0.1)
+        self.motors = motors
+        self.centering = centering
+        self.home = tuple(home)
+        self.palm_elsewhere = False  # The open palm was last seen on another hand than Palmist's primary one
 
-    def reaction(self):
-        self.logger.info("Open Palm gesture detected, starting hand positioning adjustments.")
-        
-        while True:
-            hand_position_data = self.redis_conn.lindex("hand_position_queue", -1)
-            if hand_position_data:
-                hand_position = hand_position_data.decode("utf-8")
-                hand_x, hand_y = map(float, hand_position.strip("Hand position: ()").split(", "))
+    def action(self, event):
+        return event.gesture == "Open_Palm"
 
-                move_x = 0.5-hand_x
-                move_y = 0.5-hand_y 
+    async def reaction(self, event):
+        if isinstance(event, ChainEvent):
+            await self.go_home()
+        else:
+            await self.center_hand()
 
-                step_x = self.convert_to_step(move_x)
-                step_y = self.convert_to_step(move_y)
-
-                self.logger.info(f"Adjusting position: Move X by {step_x} degrees, Move Y by {step_y} degrees.")
+    async def go_home(self):
+        try:
+            pan, tilt = await self.motors.move_to(*self.home)
+            self.logger.info("Palm then fist detected, camera sent home to pan %.1f, tilt %.1f.", pan, tilt)
+        except Exception as e:
+            self.logger.error("Failed to send the camera home: %s", e)
 
+    async def center_hand(self):
+        self.logger.info("Open Palm gesture detected, starting hand centering.")
+        self.centering.reset()
+        self.palm_elsewhere = False
+        try:
+            # Runs once per hand position Palmist publishes, at frame rate
+            while self.gesture == "Open_Palm":
+                hand_position = await self.next_hand_position(timeout=1.0)
+                if hand_position is None or not hand_position.present:
+                    continue
+                hand_position = self.palm_position(hand_position)
+                if hand_position is None:
+                    continue
+                correction = self.centering.update(hand_position, sensor_time_ns())
+                if correction is None:
+                    continue
+                pan, tilt = correction
+                if not (pan or tilt):
+                    continue
+                self.logger.debug("Adjusting position: pan by %.2f degrees, tilt by %.2f degrees.", pan, tilt)
                 try:
-                    if abs(step_x) > 0:
-                        self.move_motor("horizontal", step_x)
-                    if abs(step_y) > 0:
-                        self.move_motor("vertical", step_y)
+                    await self.motors.move(pan, tilt)
                 except Exception as e:
                     self.logger.error(f"Failed to send move command to Dummy: {e}")
+        finally:
+            # Logged even when the reaction is pre-empted, so every run can be compared while tuning
+            self.logger.info("Hand centering ended: %s", self.centering.summary())
 
-                time.sleep(0.5)
-
-            gesture = self.redis_conn.lindex("gesture_queue", -1)
-
-
-            if (not gesture or gesture.decode("utf-8") != "Open_Palm"):
-                self.logger.info("No open_palm gesture detected for more than 1 second, stopping adjustments.")
-                break
-            time.sleep(0.1)
-
-    def convert_to_step(self, move_value, max_step=10):
-        return int(move_value * max_step)
+    def palm_position(self, hand_position):
+        """Position to center: Palmist's primary hand, unless another hand of the frame shows the open palm.
 
-    def move_motor(self, direction, step):
-        url = f"{self.dummy_api_url}/move_{direction}"
-        response = requests.post(url, json={"step": step})
-        if response.status_code != 200:
-            self.logger.error(f"Failed to move {direction} motor: {response.text}")
+        The other hand is followed through its raw centroid, predictions of the primary hand are
+        then ignored, they extrapolate the wrong hand.
+        """
+        if hand_position.predicted:
+            return None if self.palm_elsewhere else hand_position
+        palms = self.hands_with_gesture("Open_Palm")
+        if not palms or self.hands.frame_id != hand_position.frame_id:
+            self.palm_elsewhere = False
+            return hand_position
+        palm = palms[0]
+        self.palm_elsewhere = not (palm["x0"] <= hand_position.x <= palm["x1"] and
+                                   palm["y0"] <= hand_position.y <= palm["y1"])
+        if not self.palm_elsewhere:
+            return hand_position
+        return HandPositionEvent(hand_position.frame_id, hand_position.timestamp_ns,
+                                 float(palm["cx"]), float(palm["cy"]), True)
@@ -0,0 +1,56 @@
+# brainy_utility/pid.py
+
+class PID:
+    """Single axis PID on timestamped errors, with deadband, output limits and anti-windup.
+
+    Time steps come from the timestamps given by the caller, not from the wall clock, so
+    replaying recorded events reproduces the same outputs.
+    """
+
+    def __init__(self, kp, ki=0.0, kd=0.0, deadband=0.0, output_limit=None, integral_limit=None, derivative_smoothing=0.5):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.deadband = deadband  # Errors this small are treated as zero
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self.derivative_smoothing = derivative_smoothing  # 0 uses the raw derivative, closer to 1 smooths more
+        self.reset()
+
+    @classmethod
+    def from_settings(cls, gains, deadband=0.0, output_limit=None, integral_limit=None):
+        return cls(gains.get("kp", 0.5), gains.get("ki", 0.0), gains.get("kd", 0.0),
+                   deadband=deadband, output_limit=output_limit, integral_limit=integral_limit)
+
+    def reset(self):
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.last_error = None
+        self.last_time = None
+
+    def clamp(self, value, limit):
+        if limit is None:
+            return value
+        return max(-limit, min(limit, value))
+
+    def update(self, error, timestamp):
+        """Controller output for an error measured at timestamp (seconds)."""
+        if abs(error) <= self.deadband:
+            error = 0.0
+        dt = None if self.last_time is None else timestamp - self.last_time
+        if dt is not None and dt <= 0:
+            return 0.0  # Out of order or repeated measurement
+        if dt is not None:
+            raw = (error - self.last_error) / dt
+            self.derivative = self.derivative_smoothing * self.derivative + (1 - self.derivative_smoothing) * raw
+        self.last_error = error
+        self.last_time = timestamp
+        if error == 0.0:
+            return 0.0
+
+        unclamped = self.kp * error + self.ki * self.integral + self.kd * self.derivative
+        output = self.clamp(unclamped, self.output_limit)
+        # Anti-windup: stop integrating while the output is saturated in the error's direction
+        if dt is not None and (output == unclamped or output * error < 0):
+            self.integral = self.clamp(self.integral + error * dt, self.integral_limit)
+        return output
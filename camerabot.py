@@ -1,41 +1,48 @@
 import logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",handlers=[
-            logging.FileHandler("/home/pi/estevan/log/esteban.log"),
-            logging.StreamHandler()  # Optional: log to console
-            ])
-from picamera2 import Picamera2
+from picamera2 import Picamera2, MappedArray
 from picamera2.encoders import MJPEGEncoder
-from threading import Thread, Condition
-from fastapi import FastAPI, WebSocket
-from picamera2.outputs import FileOutput
+from threading import Thread
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from picamera2.outputs import Output
 import uvicorn
-import io
+import os
 import redis
 import time
-import threading
 import asyncio
-import requests
+import cv2
+from frame_ring import FrameRing, sensor_time_ns
+from service_client import ServiceClient
+from eventbus import EventBus
+from photo_catalog import PhotoCatalog
+from camerabot_utility.stream_hub import StreamHub
+from camerabot_utility.capture_jobs import CaptureQueue
+from camerabot_utility.precapture import PreCaptureBuffer
 
-# Configure logging with class name reference
-logging.basicConfig(
-    level=logging.INFO, 
-    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
-)
-
-class StreamingOutput(io.BufferedIOBase):
-    def __init__(self):
+class StreamingOutput(Output):
+    def __init__(self, precapture, encoder):
+        super().__init__()
         self.logger = logging.getLogger(self.__class__.__name__)  # Logger with class name
         self.frame = None
-        self.condition = Condition()
+        self.precapture = precapture
+        self.encoder = encoder
 
-    def write(self, buf):
+    def outputframe(self, frame, keyframe=True, timestamp=None, *args, **kwargs):
         try:
-            with self.condition:
-                self.frame = buf
-                self.condition.notify_all()
+            # Full resolution frames are only kept for photos, viewers get the lores tiers
+            self.frame = frame
+            self.precapture.add(self.sensor_timestamp_ns(timestamp), frame)
         except Exception as e:
             self.logger.error("Error writing frame to output: %s", e)
 
+    def sensor_timestamp_ns(self, timestamp):
+        # picamera2 passes the SensorTimestamp of the encoded request in microseconds, counted from
+        # the encoder's first frame, so frames match the gesture timestamps Palmist publishes
+        first = getattr(self.encoder, "firsttimestamp", None)
+        if timestamp is None or first is None:
+            return sensor_time_ns()
+        return (first + timestamp) * 1000
+
 class CameraBot:
     def __init__(self, settings):
         self.logger = logging.getLogger(self.__class__.__name__)  # Logger with class name
@@ -43,7 +50,8 @@ class CameraBot:
             # Use specific group settings and initialize Redis
             self.settings = settings["CameraBot"]
             self.queue_settings = settings["queue"]
-            self.dummy_port = settings["Dummy"]["api_port"]  # Set dummy port here
+            self.dummy = ServiceClient.for_service(settings, "Dummy")
+            self.ring_settings = settings["frame_ring"]
 
            
         
@@ -57,11 +65,13 @@ class CameraBot:
                 db=self.queue_settings["db"]
             )
             self.logger.info("Connected to Redis on %s:%s.", self.queue_settings["host"], self.queue_settings["port"])
+            self.bus = EventBus.from_settings(self.redis_conn, self.queue_settings)
             
             #!!!! non puoi inmizializzare la risorsa camera qui altrimenti nel nuovo processo muore
             self.app = FastAPI()
 
             self.setup_routes()
+            self.app.add_event_handler("shutdown", self.shutdown)
             self.logger.info("CameraBot initialized successfully.")
 
             self.camera = Picamera2()
@@ -75,70 +85,140 @@ class CameraBot:
             
             # Encoder and streaming setup
             self.encoder = MJPEGEncoder()
-            self.streamOut = StreamingOutput()
-            self.encoder.output = FileOutput(self.streamOut)
+            self.stream_hub = StreamHub(self.settings["stream_tiers"])
+            # Last few seconds of encoded main-stream frames for zero shutter lag photos
+            self.precapture = PreCaptureBuffer(max_frames=self.settings.get("precapture_frames", 30),
+                                               max_bytes=self.settings.get("precapture_bytes", 32 * 1024 * 1024))
+            self.streamOut = StreamingOutput(self.precapture, self.encoder)
+            self.encoder.output = self.streamOut
             self.encoder.framerate = 10
-            self.encoder.size = config["lores"]["size"]
-            self.encoder.format = "RGB888"
 
-    def get_frame(self):
-        try:
-            with self.streamOut.condition:
-                self.streamOut.condition.wait()
-                self.frame = self.streamOut.frame
+            # Raw lores frames for Palmist, shared through memory instead of Redis
+            self.frame_ring = FrameRing.create(self.ring_settings["name"], self.ring_settings["slots"],
+                                               config["lores"]["size"], config["lores"]["format"])
+            self.logger.info("Frame ring %s created with %s slots.", self.ring_settings["name"], self.ring_settings["slots"])
 
-            return self.frame
-        except Exception as e:
-            self.logger.error("Error retrieving frame: %s", e)
-            return None
+            photos_dir = self.settings.get("photos_dir", "/home/pi/photos")
+            self.catalog = PhotoCatalog(self.settings["photo_catalog"], photos_dir)
+            self.capture_queue = CaptureQueue(self.camera, photos_dir,
+                                              workers=self.settings.get("capture_workers", 2),
+                                              jpeg_quality=self.settings.get("jpeg_quality", 90),
+                                              on_grabbed=self.photo_taken_sound,
+                                              on_saved=self.photo_saved)
 
     def setup_routes(self):
         try:
-            @self.app.get("/take_photo")
-            async def take_photo():
+            @self.app.post("/take_photo")
+            async def take_photo(source: str = "manual"):
                 try:
-                    # Capture photo and store in Redis queue
-                    file_path = f"/home/pi/photos/photo_{int(time.time())}.jpg"
-                    self.camera.capture_file(file_path)
-                    #self.redis_conn.rpush("photo_queue", file_path)
-                    self.logger.info("Photo taken and added to Redis queue with path %s", file_path)
+                    # The buffer is grabbed before replying, encoding and disk writes run in the pool
+                    job = await self.capture_queue.submit(source=source)
+                    self.logger.info("Photo capture queued as job %s", job.id)
+                    return {"message": "Photo queued", "job": job.to_dict()}
+                except Exception as e:
+                    self.logger.error("Error taking photo: %s", e)
+                    return {"error": str(e)}
 
-                    url = f"http://localhost:{self.dummy_port}/photo_taken_sound"
+            @self.app.post("/burst")
+            async def burst(count: int = 5, interval: float = 0.2, source: str = "manual"):
+                if not 1 <= count <= self.settings.get("max_burst_count", 20) or interval < 0:
+                    raise HTTPException(status_code=400, detail="Invalid burst count or interval")
+                job = await self.capture_queue.submit(count=count, interval=interval, source=source)
+                self.logger.info("Burst of %s photos queued as job %s", count, job.id)
+                return {"message": "Burst queued", "job": job.to_dict()}
 
-                    try:
-                        # Make request to dummy server with the step size
-                        response = requests.post(url)
-                    except Exception as e:
-                        self.logger.error("Error triggering take photo sound: %s", e)
-                        return {"error": str(e)}
+            @self.app.post("/precapture")
+            async def precapture(timestamp_ns: int = None, before: float = 0.0, after: float = 0.0, source: str = "manual"):
+                # Save frames that were already captured around timestamp_ns (sensor clock, default now)
+                timestamp_ns = timestamp_ns or sensor_time_ns()
+                if before < 0 or after < 0:
+                    raise HTTPException(status_code=400, detail="before and after must be positive")
+                if before == 0 and after == 0:
+                    tolerance_ns = int(self.settings.get("precapture_tolerance", 0.3) * 1e9)
+                    best = self.precapture.best(timestamp_ns, tolerance_ns)
+                    frames = [best] if best else []
+                else:
+                    end_ns = timestamp_ns + int(after * 1e9)
+                    await self.precapture.wait_for(end_ns, timeout=after + 1.0)
+                    frames = self.precapture.window(timestamp_ns - int(before * 1e9), end_ns)
+                if not frames:
+                    raise HTTPException(status_code=404, detail="No buffered frame around the requested time")
+                job = self.capture_queue.submit_encoded([jpeg for _, jpeg in frames], source=source)
+                self.logger.info("%s pre-captured frame(s) queued as job %s", len(frames), job.id)
+                return {"message": "Pre-captured photo queued", "job": job.to_dict()}
 
+            @self.app.get("/precapture/stats")
+            async def precapture_stats():
+                return self.precapture.stats()
 
-                    return {"message": "Photo taken", "path": file_path}
-                except Exception as e:
-                    self.logger.error("Error taking photo: %s", e)
-                    return {"error": str(e)}
-                
+            @self.app.get("/client_stats")
+            async def client_stats():
+                return [self.dummy.stats()]
+
+            @self.app.get("/jobs")
+            async def list_jobs():
+                return [job.to_dict() for job in self.capture_queue.jobs.values()]
+
+            @self.app.get("/jobs/{job_id}")
+            async def job_status(job_id: int):
+                job = self.capture_queue.get(job_id)
+                if job is None:
+                    raise HTTPException(status_code=404, detail="Job not found")
+                return job.to_dict()
+
+            @self.app.on_event("startup")
+            async def attach_stream_hub():
+                self.stream_hub.attach(asyncio.get_running_loop())
 
             @self.app.websocket("/stream")
-            async def stream(websocket: WebSocket):
+            async def stream(websocket: WebSocket, quality: str = "auto"):
                 await websocket.accept()
+                client = self.stream_hub.connect(quality)
                 self.logger.info("WebSocket connection accepted.")
 
                 try:
                     while True:
-                        frame = self.get_frame()
-                        if frame:
-                            await websocket.send_bytes(frame)
-                        else:
-                            self.logger.warning("No frame available to send over WebSocket.")
-                        await asyncio.sleep(0)  # Yield control
+                        frame = await client.next_frame()
+                        start = time.monotonic()
+                        await websocket.send_bytes(frame)
+                        self.stream_hub.sent(client, len(frame), time.monotonic() - start)
 
+                except WebSocketDisconnect:
+                    pass
                 except Exception as e:
                     self.logger.error("Error during WebSocket streaming: %s", e)
                 finally:
-                    await websocket.close()  # Explicitly close WebSocket on exit
+                    self.stream_hub.disconnect(client)
                     self.logger.info("WebSocket connection closed.")
 
+            @self.app.get("/stream.mjpg")
+            async def stream_mjpeg(quality: str = "auto"):
+                async def frames():
+                    client = self.stream_hub.connect(quality)
+                    try:
+                        while True:
+                            frame = await client.next_frame()
+                            start = time.monotonic()
+                            # Resuming after the yield means the server has sent the part
+                            yield b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%b\r\n" % (len(frame), frame)
+                            self.stream_hub.sent(client, len(frame), time.monotonic() - start)
+                    finally:
+                        self.stream_hub.disconnect(client)
+
+                return StreamingResponse(frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+            @self.app.get("/health")
+            async def health():
+                # Probed by the Esteban supervisor, Palmist depends on the frames this thread publishes
+                if not self.stream_thread.is_alive():
+                    raise HTTPException(status_code=503, detail="Frame streaming stopped")
+                return {"status": "ok"}
+
+            @self.app.get("/stream/stats")
+            async def stream_stats():
+                # Viewers per tier and per-viewer drop rate
+                return self.stream_hub.stats()
+
 
             self.logger.info("Routes setup completed successfully.")
         
@@ -152,30 +232,76 @@ class CameraBot:
             # Start streaming and camera encoder on the main thread
             self.logger.info("Starting camera streaming and encoder.")
             self.process_init()
-            time.sleep(1)
             self.camera.start_encoder(self.encoder)
             self.camera.start()
 
             self.logger.info("CameraBot started and camera streaming initialized.")
             self.logger.info("Starting CameraBot FastAPI server.")
-            Thread(target=self.stream_frames).start()
+            self.stream_thread = Thread(target=self.stream_frames, daemon=True)
+            self.stream_thread.start()
             uvicorn.run(self.app, host="0.0.0.0", port=self.settings["fastapi_port"])
         
         except Exception as e:
             self.logger.error("Error running CameraBot: %s", e)
 
     def stream_frames(self):
-        self.logger.info("Entering in stream_frames queue loop.")
+        self.logger.info("Entering in stream_frames loop.")
         while True:
             try:
-                # Push frames into streaming queue at specified FPS
-                frame = self.get_frame()
-                if frame:
-                    self.redis_conn.set("streaming_queue", frame)
-                else:
-                    self.logger.warning("No frame available to push to Redis streaming queue.")
+                # Copy the lores buffer straight into the shared ring, Redis only gets the sequence number
+                request = self.camera.capture_request()
+                try:
+                    timestamp_ns = request.get_metadata().get("SensorTimestamp") or sensor_time_ns()
+                    with MappedArray(request, "lores") as mapped:
+                        seq = self.frame_ring.publish(mapped.array, timestamp_ns)
+                finally:
+                    request.release()
+                self.redis_conn.publish(self.ring_settings["channel"], seq)
+                self.encode_stream_tiers(self.frame_ring.get(seq))
                 time.sleep(1 / self.settings["fps_streaming"])
             
             except Exception as e:
                 self.logger.error("Error in stream_frames loop: %s", e)
                 break
+
+    async def photo_taken_sound(self, job):
+        try:
+            response = await self.dummy.apost("/photo_taken_sound")
+            if response.status_code != 200:
+                self.logger.warning("Photo taken sound not played, status code: %s", response.status_code)
+        except Exception as e:
+            self.logger.error("Error triggering take photo sound: %s", e)
+
+    def photo_saved(self, job, path):
+        # Runs in the capture worker, index the photo with where the camera was pointing
+        try:
+            motion = self.bus.latest_camera_motion()
+            pan, tilt = (motion.pan, motion.tilt) if motion else (None, None)
+            self.catalog.add(path, source=job.source, pan=pan, tilt=tilt)
+            # ShowBot renders thumbnails and previews in its own pool, off the capture path
+            self.redis_conn.publish(self.settings["photo_channel"], os.path.basename(path))
+        except Exception as e:
+            self.logger.error("Error adding %s to the photo catalog: %s", path, e)
+
+    def encode_stream_tiers(self, frame):
+        # Every tier is encoded from the lores frame at streaming_size, once per frame and only when watched
+        bgr = None
+        for tier in self.settings["stream_tiers"]:
+            if frame is None or not self.stream_hub.has_viewers(tier["name"]):
+                continue
+            if bgr is None:
+                bgr = cv2.cvtColor(frame.data, cv2.COLOR_YUV2BGR_I420)
+            resized = bgr if tier["scale"] == 1 else cv2.resize(bgr, None, fx=tier["scale"], fy=tier["scale"],
+                                                                interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, tier["quality"]])
+            if ok:
+                self.stream_hub.push(tier["name"], jpeg.tobytes())
+
+    def shutdown(self):
+        try:
+            # Let queued photos reach the disk before releasing the shared frames
+            self.capture_queue.shutdown()
+            self.frame_ring.close()
+            self.logger.info("Capture workers stopped and frame ring closed.")
+        except Exception as e:
+            self.logger.error("Error shutting down CameraBot: %s", e)
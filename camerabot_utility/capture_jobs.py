@@ -0,0 +1,171 @@
+# camerabot_utility/capture_jobs.py
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+class CaptureJob:
+    def __init__(self, job_id, count, interval, source):
+        self.id = job_id
+        self.count = count
+        self.interval = interval
+        self.source = source
+        self.status = "queued"
+        self.paths = []
+        self.saved = 0
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "count": self.count,
+            "interval": self.interval,
+            "source": self.source,
+            "paths": self.paths,
+            "saved": self.saved,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class CaptureQueue:
+    """Grabs full resolution buffers off the event loop and encodes them in a worker pool."""
+
+    def __init__(self, camera, photos_dir, workers=2, jpeg_quality=90, max_jobs=100, on_grabbed=None, on_saved=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.camera = camera
+        self.photos_dir = photos_dir
+        self.jpeg_quality = jpeg_quality
+        self.max_jobs = max_jobs  # Finished jobs kept around for the status API
+        self.on_grabbed = on_grabbed  # Coroutine called with the job once its first buffer is grabbed
+        self.on_saved = on_saved  # Called from the worker with (job, path) once a photo is on disk
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture")
+        self.jobs = OrderedDict()
+        self.job_ids = itertools.count(1)
+        self.photo_ids = itertools.count(1)
+
+    def add_job(self, count, interval, source):
+        job = CaptureJob(next(self.job_ids), count, interval, source)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        return job
+
+    async def submit(self, count=1, interval=0.0, source="manual"):
+        """Grab the first buffer before returning, so the photo shows the scene at request time.
+
+        The rest of a burst, encoding and disk writes carry on in the background.
+        """
+        job = self.add_job(count, interval, source)
+        job.status = "capturing"
+        try:
+            first = await asyncio.to_thread(self.grab)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            job.finished = time.time()
+            raise
+        asyncio.create_task(self.run_job(job, first))
+        return job
+
+    def submit_encoded(self, frames, source="manual"):
+        """Queue a job saving JPEGs that were already encoded, such as pre-captured frames."""
+        job = self.add_job(len(frames), 0.0, source)
+        asyncio.create_task(self.run_encoded_job(job, frames))
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def next_path(self):
+        # Nanosecond timestamp plus a per-process counter, two captures can never share a name
+        now_ns = time.time_ns()
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now_ns // 1_000_000_000))
+        name = f"photo_{stamp}_{now_ns % 1_000_000_000:09d}_{next(self.photo_ids):04d}.jpg"
+        return os.path.join(self.photos_dir, name)
+
+    async def run_job(self, job, first):
+        loop = asyncio.get_running_loop()
+        pending = []
+        try:
+            for index in range(job.count):
+                if index == 0:
+                    array = first
+                    if self.on_grabbed:
+                        await self.on_grabbed(job)
+                else:
+                    await asyncio.sleep(job.interval)
+                    array = await asyncio.to_thread(self.grab)
+                path = self.next_path()
+                job.paths.append(path)
+                pending.append(loop.run_in_executor(self.executor, self.save, job, array, path))
+            job.status = "encoding"
+            for saved in asyncio.as_completed(pending):
+                await saved
+                job.saved += 1
+            job.status = "done"
+            self.logger.info("Capture job %s done, %s photo(s) saved.", job.id, job.saved)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            self.logger.error("Capture job %s failed: %s", job.id, e)
+        finally:
+            job.finished = time.time()
+
+    async def run_encoded_job(self, job, frames):
+        loop = asyncio.get_running_loop()
+        try:
+            if self.on_grabbed:
+                await self.on_grabbed(job)
+            job.status = "encoding"
+            pending = []
+            for jpeg in frames:
+                path = self.next_path()
+                job.paths.append(path)
+                pending.append(loop.run_in_executor(self.executor, self.write, job, jpeg, path))
+            for saved in asyncio.as_completed(pending):
+                await saved
+                job.saved += 1
+            job.status = "done"
+            self.logger.info("Capture job %s done, %s pre-captured photo(s) saved.", job.id, job.saved)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            self.logger.error("Capture job %s failed: %s", job.id, e)
+        finally:
+            job.finished = time.time()
+
+    def grab(self):
+        request = self.camera.capture_request()
+        try:
+            return request.make_array("main")
+        finally:
+            request.release()
+
+    def save(self, job, array, path):
+        # RGB888 buffers are laid out BGR, as OpenCV expects
+        ok, jpeg = cv2.imencode(".jpg", array, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise RuntimeError(f"JPEG encoding failed for {path}")
+        self.write(job, jpeg.tobytes(), path)
+
+    def write(self, job, jpeg, path):
+        # Write under a temporary name so nobody ever sees a half written photo
+        tmp_path = path + ".part"
+        with open(tmp_path, "wb") as file:
+            file.write(jpeg)
+        os.replace(tmp_path, path)
+        self.logger.info("Photo saved to %s", path)
+        if self.on_saved:
+            self.on_saved(job, path)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
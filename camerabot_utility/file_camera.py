@@ -0,0 +1,80 @@
+# camerabot_utility/file_camera.py
+import json
+import logging
+import sys
+import time
+import cv2
+import numpy as np
+from frame_ring import FrameRing, sensor_time_ns
+
+
+def padded_i420(bgr, stride):
+    """I420 buffer of a BGR image laid out like a picamera2 lores array, every plane padded to stride."""
+    height, width = bgr.shape[:2]
+    i420 = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420).reshape(-1)
+    buffer = np.zeros(height * 3 // 2 * stride, dtype=np.uint8)
+    buffer[:height * stride].reshape(height, stride)[:, :width] = i420[:height * width].reshape(height, width)
+    chroma_height, chroma_width, chroma_stride = height // 2, width // 2, stride // 2
+    for index in range(2):
+        source = i420[height * width + index * chroma_height * chroma_width:][:chroma_height * chroma_width]
+        start = height * stride + index * chroma_height * chroma_stride
+        target = buffer[start:start + chroma_height * chroma_stride].reshape(chroma_height, chroma_stride)
+        target[:, :chroma_width] = source.reshape(chroma_height, chroma_width)
+    return buffer.reshape(height * 3 // 2, stride)
+
+
+class FileCamera:
+    """Stands in for the picamera2 lores stream, reading frames from a video or image file.
+
+    Frames are resized to size and handed out as padded I420 buffers with a sensor clock
+    timestamp, the way CameraBot gets them from MappedArray, so the frame ring and Palmist
+    can be exercised without the camera.
+    """
+
+    def __init__(self, path, size, stride=None, fps=15, loop=True):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.size = tuple(size)
+        self.stride = stride or (self.size[0] + 63) // 64 * 64  # libcamera aligns rows to 64 bytes
+        self.fps = fps
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f"Cannot read frames from {path}")
+
+    def read(self):
+        """(buffer, timestamp_ns) of the next frame, None once the file ends and loop is off."""
+        ok, bgr = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, bgr = self.capture.read()
+        if not ok:
+            return None
+        bgr = cv2.resize(bgr, self.size, interpolation=cv2.INTER_AREA)
+        return padded_i420(bgr, self.stride), sensor_time_ns()
+
+    def run(self, ring, notify=None):
+        """Publish frames into the ring at fps, calling notify(seq) after each one."""
+        while (captured := self.read()) is not None:
+            seq = ring.publish(*captured)
+            if notify:
+                notify(seq)
+            time.sleep(1 / self.fps)
+        self.capture.release()
+
+
+if __name__ == "__main__":
+    # python -m camerabot_utility.file_camera video.mp4 feeds Palmist in place of CameraBot
+    import redis
+    logging.basicConfig(level=logging.INFO)
+    with open("settings.json") as file:
+        settings = json.load(file)
+    ring_settings = settings["frame_ring"]
+    camera = FileCamera(sys.argv[1], settings["CameraBot"]["streaming_size"],
+                        fps=settings["CameraBot"]["fps_streaming"])
+    ring = FrameRing.create(ring_settings["name"], ring_settings["slots"], camera.size)
+    redis_conn = redis.Redis(host=settings["queue"]["host"], port=settings["queue"]["port"], db=settings["queue"]["db"])
+    try:
+        camera.run(ring, lambda seq: redis_conn.publish(ring_settings["channel"], seq))
+    finally:
+        ring.close()
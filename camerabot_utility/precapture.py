@@ -0,0 +1,63 @@
+# camerabot_utility/precapture.py
+import asyncio
+import threading
+from collections import deque
+
+class PreCaptureBuffer:
+    """Memory-bounded ring of the most recent encoded main-stream frames.
+
+    Frames are kept as the JPEGs the MJPEG encoder already produces, stamped with the
+    SensorTimestamp of the request they were encoded from, so a photo of a moment that has
+    already passed costs a file write and nothing more.
+    """
+
+    def __init__(self, max_frames=30, max_bytes=32 * 1024 * 1024):
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.frames = deque()  # (timestamp_ns, jpeg), oldest first
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def add(self, timestamp_ns, jpeg):
+        with self.lock:
+            self.frames.append((timestamp_ns, jpeg))
+            self.total_bytes += len(jpeg)
+            while len(self.frames) > self.max_frames or (self.total_bytes > self.max_bytes and len(self.frames) > 1):
+                _, dropped = self.frames.popleft()
+                self.total_bytes -= len(dropped)
+
+    def newest_timestamp(self):
+        with self.lock:
+            return self.frames[-1][0] if self.frames else None
+
+    def window(self, start_ns, end_ns):
+        with self.lock:
+            return [frame for frame in self.frames if start_ns <= frame[0] <= end_ns]
+
+    def best(self, timestamp_ns, tolerance_ns):
+        """Sharpest frame around timestamp_ns, using the JPEG size as a cheap detail measure."""
+        candidates = self.window(timestamp_ns - tolerance_ns, timestamp_ns + tolerance_ns)
+        if not candidates:
+            return None
+        return max(candidates, key=lambda frame: len(frame[1]))
+
+    async def wait_for(self, timestamp_ns, timeout):
+        """Wait until a frame at or after timestamp_ns was buffered, False on timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            newest = self.newest_timestamp()
+            if newest is not None and newest >= timestamp_ns:
+                return True
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "frames": len(self.frames),
+                "bytes": self.total_bytes,
+                "oldest_ns": self.frames[0][0] if self.frames else None,
+                "newest_ns": self.frames[-1][0] if self.frames else None,
+            }
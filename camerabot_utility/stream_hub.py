@@ -0,0 +1,163 @@
+# camerabot_utility/stream_hub.py
+import asyncio
+import logging
+import time
+
+class StreamClient:
+    """Latest-frame-wins slot of a single viewer: a slow client drops frames instead of queueing them."""
+
+    def __init__(self, tier, adaptive):
+        self.tier = tier
+        self.adaptive = adaptive  # Moved between tiers by the hub when True
+        self.frame = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.upgrade_after = 0.0  # Back-off after a downgrade so the viewer does not oscillate
+        self.reset_window()
+
+    def reset_window(self):
+        self.window_start = time.monotonic()
+        self.window_sent = 0
+        self.window_dropped = 0
+        self.window_bytes = 0
+        self.window_send_time = 0.0
+
+    def offer(self, frame):
+        if self.frame is not None:
+            # Previous frame was never picked up
+            self.dropped += 1
+            self.window_dropped += 1
+        self.frame = frame
+        self.ready.set()
+
+    async def next_frame(self):
+        await self.ready.wait()
+        self.ready.clear()
+        frame, self.frame = self.frame, None
+        return frame
+
+    def record_send(self, nbytes, elapsed):
+        self.sent += 1
+        self.window_sent += 1
+        self.window_bytes += nbytes
+        self.window_send_time += elapsed
+
+    def stats(self):
+        total = self.sent + self.dropped
+        return {
+            "tier": self.tier,
+            "adaptive": self.adaptive,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "drop_rate": self.dropped / total if total else 0.0,
+        }
+
+
+class StreamHub:
+    """Fans encoded frames of every quality tier out to the viewers subscribed to it.
+
+    Each tier is encoded once per frame no matter how many viewers watch it. Adaptive viewers
+    are moved down a tier when they drop too many frames, and up a tier when their measured
+    send throughput leaves enough headroom for the next tier's bitrate.
+    """
+
+    def __init__(self, tiers, window=2.0, downgrade_drop_rate=0.25, upgrade_headroom=1.5):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.tiers = [tier["name"] for tier in tiers]  # Best quality first
+        self.scales = {tier["name"]: tier.get("scale", 1.0) for tier in tiers}
+        self.window = window
+        self.downgrade_drop_rate = downgrade_drop_rate
+        self.upgrade_headroom = upgrade_headroom
+        self.loop = None
+        self.clients = {tier: set() for tier in self.tiers}
+        self.frames_in = {tier: 0 for tier in self.tiers}
+        self.frame_bytes = {tier: 0.0 for tier in self.tiers}  # Moving average of the frame size
+        self.frame_interval = {tier: 0.0 for tier in self.tiers}  # Moving average of the frame period
+        self.last_frame_time = {tier: None for tier in self.tiers}
+
+    def attach(self, loop):
+        self.loop = loop
+
+    def has_viewers(self, tier):
+        return bool(self.clients[tier])
+
+    def push(self, tier, frame):
+        """Called from the encoder threads, hands the frame over to the event loop."""
+        self.frames_in[tier] += 1
+        if self.loop is not None and self.clients[tier]:
+            self.loop.call_soon_threadsafe(self.broadcast, tier, frame)
+
+    def broadcast(self, tier, frame):
+        now = time.monotonic()
+        last, self.last_frame_time[tier] = self.last_frame_time[tier], now
+        self.frame_bytes[tier] += 0.1 * (len(frame) - self.frame_bytes[tier])
+        if last is not None:
+            self.frame_interval[tier] += 0.1 * (now - last - self.frame_interval[tier])
+        for client in self.clients[tier]:
+            client.offer(frame)
+
+    def bitrate(self, tier):
+        """Estimated bytes per second of a tier, scaled from a measured one if it has no viewers."""
+        if self.frame_interval[tier] > 0:
+            return self.frame_bytes[tier] / self.frame_interval[tier]
+        for other in self.tiers:
+            if self.frame_interval[other] > 0:
+                ratio = (self.scales[tier] / self.scales[other]) ** 2
+                return ratio * self.frame_bytes[other] / self.frame_interval[other]
+        return 0.0
+
+    def connect(self, quality="auto"):
+        adaptive = quality not in self.tiers
+        # Adaptive viewers start in the middle and settle from there
+        tier = self.tiers[len(self.tiers) // 2] if adaptive else quality
+        client = StreamClient(tier, adaptive)
+        self.clients[tier].add(client)
+        self.logger.info("Viewer connected to %s tier, %s watching.", tier, self.viewer_count())
+        return client
+
+    def disconnect(self, client):
+        self.clients[client.tier].discard(client)
+        self.logger.info("Viewer disconnected, %s watching.", self.viewer_count())
+
+    def viewer_count(self):
+        return sum(len(clients) for clients in self.clients.values())
+
+    def sent(self, client, nbytes, elapsed):
+        client.record_send(nbytes, elapsed)
+        if client.adaptive and time.monotonic() - client.window_start >= self.window:
+            self.adapt(client)
+            client.reset_window()
+
+    def adapt(self, client):
+        offered = client.window_sent + client.window_dropped
+        drop_rate = client.window_dropped / offered if offered else 0.0
+        index = self.tiers.index(client.tier)
+
+        if drop_rate > self.downgrade_drop_rate and index < len(self.tiers) - 1:
+            self.move(client, self.tiers[index + 1])
+            client.upgrade_after = time.monotonic() + 5 * self.window
+        elif drop_rate == 0 and index > 0 and client.window_send_time > 0 and time.monotonic() >= client.upgrade_after:
+            throughput = client.window_bytes / client.window_send_time
+            if throughput > self.upgrade_headroom * self.bitrate(self.tiers[index - 1]):
+                self.move(client, self.tiers[index - 1])
+
+    def move(self, client, tier):
+        self.logger.info("Moving viewer from %s to %s tier.", client.tier, tier)
+        self.clients[client.tier].discard(client)
+        client.tier = tier
+        self.clients[tier].add(client)
+
+    def stats(self):
+        return {
+            "viewers": self.viewer_count(),
+            "tiers": {
+                tier: {
+                    "viewers": len(self.clients[tier]),
+                    "frames_in": self.frames_in[tier],
+                    "bytes_per_second": self.bitrate(tier),
+                }
+                for tier in self.tiers
+            },
+            "clients": [client.stats() for clients in self.clients.values() for client in clients],
+        }
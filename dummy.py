@@ -1,37 +1,51 @@
 import logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",handlers=[
-            logging.FileHandler("/home/pi/estevan/log/esteban.log"),
-            logging.StreamHandler()  # Optional: log to console
-            ])
 import gpiozero
 from gpiozero.pins.pigpio import PiGPIOFactory
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import RPi.GPIO as GPIO
-from multiprocessing import Process
 from typing import Optional
-import time
+import itertools
+import redis
+from eventbus import EventBus, CameraMotionEvent
+from frame_ring import sensor_time_ns
+from motor_channel import MotorChannelServer
+from dummy_utility.motion_planner import MotionPlanner
+from dummy_utility.tone_sequencer import ToneSequencer
 
 # Model for the request body
 class MoveRequest(BaseModel):
     step: int
 
+class MoveToRequest(BaseModel):
+    horizontal: Optional[float] = None
+    vertical: Optional[float] = None
+
+class PlayRequest(BaseModel):
+    pattern: str
+    interrupt: bool = False
+
+class VelocityRequest(BaseModel):
+    horizontal: float = 0.0
+    vertical: float = 0.0
+
 class BuzzerController:
     def __init__(self, pin):
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(pin, GPIO.OUT)
         self.buzzer = GPIO.PWM(pin,1000)
 
-    def play_sound(self, frequency: int, duration: float):
+    def tone_on(self, frequency: int):
         self.buzzer.ChangeFrequency(frequency)  # Set buzzer to desired frequency
         self.buzzer.start(50)  # Start PWM with 50% duty cycle
-        time.sleep(duration)  # Wait for specified duration
+
+    def tone_off(self):
         self.buzzer.stop()  # Stop the sound
 
 
 
 class ServoController:
-    def __init__(self, pin_horizontal, pin_vertical):
+    def __init__(self, pin_horizontal, pin_vertical, on_state=None, **planner_options):
         factory = PiGPIOFactory()
         self.servo_horiz = gpiozero.AngularServo(pin_horizontal, min_angle=0, max_angle=180, 
                                                  min_pulse_width=0.0005, max_pulse_width=0.0024,
@@ -39,33 +53,77 @@ class ServoController:
         self.servo_vert = gpiozero.AngularServo(pin_vertical, min_angle=0, max_angle=180,
                                                 min_pulse_width=0.0005, max_pulse_width=0.0024,
                                                 pin_factory=factory)
-        self.horiz_angle = 90
-        self.vert_angle = 90
-        self.servo_horiz.angle = self.horiz_angle
-        self.servo_vert.angle = self.vert_angle
+        # The planner thread owns the servos, every move below only sets a new target
+        self.planner = MotionPlanner(self.write, pan=90, tilt=90, on_state=on_state, **planner_options)
+        self.planner.start()
+
+    def write(self, horiz_angle, vert_angle):
+        self.servo_horiz.angle = horiz_angle
+        self.servo_vert.angle = vert_angle
 
     def move_horizontal(self, step):
-        self.horiz_angle = max(0, min(180, self.horiz_angle + step))
-        self.servo_horiz.angle = self.horiz_angle
-        return self.horiz_angle
+        return self.planner.move_by(pan=step)[0]
 
     def move_vertical(self, step):
-        self.vert_angle = max(0, min(180, self.vert_angle + step))
-        self.servo_vert.angle = self.vert_angle
-        return self.vert_angle
+        return self.planner.move_by(tilt=step)[1]
+
+    def move_to(self, horiz_angle, vert_angle):
+        # Combined pan+tilt move to absolute angles, None keeps an axis on its target
+        return self.planner.set_target(horiz_angle, vert_angle)
+
+    def set_velocity(self, horiz_velocity, vert_velocity):
+        self.planner.set_velocity(horiz_velocity, vert_velocity)
+
+    def target_angles(self):
+        return self.planner.target_angles()
+
+    def pose(self):
+        return self.planner.pose()
+
+    def stop(self):
+        self.planner.stop()
 
 class Dummy:
     def __init__(self, settings):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.settings = settings["Dummy"]
+        self.queue_settings = settings["queue"]
 
     def init_process(self):
-        self.controller = ServoController(self.settings["pin_horizontal"], self.settings["pin_vertical"])
+        self.redis_conn = redis.Redis(
+            host=self.queue_settings["host"],
+            port=self.queue_settings["port"],
+            db=self.queue_settings["db"]
+        )
+        self.bus = EventBus.from_settings(self.redis_conn, self.queue_settings)
+        self.move_ids = itertools.count(1)
+        self.controller = ServoController(self.settings["pin_horizontal"], self.settings["pin_vertical"],
+                                          on_state=self.publish_motion,
+                                          rate_hz=self.settings.get("motion_rate_hz", 50),
+                                          max_velocity=self.settings.get("motion_max_velocity", 90.0),
+                                          max_acceleration=self.settings.get("motion_max_acceleration", 360.0),
+                                          settle_time=self.settings.get("motion_settle_time", 0.15),
+                                          velocity_timeout=self.settings.get("motion_velocity_timeout", 0.5))
         self.buzzer = BuzzerController(self.settings["buzzer_pin"])  # Add buzzer pin
+        # Sounds play on their own thread, the event loop only queues them
+        self.sequencer = ToneSequencer(self.buzzer, self.settings.get("buzzer_patterns"))
 
         self.app = FastAPI()
+        # Lightweight binary transport for tracking moves, the REST endpoints stay for the UI
+        self.motor_channel = MotorChannelServer(self.controller, self.settings["motor_socket"])
+        self.app.add_event_handler("startup", self.motor_channel.start)
+        self.app.add_event_handler("shutdown", self.motor_channel.stop)
+        self.app.add_event_handler("shutdown", self.controller.stop)
+        self.app.add_event_handler("shutdown", self.sequencer.close)
         self.setup_routes()
 
+    def publish_motion(self, moving, pan, tilt):
+        # Stamped on the camera sensor clock so frames captured while moving can be told apart
+        try:
+            self.bus.publish(CameraMotionEvent(next(self.move_ids), sensor_time_ns(), moving, pan, tilt))
+        except Exception as e:
+            self.logger.error("Failed to publish camera motion: %s", e)
+
     def setup_routes(self):
         @self.app.post("/move_horizontal")
         async def move_horizontal(request: MoveRequest):
@@ -85,26 +143,72 @@ class Dummy:
                 self.logger.error("Failed to move vertical servo: %s", e)
                 raise HTTPException(status_code=500, detail="Failed to move vertical servo")
 
+        @self.app.post("/move_to")
+        async def move_to(request: MoveToRequest):
+            try:
+                horizontal, vertical = self.controller.move_to(request.horizontal, request.vertical)
+                return {"status": "success", "target_horizontal_angle": horizontal, "target_vertical_angle": vertical}
+            except Exception as e:
+                self.logger.error("Failed to move servos: %s", e)
+                raise HTTPException(status_code=500, detail="Failed to move servos")
+
+        @self.app.post("/velocity")
+        async def velocity(request: VelocityRequest):
+            """Pan/tilt at the given deg/s, the camera stops unless the command is repeated."""
+            try:
+                self.controller.set_velocity(request.horizontal, request.vertical)
+                return {"status": "success"}
+            except Exception as e:
+                self.logger.error("Failed to set servo velocity: %s", e)
+                raise HTTPException(status_code=500, detail="Failed to set servo velocity")
+
+        @self.app.get("/health")
+        async def health():
+            # Probed by the Esteban supervisor, motion and sound run in their own threads
+            if not self.controller.planner.thread.is_alive() or not self.sequencer.thread.is_alive():
+                raise HTTPException(status_code=503, detail="Motion planner or sound sequencer stopped")
+            return {"status": "ok"}
+
+        @self.app.get("/pose")
+        async def pose():
+            return self.controller.pose()
+
+        @self.app.get("/motor_channel/stats")
+        async def motor_channel_stats():
+            return self.motor_channel.stats()
+
+        @self.app.post("/play")
+        async def play(request: PlayRequest):
+            """Queue a named sound pattern, interrupt cuts the current one short."""
+            self.queue_sound(request.pattern, request.interrupt)
+            return {"status": "queued", "pattern": request.pattern}
+
+        @self.app.post("/stop_sound")
+        async def stop_sound():
+            self.sequencer.stop()
+            return {"status": "success"}
+
+        @self.app.get("/sounds")
+        async def sounds():
+            return self.sequencer.stats()
+
         @self.app.post("/photo_taken_sound")
         async def photo_taken_sound():
             """Endpoint to play a sound indicating a photo has been taken."""
-            try:
-                self.buzzer.play_sound(1000, 0.5)  # Play sound at 1000 Hz for 0.5 seconds
-                return {"status": "success", "message": "Photo taken sound played."}
-            except Exception as e:
-                self.logger.error("Failed to play photo taken sound: %s", e)
-                raise HTTPException(status_code=500, detail="Failed to play photo taken sound")
-            
+            self.queue_sound("photo_taken")
+            return {"status": "success", "message": "Photo taken sound queued."}
+
         @self.app.post("/ok_triggered")
         async def ok_triggered():
-            """Endpoint to play a sound indicating a photo has been taken."""
-            try:
-                self.buzzer.play_sound(2000, 0.5)  # Play sound at 1000 Hz for 0.5 seconds
-                return {"status": "success", "message": "Photo taken sound played."}
-            except Exception as e:
-                self.logger.error("Failed to play photo taken sound: %s", e)
-                raise HTTPException(status_code=500, detail="Failed to play photo taken sound")            
-            
+            """Endpoint to play a sound acknowledging the OK gesture."""
+            self.queue_sound("ok_triggered")
+            return {"status": "success", "message": "OK sound queued."}
+
+    def queue_sound(self, pattern, interrupt=False):
+        if pattern not in self.sequencer.patterns:
+            raise HTTPException(status_code=404, detail=f"Unknown sound pattern {pattern}")
+        if not self.sequencer.play(pattern, interrupt):
+            raise HTTPException(status_code=503, detail="Sound queue is full")
 
     def run(self):
         self.init_process()
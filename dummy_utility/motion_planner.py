@@ -0,0 +1,206 @@
+# dummy_utility/motion_planner.py
+import logging
+import math
+import threading
+import time
+
+class Axis:
+    """Trajectory state of one servo axis."""
+
+    def __init__(self, position, min_angle, max_angle):
+        self.min_angle = float(min_angle)
+        self.max_angle = float(max_angle)
+        self.position = float(position)
+        self.velocity = 0.0
+        self.target = float(position)
+        self.commanded_velocity = None  # Set in velocity mode, None while following a target
+
+    def clamp(self, angle):
+        return max(self.min_angle, min(self.max_angle, angle))
+
+    def step(self, dt, max_velocity, max_acceleration):
+        if self.commanded_velocity is not None:
+            desired = self.commanded_velocity
+            # Brake in time to stop at the end of travel
+            limit = self.max_angle if desired > 0 else self.min_angle
+            brake = self.stopping_speed(abs(limit - self.position), dt, max_acceleration)
+            desired = math.copysign(min(abs(desired), brake), desired)
+        else:
+            distance = self.target - self.position
+            desired = math.copysign(min(max_velocity, self.stopping_speed(abs(distance), dt, max_acceleration)),
+                                    distance)
+        dv = max(-max_acceleration * dt, min(max_acceleration * dt, desired - self.velocity))
+        self.velocity += dv
+        previous = self.position
+        unclamped = self.position + self.velocity * dt
+        self.position = self.clamp(unclamped)
+        if self.position != unclamped:
+            self.velocity = 0.0  # Hit the end of travel
+        if self.commanded_velocity is None and abs(self.velocity) <= max_acceleration * dt:
+            # Snap onto the target instead of oscillating around it, only when that stop is within
+            # the acceleration limit. Faster, the axis brakes through the target and comes back.
+            if (self.target - previous) * (self.target - self.position) <= 0 or \
+                    abs(self.target - self.position) < 0.05:
+                self.position = self.target
+                self.velocity = 0.0
+
+    @staticmethod
+    def stopping_speed(distance, dt, max_acceleration):
+        """Fastest speed from which slowing down by max_acceleration * dt every step stops within distance."""
+        if dt <= 0:
+            return math.sqrt(2 * max_acceleration * distance)
+        step = max_acceleration * dt
+        # Whole steps of braking that fit in the distance, the remainder is spread over them
+        steps = int((math.sqrt(1 + 8 * distance / (dt * step)) - 1) / 2)
+        return (distance / dt + step * steps * (steps + 1) / 2) / (steps + 1)
+
+    def idle(self):
+        if self.commanded_velocity is not None:
+            return self.commanded_velocity == 0 and self.velocity == 0
+        return self.position == self.target and self.velocity == 0
+
+
+class MotionPlanner:
+    """Background thread owning the pan/tilt servos, moving them along acceleration-limited trajectories.
+
+    Callers only set targets or velocities and never block. The loop ticks at a fixed control rate
+    while something moves and sleeps otherwise. on_state(moving, pan, tilt) is called from the
+    planner thread when the camera starts moving and once it has settled again.
+    """
+
+    def __init__(self, write, pan=90, tilt=90, min_angle=0, max_angle=180, rate_hz=50, max_velocity=90.0,
+                 max_acceleration=360.0, settle_time=0.15, velocity_timeout=0.5, on_state=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.write = write  # Called with (pan, tilt) whenever the commanded angles change
+        self.period = 1.0 / rate_hz
+        self.max_velocity = max_velocity
+        self.max_acceleration = max_acceleration
+        self.settle_time = settle_time  # Time given to the servo horns to catch up with the last command
+        self.velocity_timeout = velocity_timeout  # Velocity commands decay to a stop unless refreshed
+        self.on_state = on_state
+        self.axes = (Axis(pan, min_angle, max_angle), Axis(tilt, min_angle, max_angle))
+        self.moving = False
+        self.settled_at = time.monotonic()
+        self.velocity_deadline = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+        self.write(pan, tilt)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.loop, name="motion-planner", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join()
+
+    def set_target(self, pan=None, tilt=None):
+        """Move to absolute angles, None leaving an axis on its current target. Returns the clamped targets."""
+        with self.lock:
+            for axis, angle in zip(self.axes, (pan, tilt)):
+                if angle is None and axis.commanded_velocity is None:
+                    continue
+                axis.commanded_velocity = None
+                axis.target = axis.clamp(axis.position if angle is None else float(angle))
+            targets = self.targets()
+        self.wakeup.set()
+        return targets
+
+    def move_by(self, pan=0.0, tilt=0.0):
+        current = self.target_angles()
+        return self.set_target(current[0] + pan, current[1] + tilt)
+
+    def set_velocity(self, pan=0.0, tilt=0.0):
+        """Move at the given deg/s until the next command or the velocity timeout."""
+        with self.lock:
+            for axis, velocity in zip(self.axes, (pan, tilt)):
+                axis.commanded_velocity = max(-self.max_velocity, min(self.max_velocity, float(velocity)))
+            self.velocity_deadline = time.monotonic() + self.velocity_timeout
+        self.wakeup.set()
+
+    def target_angles(self):
+        with self.lock:
+            return self.targets()
+
+    def targets(self):
+        # A velocity driven axis has no target of its own, report where it currently is
+        return tuple(axis.position if axis.commanded_velocity is not None else axis.target for axis in self.axes)
+
+    def pose(self):
+        with self.lock:
+            pan, tilt = self.axes
+            targets = self.targets()
+            return {
+                "pan": pan.position,
+                "tilt": tilt.position,
+                "pan_velocity": pan.velocity,
+                "tilt_velocity": tilt.velocity,
+                "target_pan": targets[0],
+                "target_tilt": targets[1],
+                "settled": not self.moving,
+                "settled_for": time.monotonic() - self.settled_at if not self.moving else 0.0,
+            }
+
+    def settled(self):
+        with self.lock:
+            return not self.moving
+
+    def loop(self):
+        last = time.monotonic()
+        idle_since = None
+        while self.running:
+            now = time.monotonic()
+            dt = min(now - last, 4 * self.period)
+            last = now
+            with self.lock:
+                if self.velocity_deadline is not None and now >= self.velocity_deadline:
+                    for axis in self.axes:
+                        if axis.commanded_velocity is not None:
+                            axis.commanded_velocity = 0.0
+                    self.velocity_deadline = None
+                before = tuple(axis.position for axis in self.axes)
+                for axis in self.axes:
+                    axis.step(dt, self.max_velocity, self.max_acceleration)
+                pose = tuple(axis.position for axis in self.axes)
+                idle = all(axis.idle() for axis in self.axes)
+                started = not self.moving and not idle
+                if started:
+                    self.moving = True
+            if pose != before:
+                try:
+                    self.write(*pose)
+                except Exception as e:
+                    self.logger.error("Failed to drive servos: %s", e)
+            if started:
+                self.notify(True, pose)
+            if idle:
+                idle_since = idle_since or now
+                if self.moving and now - idle_since >= self.settle_time:
+                    with self.lock:
+                        self.moving = False
+                        self.settled_at = now
+                    self.notify(False, pose)
+                if not self.moving:
+                    # Nothing to do until the next command
+                    self.wakeup.wait()
+                    self.wakeup.clear()
+                    last = time.monotonic()
+                    idle_since = None
+                    continue
+            else:
+                idle_since = None
+            self.wakeup.wait(self.period)
+            self.wakeup.clear()
+
+    def notify(self, moving, pose):
+        if self.on_state is None:
+            return
+        try:
+            self.on_state(moving, *pose)
+        except Exception as e:
+            self.logger.error("Error reporting motion state: %s", e)
@@ -0,0 +1,44 @@
+# dummy_utility/simulated_servos.py
+import threading
+from dummy_utility.motion_planner import MotionPlanner
+
+class SimulatedServoController:
+    """ServoController without the hardware: the same motion planner, driving a record of angles.
+
+    Used to exercise the motor channel and the planner off the Raspberry Pi. writes holds every
+    (pan, tilt) the planner commanded and targets every target it was asked to move to.
+    """
+
+    def __init__(self, pan=90, tilt=90, on_state=None, **planner_options):
+        self.writes = []
+        self.targets = []
+        self.lock = threading.Lock()
+        self.planner = MotionPlanner(self.write, pan=pan, tilt=tilt, on_state=on_state, **planner_options)
+        self.planner.start()
+
+    def write(self, horiz_angle, vert_angle):
+        with self.lock:
+            self.writes.append((horiz_angle, vert_angle))
+
+    def move_horizontal(self, step):
+        return self.planner.move_by(pan=step)[0]
+
+    def move_vertical(self, step):
+        return self.planner.move_by(tilt=step)[1]
+
+    def move_to(self, horiz_angle, vert_angle):
+        with self.lock:
+            self.targets.append((horiz_angle, vert_angle))
+        return self.planner.set_target(horiz_angle, vert_angle)
+
+    def set_velocity(self, horiz_velocity, vert_velocity):
+        self.planner.set_velocity(horiz_velocity, vert_velocity)
+
+    def target_angles(self):
+        return self.planner.target_angles()
+
+    def pose(self):
+        return self.planner.pose()
+
+    def stop(self):
+        self.planner.stop()
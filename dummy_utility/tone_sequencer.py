@@ -0,0 +1,101 @@
+# dummy_utility/tone_sequencer.py
+import logging
+import queue
+import threading
+
+# Named patterns as (frequency Hz, duration s) notes, a frequency of 0 is a rest
+PATTERNS = {
+    "photo_taken": [(1000, 0.5)],
+    "ok_triggered": [(2000, 0.5)],
+    "countdown": [(1500, 0.1), (0, 0.6), (1500, 0.1), (0, 0.6), (2500, 0.4)],
+    "error": [(3000, 0.05), (0, 0.05), (3000, 0.05), (0, 0.05), (1200, 0.3)],
+    "ready": [(1000, 0.08), (1500, 0.08), (2000, 0.12)],
+}
+
+
+class ToneSequencer:
+    """Plays tones and multi-note patterns on a worker thread so callers never wait for the buzzer.
+
+    Requests are queued and played in order. An interrupting request cuts the current pattern
+    short and drops everything still queued.
+    """
+
+    def __init__(self, buzzer, patterns=None, max_queued=8):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.buzzer = buzzer
+        self.patterns = {**PATTERNS, **(patterns or {})}
+        self.requests = queue.Queue(maxsize=max_queued)
+        self.interrupted = threading.Event()
+        self.current = None
+        self.played = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.loop, name="tone-sequencer", daemon=True)
+        self.thread.start()
+
+    def play(self, pattern, interrupt=False):
+        """Queue a named pattern, False when it is unknown or the queue is full."""
+        notes = self.patterns.get(pattern)
+        if notes is None:
+            return False
+        if interrupt:
+            self.clear()
+            self.interrupted.set()
+        try:
+            self.requests.put_nowait((pattern, notes))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.logger.warning("Buzzer queue full, dropping pattern %s", pattern)
+            return False
+
+    def stop(self):
+        """Silence the buzzer and forget queued patterns."""
+        self.clear()
+        self.interrupted.set()
+
+    def clear(self):
+        while True:
+            try:
+                self.requests.get_nowait()
+            except queue.Empty:
+                return
+
+    def loop(self):
+        while True:
+            pattern, notes = self.requests.get()
+            if pattern is None:
+                return
+            # Interruptions aimed at a previous pattern must not cut this one
+            self.interrupted.clear()
+            self.current = pattern
+            try:
+                for frequency, duration in notes:
+                    if frequency:
+                        self.buzzer.tone_on(frequency)
+                    else:
+                        self.buzzer.tone_off()
+                    if self.interrupted.wait(duration):
+                        break
+                self.played += 1
+            except Exception as e:
+                self.logger.error("Error playing pattern %s: %s", pattern, e)
+            finally:
+                self.current = None
+                try:
+                    self.buzzer.tone_off()
+                except Exception as e:
+                    self.logger.error("Failed to silence buzzer: %s", e)
+
+    def close(self):
+        self.stop()
+        self.requests.put((None, None))
+        self.thread.join()
+
+    def stats(self):
+        return {
+            "playing": self.current,
+            "queued": self.requests.qsize(),
+            "played": self.played,
+            "dropped": self.dropped,
+            "patterns": sorted(self.patterns),
+        }
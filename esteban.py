@@ -1,14 +1,15 @@
+import asyncio
 import logging
 import os
 import json
 import signal
 import sys
-from datetime import datetime, timedelta
-from multiprocessing import Process
+import threading
+from functools import partial
 from fastapi import FastAPI, HTTPException, Query, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from glob import glob
+import redis
 import uvicorn
 from time import sleep
 
@@ -18,16 +19,33 @@ from showbot import ShowBot
 from palmist import Palmist
 from brainy import Brainy
 from dummy import Dummy
-
+from esteban_utility.log_index import LogIndexes
+from esteban_utility.log_pipeline import LogPipeline, log_to_console
+from esteban_utility.supervisor import (Service, Supervisor, run_service, reset_signals, http_probe, redis_probe,
+                                        heartbeat_probe)
+from service_client import SERVICE_PORTS
+
+SERVICE_CLASSES = {"CameraBot": CameraBot, "Dummy": Dummy, "Palmist": Palmist, "ShowBot": ShowBot, "Brainy": Brainy}
+
+# Each service starts once the services it depends on answer their readiness probe
+DEPENDENCIES = {
+    "Redis": (),
+    "CameraBot": ("Redis",),
+    "Dummy": ("Redis",),
+    "Palmist": ("CameraBot",),
+    "ShowBot": ("CameraBot",),
+    "Brainy": ("Palmist", "Dummy"),
+    "LogViewer": (),
+}
 
 
 class Esteban:
     def __init__(self, config_path):
         try:
-            setup_logging()
             self.logger = logging.getLogger(self.__class__.__name__)  # Logger with class name
             self.settings = self.load_settings(config_path)
-            self.processes = []  
+            self.log_pipeline = LogPipeline.from_settings(self.settings["Esteban"])
+            self.supervisor = None
             signal.signal(signal.SIGTERM, self.terminate_processes)  # Register signal handler
             signal.signal(signal.SIGINT, self.terminate_processes)
             self.logger.info("Esteban initialized with configuration file %s", config_path)
@@ -48,66 +66,105 @@ class Esteban:
         app = FastAPI()
 
         templates = Jinja2Templates(directory="templates")
+        log_indexes = LogIndexes(self.settings["Esteban"]["log_dir"])
+
+        def log_index(filename):
+            index = log_indexes.get(filename)
+            if index is None:
+                raise HTTPException(status_code=404, detail="Log file not found")
+            return index
+
+        def query_logs(filename, limit, cursor, since, until, level, service):
+            try:
+                return log_index(filename).query(max(1, min(limit, 1000)), cursor, since, until, level, service)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
         @app.get("/", response_class=HTMLResponse)
         async def read_root(request: Request) -> HTMLResponse:
-            log_files = glob("/home/pi/estevan/log/*.log")
-            log_files = [os.path.basename(f) for f in log_files]  # Get only the file names
-            return templates.TemplateResponse("log_view.html", {"request": request, "log_files": log_files})
+            return templates.TemplateResponse("log_view.html", {"request": request, "log_files": log_indexes.files()})
 
         @app.get("/logs/{filename}", response_class=HTMLResponse)
-        async def read_log_file(request: Request, filename: str, level: str = Query(None)) -> HTMLResponse:
-            try:
-                file_path = os.path.join("/home/pi/estevan/log", filename)
-                if not os.path.isfile(file_path):
-                    raise HTTPException(status_code=404, detail="Log file not found")
-
-                log_entries = []
-                with open(file_path, 'r') as file:
-                    for line in file:
-                        # Split the line by " - "
-                        parts = line.split(" - ")
-                        
-                        # Check if the line has the expected number of parts
-                        if len(parts) == 4:
-                            log_entry = {
-                                "date": parts[0].strip(),        # The date and time
-                                "type": parts[1].strip(),        # The type of log (e.g., INFO)
-                                "service": parts[2].strip(),     # The service name
-                                "message": parts[3].strip()      # The log message
-                            }
-                            log_entries.append(log_entry)
-                            
-                log_entries.sort(key=lambda entry: entry["datetime"], reverse=True)
-                return templates.TemplateResponse("log_view.html", {"request": request, "log_files": glob("/home/pi/estevan/log/*.log"), "log_entries": log_entries})
-            except Exception as e:
-                self.logger.error("Error serving logs: %s", e)
+        async def read_log_file(request: Request, filename: str, level: str = Query(None), service: str = None,
+                                since: str = None, until: str = None, cursor: str = None,
+                                limit: int = 200) -> HTMLResponse:
+            # Newest records first, only the index blocks that may match are read
+            log_entries, next_cursor = await asyncio.to_thread(query_logs, filename, limit, cursor, since, until,
+                                                               level, service)
+            return templates.TemplateResponse("log_view.html", {
+                "request": request, "log_files": log_indexes.files(), "filename": filename,
+                "log_entries": log_entries, "next_cursor": next_cursor, "level": level or "",
+                "service": service or "", "since": since or "", "until": until or ""})
+
+        @app.get("/api/logs/{filename}")
+        async def query_log_file(filename: str, level: str = None, service: str = None, since: str = None,
+                                 until: str = None, cursor: str = None, limit: int = 200):
+            entries, next_cursor = await asyncio.to_thread(query_logs, filename, limit, cursor, since, until,
+                                                           level, service)
+            return {"entries": entries, "next_cursor": next_cursor}
+
+        @app.get("/logs/{filename}/tail")
+        async def tail_log_file(request: Request, filename: str, level: str = None, service: str = None):
+            # Server-sent events, EventSource reconnects with Last-Event-ID and resumes where it stopped
+            last_event_id = request.headers.get("last-event-id")
+            last_offset = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+            return StreamingResponse(log_index(filename).tail(last_offset, level, service),
+                                     media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
         return app
     
-    def start_service(self, service_class):
-        try:
-            service = service_class(self.settings)  # Pass the full settings object
-            process = Process(target=service.run)
-            process.start()
-            self.logger.info("%s service started in a new process with PID %s", service_class.__name__, process.pid)
-            return process
-        except Exception as e:
-            self.logger.error("Error starting %s service: %s", service_class.__name__, e)
+    def create_services(self):
+        queue_settings = self.settings["queue"]
+        redis_conn = redis.Redis(host=queue_settings["host"], port=queue_settings["port"], db=queue_settings["db"],
+                                 socket_timeout=0.5)
+        services = [Service("Redis", None, DEPENDENCIES["Redis"], redis_probe(redis_conn))]
+        for name, service_class in SERVICE_CLASSES.items():
+            if name in SERVICE_PORTS:
+                probe = http_probe(self.settings[name][SERVICE_PORTS[name]])
+            else:
+                # Brainy has no HTTP server, its event loop keeps a heartbeat key alive instead
+                probe = heartbeat_probe(redis_conn, self.settings[name]["heartbeat_key"])
+            services.append(Service(name, partial(run_service, service_class, self.settings), DEPENDENCIES[name], probe))
+        services.append(Service("LogViewer", self.run_log_viewer, DEPENDENCIES["LogViewer"],
+                                http_probe(self.settings["Esteban"]["logging_port"], "/")))
+        return services
+
+    def run_log_viewer(self):
+        reset_signals()
+        uvicorn.run(self.create_logging_app(), host="0.0.0.0", port=self.settings["Esteban"]["logging_port"])
+
+    def create_status_app(self):
+        app = FastAPI()
 
-    def run(self):
-        try:
-            for service_class in [CameraBot, ShowBot, Palmist, Brainy, Dummy]:
-                self.start_service(service_class)
+        @app.get("/status")
+        async def status():
+            # Uptime, restarts and last exit reason of every service
+            return self.supervisor.status()
 
-            app = self.create_logging_app()
-            uvicorn_process = Process(target=lambda: uvicorn.run(app, host="0.0.0.0", port=self.settings["Esteban"]["logging_port"]), daemon=True)
-            uvicorn_process.start()
-            self.processes.append(uvicorn_process)
+        @app.post("/services/{name}/restart")
+        async def restart_service(name: str):
+            try:
+                self.supervisor.restart(name)
+            except KeyError:
+                raise HTTPException(status_code=404, detail="Unknown service")
+            return {"status": "restarting", "service": name}
+
+        return app
 
-            for process in self.processes:
-                if process.is_alive():
-                    process.join()
+    def start_status_server(self):
+        # Runs in a thread of this process, where the supervisor state lives
+        config = uvicorn.Config(self.create_status_app(), host="0.0.0.0",
+                                port=self.settings["Esteban"]["status_port"], log_level="warning")
+        threading.Thread(target=uvicorn.Server(config).run, name="status-server", daemon=True).start()
+
+    def run(self):
+        try:
+            # A single collector process writes the log file, the services forked later send it their records.
+            # Started here rather than in __init__, so a retried Esteban never leaves a second collector behind
+            self.log_pipeline.start()
+            self.supervisor = Supervisor(self.create_services(), **self.settings["Esteban"].get("supervisor", {}))
+            self.start_status_server()
+            self.supervisor.serve()
             self.logger.info("All services have completed execution.")
         except Exception as e:
             self.logger.error("Error running Esteban services: %s", e)
@@ -115,14 +172,14 @@ class Esteban:
 
     def terminate_processes(self, signum=None, frame=None):
         self.logger.info("Terminating all processes.")
-        for process in self.processes:
-            if process.is_alive():
-                self.logger.info("Terminating process with PID %s.", process.pid)
-                process.terminate()
-                process.join()
+        if self.supervisor:
+            self.supervisor.stop()
         self.logger.info("All processes terminated.")
+        self.log_pipeline.stop()
 
 if __name__ == "__main__":
+    # Until run() starts the log pipeline, and again between retries, records go to stderr
+    log_to_console()
     retry_count = 3 
     for attempt in range(retry_count):
         try:
@@ -135,20 +192,3 @@ if __name__ == "__main__":
     else:
         logging.critical("Esteban failed to start after %d attempts. Exiting.", retry_count)
         sys.exit(1)
-
-
-def setup_logging():
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",handlers=[
-            logging.FileHandler("/home/pi/estevan/log/esteban.log"),
-            logging.StreamHandler()  # Optional: log to console
-            ])
-    log_dir = "/home/pi/estevan/log"
-    os.makedirs(log_dir, exist_ok=True)  # Create log directory if it doesn't exist
-    log_filename = os.path.join(log_dir, "esteban.log")
-    
-    if os.path.exists(log_filename):
-        file_mod_time = os.path.getmtime(log_filename)
-        file_mod_datetime = datetime.fromtimestamp(file_mod_time)
-        if datetime.now() - file_mod_datetime > timedelta(days=1):
-            new_filename = os.path.join(log_dir, f"esteban_{file_mod_datetime.strftime('%Y%m%d_%H%M%S')}.log")
-            os.rename(log_filename, new_filename)  # Rename the old log file
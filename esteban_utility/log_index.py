@@ -0,0 +1,214 @@
+# esteban_utility/log_index.py
+import asyncio
+import json
+import os
+import re
+import threading
+from collections import namedtuple
+
+BLOCK_SIZE = 64 * 1024
+LEVELS = {"DEBUG": 1, "INFO": 2, "WARNING": 4, "ERROR": 8, "CRITICAL": 16}
+# "%(asctime)s - %(levelname)s - ...", lines that don't start like this continue the previous record
+RECORD_START = re.compile(rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - ([A-Z]+) - ")
+
+# Byte range [start, end) of the file starting on a record, with the time span and levels inside it
+Block = namedtuple("Block", "start end first_time last_time levels")
+
+
+def level_mask(levels):
+    if not levels:
+        return sum(LEVELS.values())
+    return sum(LEVELS.get(level.strip().upper(), 0) for level in levels.split(","))
+
+
+def normalize_time(value):
+    # Accept "2024-05-01 10:00", "2024-05-01T10:00:00" and alike, compared as text with asctime
+    return value.replace("T", " ") if value else None
+
+
+def parse_record(offset, data):
+    text = data.decode("utf-8", errors="replace").rstrip("\n")
+    parts = text.split(" - ", 3)  # The message may contain the separator itself
+    if len(parts) < 4:
+        parts += [""] * (4 - len(parts))
+    return {"offset": offset, "date": parts[0], "type": parts[1], "service": parts[2], "message": parts[3]}
+
+
+def split_records(data, start):
+    """(offset, bytes) of every record in data read at offset start, continuation lines included."""
+    records = []
+    offset = start
+    for line in data.splitlines(keepends=True):
+        if RECORD_START.match(line) or not records:
+            records.append((offset, [line]))
+        else:
+            records[-1][1].append(line)
+        offset += len(line)
+    return [(record_offset, b"".join(lines)) for record_offset, lines in records]
+
+
+def read_records(file, start, end):
+    file.seek(start)
+    return split_records(file.read(end - start), start)
+
+
+class LogIndex:
+    """Sparse index of one log file: a block every BLOCK_SIZE bytes with its time span and levels.
+
+    The index grows with the file, each refresh only reads the bytes written since the last one,
+    and queries walk the blocks from the end of the file, reading only those that may match.
+    A truncated or replaced file is indexed again from the start.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, inode):
+        self.inode = inode
+        self.blocks = []
+        self.scan_pos = 0  # Everything before is indexed, always the start of a line
+        self.open_block = None  # [start, first_time, last_time, levels] of the block still growing
+
+    def refresh(self):
+        with self.lock:
+            stat = os.stat(self.path)
+            if stat.st_ino != self.inode or stat.st_size < self.scan_pos:
+                self.reset(stat.st_ino)
+            if stat.st_size == self.scan_pos:
+                return
+            with open(self.path, "rb") as file:
+                file.seek(self.scan_pos)
+                offset = self.scan_pos
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # Still being written
+                    self.index_line(offset, line)
+                    offset += len(line)
+                self.scan_pos = offset
+
+    def index_line(self, offset, line):
+        match = RECORD_START.match(line)
+        if self.open_block is None:
+            self.open_block = [offset, None, None, 0]
+        if match is None:
+            return
+        if offset - self.open_block[0] >= BLOCK_SIZE:
+            # Blocks only close on a record start, so a record never spans two of them
+            self.blocks.append(Block(self.open_block[0], offset, *self.open_block[1:]))
+            self.open_block = [offset, None, None, 0]
+        timestamp = match.group(1).decode()
+        block = self.open_block
+        block[1] = min(block[1], timestamp) if block[1] else timestamp
+        block[2] = max(block[2], timestamp) if block[2] else timestamp
+        block[3] |= LEVELS.get(match.group(2).decode(), 0)
+
+    def all_blocks(self):
+        with self.lock:
+            blocks = list(self.blocks)
+            if self.open_block:
+                blocks.append(Block(self.open_block[0], self.scan_pos, *self.open_block[1:]))
+            return blocks, self.inode
+
+    def query(self, limit=100, cursor=None, since=None, until=None, levels=None, service=None):
+        """Newest first page of records and the cursor of the next page (None on the last one).
+
+        The cursor is "inode:offset", records before offset in the same file come next.
+        """
+        self.refresh()
+        blocks, inode = self.all_blocks()
+        before = None
+        if cursor:
+            cursor_inode, before = (int(value) for value in cursor.split(":", 1))
+            if cursor_inode != inode:
+                raise ValueError("The log file was rotated, start from the newest records again")
+        since, until = normalize_time(since), normalize_time(until)
+        mask = level_mask(levels)
+
+        results = []
+        with open(self.path, "rb") as file:
+            for block in reversed(blocks):
+                if before is not None and block.start >= before:
+                    continue
+                if block.first_time is None or not block.levels & mask:
+                    continue
+                if (since and block.last_time < since) or (until and block.first_time >= until):
+                    continue
+                for offset, data in reversed(read_records(file, block.start, block.end)):
+                    if before is not None and offset >= before:
+                        continue
+                    record = parse_record(offset, data)
+                    if not self.matches(record, since, until, mask, service):
+                        continue
+                    results.append(record)
+                    if len(results) > limit:
+                        return results[:limit], f"{inode}:{results[limit - 1]['offset']}"
+        return results, None
+
+    @staticmethod
+    def matches(record, since, until, mask, service):
+        if not LEVELS.get(record["type"], 0) & mask:
+            return False
+        if (since and record["date"] < since) or (until and record["date"] >= until):
+            return False
+        return not service or service.lower() in record["service"].lower()
+
+    async def tail(self, last_offset=None, levels=None, service=None, interval=0.5, keepalive=15.0):
+        """Server-sent events with the records written after last_offset (the end of the file by default)."""
+        mask = level_mask(levels)
+        stat = os.stat(self.path)
+        inode, position = stat.st_ino, stat.st_size
+        if last_offset is not None and last_offset < stat.st_size:
+            # Resume after the last record the client got, Last-Event-ID being its offset
+            with open(self.path, "rb") as file:
+                records = read_records(file, last_offset, stat.st_size)
+            position = records[1][0] if len(records) > 1 else stat.st_size
+        seen_end = None
+        idle = 0.0
+        while True:
+            stat = os.stat(self.path)
+            if stat.st_ino != inode or stat.st_size < position:
+                inode, position, seen_end = stat.st_ino, 0, None  # Rotated, follow the new file
+            if stat.st_size > position:
+                with open(self.path, "rb") as file:
+                    file.seek(position)
+                    chunk = file.read(stat.st_size - position)
+                complete_end = position + chunk.rfind(b"\n") + 1
+                records = split_records(chunk[:complete_end - position], position)
+                # The last record may still get continuation lines, it waits until the file stops growing
+                if records and complete_end != seen_end:
+                    records = records[:-1]
+                for offset, data in records:
+                    record = parse_record(offset, data)
+                    if self.matches(record, None, None, mask, service):
+                        yield f"id: {offset}\ndata: {json.dumps(record)}\n\n"
+                        idle = 0.0
+                if records:
+                    position = records[-1][0] + len(records[-1][1])
+                seen_end = complete_end
+            if idle >= keepalive:
+                yield ": keepalive\n\n"
+                idle = 0.0
+            await asyncio.sleep(interval)
+            idle += interval
+
+class LogIndexes:
+    """One LogIndex per file of the log directory, built on first use."""
+
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def files(self):
+        return sorted(name for name in os.listdir(self.log_dir) if name.endswith(".log"))
+
+    def get(self, filename):
+        path = os.path.join(self.log_dir, filename)
+        if os.path.basename(filename) != filename or not filename.endswith(".log") or not os.path.isfile(path):
+            return None
+        with self.lock:
+            if filename not in self.indexes:
+                self.indexes[filename] = LogIndex(path)
+            return self.indexes[filename]
@@ -0,0 +1,209 @@
+# esteban_utility/log_pipeline.py
+import glob
+import gzip
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import sys
+import threading
+import time
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+
+def log_to_console(level=logging.INFO):
+    """Send the records of this process to stderr, while no collector is running."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the collector without ever blocking, counting the ones a full queue drops."""
+
+    def __init__(self, log_queue, dropped):
+        super().__init__(log_queue)
+        self.dropped = dropped
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.dropped.get_lock():
+                self.dropped.value += 1
+
+
+class LogCollector:
+    """The only writer of the log file, fed by every process through a bounded queue.
+
+    Records are written in batches, flushed every flush_interval seconds or batch_size records.
+    The file rotates past max_bytes or rotate_interval seconds, rotated files are compressed in
+    the background and only the backup_count newest are kept.
+    """
+
+    def __init__(self, log_queue, dropped, path, batch_size=500, flush_interval=1.0, max_bytes=20 * 1024 * 1024,
+                 rotate_interval=86400, backup_count=10, console=True):
+        self.queue = log_queue
+        self.dropped = dropped
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.console = console
+        self.formatter = logging.Formatter(LOG_FORMAT)
+        self.file = None
+        self.size = 0
+        self.opened_at = 0.0
+        self.reported_drops = 0
+        self.compressors = []
+        self.rotated_stamp = None
+        self.rotated_index = 0
+        self.compress_lock = threading.Lock()
+
+    def run(self):
+        # Esteban stops the collector last, after the services flushed their final records
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path) and time.time() - os.path.getmtime(self.path) > self.rotate_interval:
+            self.rotate()
+        self.open()
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if record is None:
+                    running = False
+                    break
+                batch.append(self.formatter.format(record))
+            self.report_drops(batch)
+            if batch:
+                self.write("\n".join(batch) + "\n")
+        self.file.close()
+        for compressor in self.compressors:
+            compressor.join()
+
+    def report_drops(self, batch):
+        dropped = self.dropped.value
+        if dropped != self.reported_drops:
+            record = logging.makeLogRecord({"name": self.__class__.__name__, "levelno": logging.WARNING,
+                                            "levelname": "WARNING", "msg": "%s log record(s) dropped, the queue was full.",
+                                            "args": (dropped - self.reported_drops,)})
+            batch.append(self.formatter.format(record))
+            self.reported_drops = dropped
+
+    def write(self, data):
+        encoded = data.encode("utf-8", errors="replace")
+        if self.size and (self.size + len(encoded) > self.max_bytes
+                          or time.time() - self.opened_at > self.rotate_interval):
+            self.file.close()
+            self.rotate()
+            self.open()
+        self.file.write(encoded)
+        self.file.flush()
+        self.size += len(encoded)
+        if self.console:
+            sys.stderr.write(data)
+
+    def open(self):
+        self.file = open(self.path, "ab")
+        self.size = self.file.tell()
+        self.opened_at = time.time()
+
+    def rotate(self):
+        base, ext = os.path.splitext(self.path)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        if stamp != self.rotated_stamp:
+            self.rotated_stamp, self.rotated_index = stamp, 0
+        # Names only ever grow within a second, pruning keeps the last ones in name order and may
+        # already have removed an earlier archive of the same second
+        while True:
+            suffix = f"_{self.rotated_index:03d}" if self.rotated_index else ""
+            rotated = f"{base}_{stamp}{suffix}{ext}"
+            self.rotated_index += 1
+            if not os.path.exists(rotated) and not os.path.exists(rotated + ".gz"):
+                break
+        os.rename(self.path, rotated)
+        self.compressors = [compressor for compressor in self.compressors if compressor.is_alive()]
+        compressor = threading.Thread(target=self.compress, args=(rotated,), name="log-compressor")
+        compressor.start()
+        self.compressors.append(compressor)
+
+    def compress(self, path):
+        # One at a time, so pruning never removes an archive another compressor is still writing
+        with self.compress_lock:
+            try:
+                with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(path)
+                base, ext = os.path.splitext(self.path)
+                for old in sorted(glob.glob(f"{base}_*{ext}.gz"))[:-self.backup_count or None]:
+                    os.remove(old)
+            except OSError as e:
+                sys.stderr.write(f"Error compressing {path}: {e}\n")
+
+
+class LogPipeline:
+    """Owns the collector process and routes the records of this process and its children to it.
+
+    Services are forked after start(), so they inherit the queue handler of the root logger.
+    """
+
+    def __init__(self, path, queue_size=10000, level=logging.INFO, **collector_options):
+        self.path = path
+        self.level = level
+        self.queue = multiprocessing.Queue(maxsize=queue_size)
+        self.dropped = multiprocessing.Value("Q", 0)
+        self.collector = LogCollector(self.queue, self.dropped, path, **collector_options)
+        self.process = None
+        self.owner_pid = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(os.path.join(settings["log_dir"], settings.get("log_file", "esteban.log")),
+                   queue_size=settings.get("log_queue_size", 10000),
+                   level=settings.get("log_level", "INFO"),
+                   batch_size=settings.get("log_batch_size", 500),
+                   flush_interval=settings.get("log_flush_interval", 1.0),
+                   max_bytes=settings.get("log_max_bytes", 20 * 1024 * 1024),
+                   rotate_interval=settings.get("log_rotate_interval", 86400),
+                   backup_count=settings.get("log_backup_count", 10))
+
+    def start(self):
+        self.process = multiprocessing.Process(target=self.collector.run, name="log-collector")
+        self.process.start()
+        self.owner_pid = os.getpid()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(DroppingQueueHandler(self.queue, self.dropped))
+        root.setLevel(self.level)
+
+    def stop(self, timeout=5.0):
+        if self.process is None or os.getpid() != self.owner_pid:
+            return  # Forked services inherit the pipeline, only Esteban stops it
+        # Route late records to stderr, then let the collector drain the queue and exit
+        log_to_console(self.level)
+        try:
+            self.queue.put(None, timeout=timeout)
+            self.process.join(timeout)
+        except queue.Full:
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
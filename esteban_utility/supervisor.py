@@ -0,0 +1,291 @@
+# esteban_utility/supervisor.py
+import logging
+import signal
+import time
+from multiprocessing import Process
+from multiprocessing.connection import wait
+import httpx
+
+
+def reset_signals():
+    # Children inherit Esteban's handlers, but Esteban alone handles Ctrl+C and the shutdown order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def run_service(service_class, settings):
+    """Process target of a service, built in the child so every restart starts from a clean state."""
+    reset_signals()
+    service_class(settings).run()
+
+
+def http_probe(port, path="/health", timeout=0.5):
+    def probe():
+        try:
+            return httpx.get(f"http://localhost:{port}{path}", timeout=timeout).status_code == 200
+        except httpx.HTTPError:
+            return False
+    return probe
+
+
+def redis_probe(redis_conn):
+    def probe():
+        try:
+            return redis_conn.ping()
+        except Exception:
+            return False
+    return probe
+
+
+def heartbeat_probe(redis_conn, key):
+    # The service refreshes a key with a short expiry, it disappears when its loop stalls
+    def probe():
+        try:
+            return bool(redis_conn.exists(key))
+        except Exception:
+            return False
+    return probe
+
+
+def exit_reason(exitcode):
+    if exitcode is None:
+        return None
+    if exitcode < 0:
+        try:
+            return f"killed by {signal.Signals(-exitcode).name}"
+        except ValueError:
+            return f"killed by signal {-exitcode}"
+    return f"exited with code {exitcode}"
+
+
+class Service:
+    """A supervised process, or an external dependency that is only probed when target is None."""
+
+    def __init__(self, name, target, depends_on=(), probe=None):
+        self.name = name
+        self.target = target
+        self.depends_on = tuple(depends_on)
+        self.probe = probe
+        self.process = None
+        self.ready = False
+        self.started_at = None
+        self.ready_at = None
+        self.restarts = 0
+        self.crashes = 0  # Consecutive crashes, reset once the service stays up for a while
+        self.restart_at = time.monotonic()
+        self.last_exit = None
+        self.last_exit_at = None
+        self.kill_reason = None
+        self.kill_deadline = None
+        self.failures = 0
+        self.next_probe = 0.0
+
+    def to_dict(self):
+        now = time.monotonic()
+        if self.target is None:
+            state = "ready" if self.ready else "unavailable"
+        elif self.process is None:
+            state = "waiting"
+        elif self.kill_reason:
+            state = "stopping"
+        else:
+            state = "ready" if self.ready else "starting"
+        return {
+            "name": self.name,
+            "state": state,
+            "pid": self.process.pid if self.process else None,
+            "depends_on": list(self.depends_on),
+            "uptime": now - self.started_at if self.process and self.started_at else None,
+            "ready_in": self.ready_at - self.started_at if self.process and self.ready else None,
+            "restarts": self.restarts,
+            "consecutive_crashes": self.crashes,
+            "last_exit": self.last_exit,
+            "last_exit_at": self.last_exit_at,
+        }
+
+
+class Supervisor:
+    """Starts services in dependency order once their dependencies are ready, and keeps them running.
+
+    Exits are noticed at once through the process sentinels. A crashed service is restarted
+    right away the first time, then with exponential backoff while it keeps crashing, and the
+    others keep running. Services that never become ready or keep failing their health probe
+    are killed and restarted the same way.
+    """
+
+    def __init__(self, services, ready_timeout=60.0, probe_interval=0.1, health_interval=2.0, health_failures=3,
+                 backoff_initial=0.5, backoff_max=30.0, stable_after=30.0, stop_timeout=5.0):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.services = {service.name: service for service in services}
+        self.order = self.resolve_order()
+        self.ready_timeout = ready_timeout
+        self.probe_interval = probe_interval  # Readiness polling of starting services
+        self.health_interval = health_interval
+        self.health_failures = health_failures
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.stop_timeout = stop_timeout
+        self.stopping = False
+
+    def resolve_order(self):
+        order, visiting = [], set()
+
+        def visit(name, path):
+            if name not in self.services:
+                raise ValueError(f"Unknown dependency {name} of {path[-1]}")
+            if name in path:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+            if name in visiting:
+                return
+            visiting.add(name)
+            for dependency in self.services[name].depends_on:
+                visit(dependency, path + (name,))
+            order.append(self.services[name])
+
+        for name in self.services:
+            visit(name, ())
+        return order
+
+    def serve(self):
+        self.logger.info("Supervising %s.", ", ".join(service.name for service in self.order))
+        while not self.stopping:
+            self.spawn_ready()
+            sentinels = {service.process.sentinel: service for service in self.order if service.process}
+            for sentinel in wait(list(sentinels), timeout=self.next_timeout()):
+                self.reap(sentinels[sentinel])
+            if self.stopping:
+                break  # stop() ran in the signal handler while waiting
+            self.probe_all()
+        # A service spawned while stop() was running would otherwise be left behind
+        self.stop()
+        self.logger.info("Supervisor stopped.")
+
+    def spawn_ready(self):
+        now = time.monotonic()
+        for service in self.order:
+            if self.stopping:
+                return
+            if service.target is None or service.process is not None or now < service.restart_at:
+                continue
+            if all(self.services[dependency].ready for dependency in service.depends_on):
+                self.spawn(service)
+
+    def spawn(self, service):
+        service.process = Process(target=service.target, name=service.name)
+        service.process.start()
+        service.started_at = time.monotonic()
+        service.ready = False
+        service.ready_at = None
+        service.failures = 0
+        service.next_probe = 0.0
+        self.logger.info("%s started with PID %s.", service.name, service.process.pid)
+
+    def next_timeout(self):
+        # Sleep until the next probe, restart or kill is due, services waiting on a dependency
+        # are woken by the probes of that dependency
+        now = time.monotonic()
+        deadlines = [now + self.health_interval]
+        for service in self.order:
+            if service.kill_deadline:
+                deadlines.append(service.kill_deadline)
+            if service.target and service.process is None:
+                if service.restart_at > now:
+                    deadlines.append(service.restart_at)
+            elif service.probe and not service.kill_reason:
+                deadlines.append(service.next_probe)
+        return max(min(deadlines) - now, 0.0)
+
+    def reap(self, service):
+        process = service.process
+        if process is None or self.stopping:
+            return  # Already joined by stop()
+        process.join()
+        now = time.monotonic()
+        reason = service.kill_reason or exit_reason(process.exitcode)
+        uptime = now - service.started_at
+        service.process = None
+        service.ready = False
+        service.kill_reason = None
+        service.kill_deadline = None
+        service.last_exit = reason
+        service.last_exit_at = time.time()
+        # The first crash after a stable run restarts at once, repeated ones back off
+        service.crashes = 1 if uptime >= self.stable_after else service.crashes + 1
+        delay = 0.0 if service.crashes <= 1 else \
+            min(self.backoff_initial * 2 ** (service.crashes - 2), self.backoff_max)
+        service.restart_at = now + delay
+        service.restarts += 1
+        self.logger.error("%s %s after %.1fs, restarting in %.1fs.", service.name, reason, uptime, delay)
+
+    def probe_all(self):
+        now = time.monotonic()
+        for service in self.order:
+            if service.kill_deadline and now >= service.kill_deadline and service.process:
+                self.logger.error("%s ignored SIGTERM, killing it.", service.name)
+                service.process.kill()
+                service.kill_deadline = None
+            if not service.probe or now < service.next_probe:
+                continue
+            if service.target and (service.process is None or service.kill_reason):
+                continue
+            healthy = service.probe()
+            if not service.ready:
+                service.next_probe = now + self.probe_interval
+                if healthy:
+                    service.ready = True
+                    service.ready_at = now
+                    service.failures = 0
+                    if service.target:
+                        self.logger.info("%s ready in %.2fs.", service.name, now - service.started_at)
+                    else:
+                        self.logger.info("%s available.", service.name)
+                elif service.target and now - service.started_at > self.ready_timeout:
+                    self.kill(service, f"not ready after {self.ready_timeout:.0f}s")
+                continue
+            service.next_probe = now + self.health_interval
+            service.failures = 0 if healthy else service.failures + 1
+            if service.failures >= self.health_failures:
+                if service.target:
+                    self.kill(service, f"failed {service.failures} health checks")
+                else:
+                    service.ready = False
+                    self.logger.error("%s unavailable.", service.name)
+
+    def kill(self, service, reason):
+        if service.process is None or service.kill_reason:
+            return
+        self.logger.error("Stopping %s: %s.", service.name, reason)
+        service.kill_reason = reason
+        service.kill_deadline = time.monotonic() + self.stop_timeout
+        service.process.terminate()
+
+    def restart(self, name):
+        """Restart a service on request, without counting it as a crash."""
+        service = self.services.get(name)
+        if service is None or service.target is None:
+            raise KeyError(name)
+        service.crashes = 0
+        self.kill(service, "restart requested")
+
+    def status(self):
+        return [service.to_dict() for service in self.order]
+
+    def stop(self):
+        """Stop every service, dependents before their dependencies."""
+        self.stopping = True
+        for service in reversed(self.order):
+            process = service.process
+            if process is None:
+                continue
+            if process.is_alive():
+                self.logger.info("Terminating %s (PID %s).", service.name, process.pid)
+                process.terminate()
+                process.join(self.stop_timeout)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            service.last_exit = "stopped"
+            service.last_exit_at = time.time()
+            service.process = None
+            service.ready = False
@@ -0,0 +1,189 @@
+import logging
+import struct
+from collections import namedtuple
+import numpy as np
+
+# Streams shared by every service. Each entry holds a single binary record under the "d" field.
+GESTURE_STREAM = "gesture_stream"
+HAND_POSITION_STREAM = "hand_position_stream"
+# Positions Palmist extrapolates between inferences, apart so they neither crowd out nor pass for measurements
+HAND_PREDICTION_STREAM = "hand_prediction_stream"
+CAMERA_MOTION_STREAM = "camera_motion_stream"
+HANDS_STREAM = "hands_stream"
+
+# Legacy unbounded lists replaced by the streams above
+LEGACY_QUEUES = ("gesture_queue", "hand_position_queue")
+
+RECORD_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)  # Version 1 hand positions had no velocity, uncertainty or prediction flag
+KIND_GESTURE = 1
+KIND_HAND_POSITION = 2
+KIND_CAMERA_MOTION = 3
+KIND_HANDS = 4
+
+# Canned MediaPipe gestures plus our own "No gesture" marker. Names outside this table are
+# sent inline after the payload with code UNKNOWN_GESTURE.
+GESTURES = ("No gesture", "None", "Closed_Fist", "Open_Palm", "Pointing_Up",
+            "Thumb_Down", "Thumb_Up", "Victory", "ILoveYou")
+GESTURE_CODES = {name: code for code, name in enumerate(GESTURES)}
+UNKNOWN_GESTURE = 255
+
+# version, kind, frame id (move id for camera motion), sensor clock timestamp (ns, CLOCK_BOOTTIME)
+_HEADER = struct.Struct("<BBQQ")
+# gesture code, confidence
+_GESTURE = struct.Struct("<Bf")
+# hand present, x, y (normalized), vx, vy (per second), position std, predicted between frames
+_HAND_POSITION = struct.Struct("<?fffff?")
+_HAND_POSITION_V1 = struct.Struct("<?ff")
+# camera moving, pan angle, tilt angle
+_CAMERA_MOTION = struct.Struct("<?ff")
+# One row per hand seen in a frame, coordinates normalized to the full frame. Gestures use the
+# GESTURES codes, names outside the table are sent as UNKNOWN_GESTURE. Handedness 0 is left,
+# 1 right, 255 unknown.
+HAND_DTYPE = np.dtype([("id", "<u2"), ("cx", "<f4"), ("cy", "<f4"), ("x0", "<f4"), ("y0", "<f4"),
+                       ("x1", "<f4"), ("y1", "<f4"), ("gesture", "u1"), ("handedness", "u1"), ("score", "<f4")])
+
+GestureEvent = namedtuple("GestureEvent", "frame_id timestamp_ns gesture confidence")
+# Predicted positions keep the frame id of the last measured frame they extrapolate from
+HandPositionEvent = namedtuple("HandPositionEvent", "frame_id timestamp_ns x y present vx vy sigma predicted",
+                               defaults=(0.0, 0.0, 0.0, False))
+# Sent by Dummy when the camera starts moving and once it has settled again
+CameraMotionEvent = namedtuple("CameraMotionEvent", "frame_id timestamp_ns moving pan tilt")
+# hands is a HAND_DTYPE array, empty when no hand is in the frame
+HandsEvent = namedtuple("HandsEvent", "frame_id timestamp_ns hands")
+
+
+def encode_event(event):
+    """Pack an event into a compact versioned binary record."""
+    if isinstance(event, GestureEvent):
+        code = GESTURE_CODES.get(event.gesture, UNKNOWN_GESTURE)
+        record = _HEADER.pack(RECORD_VERSION, KIND_GESTURE, event.frame_id, event.timestamp_ns)
+        record += _GESTURE.pack(code, event.confidence)
+        if code == UNKNOWN_GESTURE:
+            record += event.gesture.encode("utf-8")
+        return record
+    if isinstance(event, HandPositionEvent):
+        record = _HEADER.pack(RECORD_VERSION, KIND_HAND_POSITION, event.frame_id, event.timestamp_ns)
+        return record + _HAND_POSITION.pack(event.present, event.x, event.y, event.vx, event.vy,
+                                            event.sigma, event.predicted)
+    if isinstance(event, CameraMotionEvent):
+        record = _HEADER.pack(RECORD_VERSION, KIND_CAMERA_MOTION, event.frame_id, event.timestamp_ns)
+        return record + _CAMERA_MOTION.pack(event.moving, event.pan, event.tilt)
+    if isinstance(event, HandsEvent):
+        record = _HEADER.pack(RECORD_VERSION, KIND_HANDS, event.frame_id, event.timestamp_ns)
+        return record + np.ascontiguousarray(event.hands, dtype=HAND_DTYPE).tobytes()
+    raise TypeError(f"Unsupported event type: {type(event).__name__}")
+
+
+def decode_event(record):
+    """Unpack a binary record produced by encode_event."""
+    version, kind, frame_id, timestamp_ns = _HEADER.unpack_from(record)
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported record version: {version}")
+    offset = _HEADER.size
+    if kind == KIND_GESTURE:
+        code, confidence = _GESTURE.unpack_from(record, offset)
+        if code == UNKNOWN_GESTURE:
+            gesture = bytes(record[offset + _GESTURE.size:]).decode("utf-8")
+        else:
+            gesture = GESTURES[code]
+        return GestureEvent(frame_id, timestamp_ns, gesture, confidence)
+    if kind == KIND_HAND_POSITION:
+        if version == 1:
+            present, x, y = _HAND_POSITION_V1.unpack_from(record, offset)
+            return HandPositionEvent(frame_id, timestamp_ns, x, y, present)
+        present, x, y, vx, vy, sigma, predicted = _HAND_POSITION.unpack_from(record, offset)
+        return HandPositionEvent(frame_id, timestamp_ns, x, y, present, vx, vy, sigma, predicted)
+    if kind == KIND_CAMERA_MOTION:
+        moving, pan, tilt = _CAMERA_MOTION.unpack_from(record, offset)
+        return CameraMotionEvent(frame_id, timestamp_ns, moving, pan, tilt)
+    if kind == KIND_HANDS:
+        return HandsEvent(frame_id, timestamp_ns, np.frombuffer(record, dtype=HAND_DTYPE, offset=offset))
+    raise ValueError(f"Unsupported record kind: {kind}")
+
+
+STREAMS = {
+    GestureEvent: GESTURE_STREAM,
+    HandPositionEvent: HAND_POSITION_STREAM,
+    CameraMotionEvent: CAMERA_MOTION_STREAM,
+    HandsEvent: HANDS_STREAM,
+}
+
+
+def gesture_code(name):
+    return GESTURE_CODES.get(name, UNKNOWN_GESTURE)
+
+
+def stream_for(event):
+    if isinstance(event, HandPositionEvent) and event.predicted:
+        return HAND_PREDICTION_STREAM
+    return STREAMS[type(event)]
+
+
+class EventBus:
+    """Capped Redis Streams carrying gesture, hand and camera motion records between services."""
+
+    def __init__(self, redis_conn, maxlen=1000):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.redis_conn = redis_conn
+        self.maxlen = maxlen
+
+    @classmethod
+    def from_settings(cls, redis_conn, queue_settings):
+        return cls(redis_conn, maxlen=queue_settings.get("stream_maxlen", 1000))
+
+    def drop_legacy_queues(self):
+        """Remove the old unbounded lists left behind by previous versions."""
+        self.redis_conn.delete(*LEGACY_QUEUES)
+
+    def publish(self, *events):
+        """Write all events of a frame in a single round trip."""
+        if not events:
+            return
+        pipe = self.redis_conn.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(stream_for(event), {"d": encode_event(event)}, maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+
+    def latest(self, stream):
+        entries = self.redis_conn.xrevrange(stream, count=1)
+        if not entries:
+            return None
+        entry_id, fields = entries[0]
+        try:
+            return decode_event(fields[b"d"])
+        except (KeyError, ValueError, struct.error) as e:
+            self.logger.warning("Skipping malformed record %s on %s: %s", entry_id, stream, e)
+            return None
+
+    def latest_gesture(self):
+        return self.latest(GESTURE_STREAM)
+
+    def latest_hand_position(self):
+        return self.latest(HAND_POSITION_STREAM)
+
+    def latest_hands(self):
+        return self.latest(HANDS_STREAM)
+
+    def latest_camera_motion(self):
+        return self.latest(CAMERA_MOTION_STREAM)
+
+    def read(self, last_ids, block_ms=1000, count=100):
+        """Block until new events arrive on the streams in last_ids.
+
+        last_ids maps stream name to the last seen entry id ("$" for only new entries)
+        and is advanced in place. Events are returned in timestamp order.
+        """
+        response = self.redis_conn.xread(last_ids, block=block_ms, count=count)
+        events = []
+        for stream, entries in response or []:
+            stream = stream.decode("utf-8") if isinstance(stream, bytes) else stream
+            for entry_id, fields in entries:
+                last_ids[stream] = entry_id
+                try:
+                    events.append(decode_event(fields[b"d"]))
+                except (KeyError, ValueError, struct.error) as e:
+                    self.logger.warning("Skipping malformed record %s on %s: %s", entry_id, stream, e)
+        events.sort(key=lambda event: event.timestamp_ns)
+        return events
+
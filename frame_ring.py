@@ -0,0 +1,164 @@
+import logging
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+RING_MAGIC = 0x45535446  # "ESTF"
+RING_VERSION = 1
+
+FORMAT_YUV420 = 0
+FORMAT_RGB888 = 1
+FORMATS = {"YUV420": FORMAT_YUV420, "RGB888": FORMAT_RGB888}
+
+# Global header, one uint64 per field
+_MAGIC, _VERSION, _SLOTS, _WIDTH, _HEIGHT, _FORMAT, _WRITE_SEQ = range(7)
+_HEADER_WORDS = 8
+# Per slot header: sequence number (0 while being written), sensor timestamp (ns)
+_SLOT_WORDS = 2
+
+Frame = namedtuple("Frame", "seq timestamp_ns data")
+
+
+def frame_shape(width, height, pixel_format):
+    if pixel_format == FORMAT_YUV420:
+        # Planar I420: full size Y plane followed by quarter size U and V planes
+        return (height * 3 // 2, width)
+    return (height, width, 3)
+
+
+def sensor_time_ns():
+    """Current time on the clock libcamera uses for SensorTimestamp."""
+    return time.clock_gettime_ns(time.CLOCK_BOOTTIME)
+
+
+class FrameRing:
+    """Lock-free single-writer ring of raw frames in shared memory.
+
+    The writer zeroes a slot's sequence number, copies the frame in, then stamps the slot
+    and the global write sequence. Readers get zero-copy views and must check valid()
+    after using one, since the writer may have recycled the slot in the meantime.
+    """
+
+    def __init__(self, shm, owner):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        if int(self.header[_MAGIC]) != RING_MAGIC or int(self.header[_VERSION]) != RING_VERSION:
+            raise ValueError(f"Shared memory {shm.name} is not a frame ring")
+        self.slots = int(self.header[_SLOTS])
+        self.width = int(self.header[_WIDTH])
+        self.height = int(self.header[_HEIGHT])
+        self.format = int(self.header[_FORMAT])
+        self.shape = frame_shape(self.width, self.height, self.format)
+        self.frame_bytes = int(np.prod(self.shape))
+
+        offset = self.header.nbytes
+        self.slot_headers = np.ndarray((self.slots, _SLOT_WORDS), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        offset += self.slot_headers.nbytes
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    @staticmethod
+    def size_for(slots, width, height, pixel_format):
+        frame_bytes = int(np.prod(frame_shape(width, height, pixel_format)))
+        return 8 * (_HEADER_WORDS + slots * _SLOT_WORDS) + slots * frame_bytes
+
+    @classmethod
+    def create(cls, name, slots, size, pixel_format="YUV420"):
+        """Create the ring, replacing a stale one left behind by a crashed writer."""
+        width, height = size
+        fmt = FORMATS[pixel_format]
+        nbytes = cls.size_for(slots, width, height, fmt)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=nbytes)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=nbytes)
+
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        header[:] = 0
+        header[_SLOTS] = slots
+        header[_WIDTH] = width
+        header[_HEIGHT] = height
+        header[_FORMAT] = fmt
+        header[_VERSION] = RING_VERSION
+        header[_MAGIC] = RING_MAGIC  # Written last, readers ignore the ring until it is set
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name=name)
+        # Only the creating process may unlink the segment, stop the tracker doing it on our exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def publish(self, frame, timestamp_ns):
+        """Copy a frame into the next slot and return its sequence number."""
+        seq = int(self.header[_WRITE_SEQ]) + 1
+        slot = seq % self.slots
+        self.slot_headers[slot, 0] = 0
+        if self.format == FORMAT_YUV420:
+            self.copy_i420(frame, self.frames[slot])
+        else:
+            np.copyto(self.frames[slot], frame[:self.height, :self.width])  # Drop any stride padding
+        self.slot_headers[slot, 1] = timestamp_ns
+        self.slot_headers[slot, 0] = seq
+        self.header[_WRITE_SEQ] = seq
+        return seq
+
+    def copy_i420(self, frame, target):
+        """Copy a (height * 3 / 2, stride) I420 buffer, dropping the padding of every plane.
+
+        The chroma planes are stride / 2 wide, so past the Y plane each row of the buffer holds
+        two chroma rows and a plain column crop would mix them up.
+        """
+        width, height = self.width, self.height
+        stride = frame.shape[1]
+        if stride == width:
+            np.copyto(target, frame[:self.shape[0]])
+            return
+        np.copyto(target[:height], frame[:height, :width])
+        chroma = frame.reshape(-1)[height * stride:]
+        chroma_height, chroma_width, chroma_stride = height // 2, width // 2, stride // 2
+        plane = chroma_height * chroma_stride
+        target_planes = target[height:].reshape(2, chroma_height, chroma_width)
+        for index in range(2):
+            source = chroma[index * plane:(index + 1) * plane].reshape(chroma_height, chroma_stride)
+            np.copyto(target_planes[index], source[:, :chroma_width])
+
+    def latest_seq(self):
+        return int(self.header[_WRITE_SEQ])
+
+    def get(self, seq):
+        """Return a zero-copy view of frame seq, None if it was overwritten or never written."""
+        if seq <= 0:
+            return None
+        slot = seq % self.slots
+        timestamp_ns = int(self.slot_headers[slot, 1])
+        if int(self.slot_headers[slot, 0]) != seq:
+            return None
+        return Frame(seq, timestamp_ns, self.frames[slot])
+
+    def latest(self):
+        return self.get(self.latest_seq())
+
+    def luma(self, frame):
+        """Grey level view of a frame: the Y plane for YUV420, the green channel for RGB."""
+        if self.format == FORMAT_YUV420:
+            return frame.data[:self.height]
+        return frame.data[:, :, 1]
+
+    def valid(self, frame):
+        """True while the slot behind a Frame view still holds that frame."""
+        return int(self.slot_headers[frame.seq % self.slots, 0]) == frame.seq
+
+    def close(self):
+        # Views must be released before the mapping can be closed
+        del self.header, self.slot_headers, self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import math
+import os
+import struct
+
+CHANNEL_VERSION = 1
+OP_RELATIVE = 1  # Move each axis by the given number of degrees
+OP_ABSOLUTE = 2  # Move each axis to the given angle
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# version, opcode, sequence number, pan, tilt (NaN leaves an axis untouched)
+COMMAND = struct.Struct("<BBIff")
+# version, status, sequence number, applied pan angle, applied tilt angle
+REPLY = struct.Struct("<BBIff")
+
+
+class MotorChannelServer:
+    """Unix socket transport for compact pan/tilt commands, merging everything queued into one move.
+
+    Commands read before the applier task runs are folded into a single pending target, relative
+    ones adding up on it, so a burst costs one planner update and every merged command gets the
+    same applied angles back. Applying only sets the planner target, which supersedes older ones.
+    """
+
+    def __init__(self, controller, path):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.controller = controller
+        self.path = path
+        self.server = None
+        self.pending = None  # Merged (pan, tilt) target waiting to be applied
+        self.waiters = []  # (writer, seq) of the commands merged into the pending target
+        self.wakeup = asyncio.Event()
+        self.connections = set()
+        self.applier = None
+        self.commands_received = 0
+        self.moves_applied = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left behind by a previous run
+        self.server = await asyncio.start_unix_server(self.handle_connection, path=self.path)
+        self.applier = asyncio.create_task(self.apply_loop())
+        self.logger.info("Motor channel listening on %s", self.path)
+
+    async def stop(self):
+        if self.applier:
+            self.applier.cancel()
+        for writer in list(self.connections):
+            writer.close()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def handle_connection(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                data = await reader.readexactly(COMMAND.size)
+                self.merge(writer, *COMMAND.unpack(data))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            self.logger.error("Error on motor channel connection: %s", e)
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    def merge(self, writer, version, opcode, seq, pan, tilt):
+        self.commands_received += 1
+        if version != CHANNEL_VERSION or opcode not in (OP_RELATIVE, OP_ABSOLUTE):
+            writer.write(REPLY.pack(CHANNEL_VERSION, STATUS_ERROR, seq, math.nan, math.nan))
+            return
+        base_pan, base_tilt = self.pending or self.controller.target_angles()
+        if opcode == OP_RELATIVE:
+            target = (base_pan + (0.0 if math.isnan(pan) else pan), base_tilt + (0.0 if math.isnan(tilt) else tilt))
+        else:
+            target = (base_pan if math.isnan(pan) else pan, base_tilt if math.isnan(tilt) else tilt)
+        self.pending = target
+        self.waiters.append((writer, seq))
+        self.wakeup.set()
+
+    async def apply_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            target, self.pending = self.pending, None
+            waiters, self.waiters = self.waiters, []
+            if target is None:
+                continue
+            try:
+                pan, tilt = self.controller.move_to(*target)
+                status = STATUS_OK
+                self.moves_applied += 1
+            except Exception as e:
+                self.logger.error("Failed to apply motor command: %s", e)
+                (pan, tilt), status = self.controller.target_angles(), STATUS_ERROR
+            for writer, seq in waiters:
+                if not writer.is_closing():
+                    writer.write(REPLY.pack(CHANNEL_VERSION, status, seq, pan, tilt))
+
+    def stats(self):
+        return {"commands_received": self.commands_received, "moves_applied": self.moves_applied}
+
+
+class MotorChannelClient:
+    """Asyncio client of the motor channel, one connection per process."""
+
+    def __init__(self, path, timeout=1.0):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.reply_task = None
+        self.seq = 0
+        self.waiting = {}  # seq -> future resolved with the applied angles
+
+    async def connect(self):
+        if self.writer is not None and not self.writer.is_closing():
+            return
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        self.reply_task = asyncio.create_task(self.read_replies())
+
+    async def read_replies(self):
+        try:
+            while True:
+                data = await self.reader.readexactly(REPLY.size)
+                _, status, seq, pan, tilt = REPLY.unpack(data)
+                future = self.waiting.pop(seq, None)
+                if future is None or future.done():
+                    continue
+                if status == STATUS_OK:
+                    future.set_result((pan, tilt))
+                else:
+                    future.set_exception(RuntimeError(f"Motor command {seq} rejected"))
+        except Exception as e:
+            for future in self.waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Motor channel closed: {e}"))
+            self.waiting.clear()
+            self.writer.close()
+
+    async def send(self, opcode, pan, tilt, wait):
+        await self.connect()
+        self.seq = (self.seq + 1) % 2 ** 32
+        seq = self.seq
+        future = None
+        if wait:
+            future = asyncio.get_running_loop().create_future()
+            self.waiting[seq] = future
+        self.writer.write(COMMAND.pack(CHANNEL_VERSION, opcode, seq, pan, tilt))
+        await self.writer.drain()
+        if future is None:
+            return None
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self.waiting.pop(seq, None)
+
+    async def move(self, pan=0.0, tilt=0.0, wait=True):
+        """Move both axes by the given degrees, returning the applied (pan, tilt) angles."""
+        return await self.send(OP_RELATIVE, pan, tilt, wait)
+
+    async def move_to(self, pan=math.nan, tilt=math.nan, wait=True):
+        """Move to absolute angles, NaN leaving an axis where it is."""
+        return await self.send(OP_ABSOLUTE, pan, tilt, wait)
+
+    async def close(self):
+        if self.reply_task:
+            self.reply_task.cancel()
+        if self.writer:
+            self.writer.close()
@@ -1,21 +1,19 @@
 import logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",handlers=[
-            logging.FileHandler("/home/pi/estevan/log/esteban.log"),
-            logging.StreamHandler()  # Optional: log to console
-            ])
 import time
-import json
 import redis
-from fastapi import FastAPI
-from threading import Thread
+from fastapi import FastAPI, HTTPException
+from threading import Thread, Lock
 import mediapipe as mp
 import cv2
 import numpy as np
-import asyncio
 import uvicorn
-
-# Configure logging with class name reference
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+from eventbus import EventBus, GestureEvent, HandPositionEvent, HandsEvent, HAND_DTYPE, gesture_code
+from frame_ring import FrameRing, sensor_time_ns
+from palmist_utility.roi_tracker import RoiTracker
+from palmist_utility.motion_gate import MotionGate
+from palmist_utility.kalman_tracker import HandTrackers
+from palmist_utility.hand_tracks import HandIdAssigner, hands_from_result
+from palmist_utility.gesture_filter import GestureFilter
 
 class Palmist:
     def __init__(self, settings):
@@ -23,8 +21,9 @@ class Palmist:
         try:
             self.settings = settings["Palmist"]
             self.queue_settings = settings["queue"]
+            self.ring_settings = settings["frame_ring"]
+            self.frame_ring = None
             self.logger.info("Palmist initialized successfully.")
-            self.last_hand_position = (None, None)  # To store the last (x, y) position
             self.notfoundnotified=True
         except Exception as e:
             self.logger.error("Error initializing Palmist: %s", e)
@@ -37,7 +36,41 @@ class Palmist:
                 port=self.queue_settings["port"],
                 db=self.queue_settings["db"]
             )
+            self.bus = EventBus.from_settings(self.redis_conn, self.queue_settings)
+            self.bus.drop_legacy_queues()
+            # CameraBot announces every frame it writes to the ring on this channel
+            self.frame_pubsub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+            self.frame_pubsub.subscribe(self.ring_settings["channel"])
+            self.last_seq = 0
+            self.last_inferred_ns = 0
+            self.skip_moving_frames = self.settings.get("skip_moving_frames", True)
+            self.moving_frames_skipped = 0
+            self.camera_move_id = 0  # Id of the last camera move seen by read_stream_and_detect
             self.current_gesture = None
+            self.pending_frames = {}  # recognize_async timestamp -> (frame sequence number, sensor timestamp, ROI rect, frame shape, camera move id)
+            self.roi_tracker = None
+            if self.settings.get("roi_tracking", False):
+                self.roi_tracker = RoiTracker(padding=self.settings.get("roi_padding", 0.5),
+                                              input_size=self.settings.get("roi_input_size", 256),
+                                              redetect_interval=self.settings.get("roi_redetect_interval", 30))
+            self.motion_gate = MotionGate(downscale=self.settings.get("motion_downscale", 8),
+                                          pixel_threshold=self.settings.get("motion_pixel_threshold", 25),
+                                          motion_threshold=self.settings.get("motion_threshold", 0.01),
+                                          hand_hold=self.settings.get("motion_hand_hold", 2.0),
+                                          heartbeat_interval=self.settings.get("motion_heartbeat_interval", 2.0))
+            # Smooths the wrist position of every hand and extrapolates the primary one between inferences
+            self.hand_trackers = HandTrackers(process_noise=self.settings.get("kalman_process_noise", 0.5),
+                                              measurement_noise=self.settings.get("kalman_measurement_noise", 0.01))
+            self.tracker_lock = Lock()  # Shared by the MediaPipe callback and the prediction thread
+            self.hand_ids = HandIdAssigner(max_distance=self.settings.get("hand_match_distance", 0.15),
+                                           max_missed=self.settings.get("hand_max_missed", 5))
+            self.primary_hand_id = None  # The hand gestures and positions are reported for
+            # Only clean gesture starts and ends reach the bus
+            self.gesture_filter = GestureFilter(window=self.settings.get("gesture_window", 3),
+                                                enter_threshold=self.settings.get("confidence_threshold", 0.5),
+                                                exit_threshold=self.settings.get("gesture_exit_threshold", 0.3),
+                                                min_dwell_frames=self.settings.get("gesture_min_dwell_frames", 2),
+                                                thresholds=self.settings.get("gesture_thresholds"))
             self.app = FastAPI()
 
             # Setup Mediapipe GestureRecognizer
@@ -58,101 +91,243 @@ class Palmist:
         self.options = GestureRecognizerOptions(
             base_options=BaseOptions(model_asset_path='gesture_recognizer.task'),
             running_mode=RunningMode.LIVE_STREAM,
+            num_hands=self.settings.get("max_hands", 2),
             result_callback=self.gesture_callback
         )
         self.gesture_recognizer = GestureRecognizer.create_from_options(self.options)
 
     def gesture_callback(self, result, img, timestamp_ms):
-        # Handle gesture recognition result
-        if result.gestures:
-            top_gesture = result.gestures[0][0]
-            gesture_name = top_gesture.category_name
-            confidence = top_gesture.score
-
-            # Check if the detected gesture is different from the current one
-            if confidence > 0.50 and gesture_name != self.current_gesture:
-                self.current_gesture = gesture_name
-                # Push the new gesture into the gesture_queue
-                self.redis_conn.rpush("gesture_queue", gesture_name)
-                self.logger.info("New gesture detected and pushed to gesture_queue: %s", gesture_name)
-            elif gesture_name!= self.current_gesture:
-                self.current_gesture = "No gesture"
-                self.redis_conn.rpush("gesture_queue", self.current_gesture)
+        frame_id, timestamp_ns, rect, frame_shape, move_id = self.pending_frames.pop(
+            timestamp_ms, (0, timestamp_ms * 1_000_000, None, None, self.camera_move_id))
+        # Frames dropped by MediaPipe never get a callback, forget anything older
+        for stale in [ts for ts in list(self.pending_frames) if ts < timestamp_ms]:
+            self.pending_frames.pop(stale, None)
+        events = []  # Everything produced by this frame is published in one round trip
 
-        else:
-            self.current_gesture = "No gesture"
-            self.redis_conn.rpush("gesture_queue", self.current_gesture)
+        # Every hand and landmark of the frame as arrays, in full-frame coordinates
+        landmarks, gestures, scores, handedness = hands_from_result(result)
+        if frame_shape is not None and len(landmarks):
+            # Landmarks of a cropped inference are relative to the ROI
+            landmarks = RoiTracker.to_frame(landmarks.reshape(-1, 2), rect, frame_shape).reshape(landmarks.shape)
+        centroids = landmarks.mean(axis=1)
+        low = landmarks.min(axis=1)
+        high = landmarks.max(axis=1)
+        ids = self.hand_ids.assign(centroids)
+        with self.tracker_lock:
+            # Each hand keeps its own filter, switching the primary hand needs no reset
+            estimates = self.hand_trackers.update(ids, landmarks[:, 0], timestamp_ns, frame_id, move_id)  # Wrists
+            self.hand_trackers.retain(self.hand_ids.ids)
 
+        hands = np.zeros(len(ids), dtype=HAND_DTYPE)
+        hands["id"] = ids
+        hands["cx"], hands["cy"] = centroids.T
+        hands["x0"], hands["y0"] = low.T
+        hands["x1"], hands["y1"] = high.T
+        hands["gesture"] = [gesture_code(name) for name in gestures]
+        hands["handedness"] = handedness
+        hands["score"] = scores
+        events.append(HandsEvent(frame_id, timestamp_ns, hands))
+        primary = self.select_primary_hand(ids, gestures, scores, np.prod(high - low, axis=1))
+
+        # Handle gesture recognition result
+        if primary is not None:
+            gesture_name, confidence = gestures[primary], float(scores[primary])
+        else:
+            gesture_name, confidence = "No gesture", 0.0
+        transition = self.gesture_filter.update(gesture_name, confidence)
+        if transition:
+            self.current_gesture, vote = transition
+            events.append(GestureEvent(frame_id, timestamp_ns, self.current_gesture, vote))
+            self.logger.info("New gesture detected and pushed to gesture stream: %s", self.current_gesture)
 
          # Handle hand position
-        if result.hand_landmarks:
+        if primary is not None:
             self.notfoundnotified=False
-            hand_landmarks = result.hand_landmarks[0]
-            wrist_landmark = hand_landmarks[0]
-            hand_x = wrist_landmark.x
-            hand_y = wrist_landmark.y
-            
-            # Calculate the difference from the last known position
-            last_x, last_y = self.last_hand_position
-            if last_x is not None and last_y is not None:
-                delta_x = abs(hand_x - last_x)
-                delta_y = abs(hand_y - last_y)
-
-                # Check if the change is greater than the defined offset
-                if delta_x > self.settings["position_offest"] or delta_y > self.settings["position_offest"]:
-                    # Push hand position to the hand_position_queue
-                    self.redis_conn.rpush("hand_position_queue", f"Hand position: ({hand_x}, {hand_y})")
-                    self.logger.info("New hand position detected and pushed to hand_position_queue: (%f, %f)", hand_x, hand_y)
-                    # Update the last known hand position
-                    self.last_hand_position = (hand_x, hand_y)
-            else:
-                # If there was no last position, initialize it
-                self.last_hand_position = (hand_x, hand_y)
+            self.motion_gate.hand_seen()
+            if frame_shape is not None and self.roi_tracker:
+                # Keep every hand inside the next crop
+                self.roi_tracker.update(landmarks.reshape(-1, 2), frame_shape)
+            x, y, vx, vy, sigma = estimates[primary]
+            events.append(HandPositionEvent(frame_id, timestamp_ns, x, y, True, vx, vy, sigma))
+            self.logger.debug("Hand %s at (%f, %f), moving (%f, %f)/s", self.primary_hand_id, x, y, vx, vy)
         else:
+            if self.roi_tracker:
+                self.roi_tracker.lost()
             if not self.notfoundnotified:
-                self.redis_conn.rpush("hand_position_queue", f"Hand position: (0, 0)")
+                events.append(HandPositionEvent(frame_id, timestamp_ns, 0.0, 0.0, False))
                 self.logger.info("Hand not found")
                 self.notfoundnotified=True
 
+        try:
+            self.bus.publish(*events)
+        except Exception as e:
+            self.logger.error("Error publishing frame %s events: %s", frame_id, e)
+
+    def select_primary_hand(self, ids, gestures, scores, areas):
+        """Index of the hand to report gestures and positions for, None without hands.
+
+        The current hand is kept while it is visible. Otherwise the hand making the most confident
+        gesture is picked, or the largest one when nobody gestures.
+        """
+        if not len(ids):
+            self.primary_hand_id = None
+            return None
+        matches = np.flatnonzero(ids == self.primary_hand_id)
+        if len(matches):
+            return int(matches[0])
+        gesturing = np.where([name != "None" for name in gestures], scores, 0.0)
+        index = int(np.argmax(gesturing)) if gesturing.max() > 0 else int(np.argmax(areas))
+        self.primary_hand_id = int(ids[index])
+        return index
+
     def setup_routes(self):
         @self.app.get("/current_gesture")
         async def current_gesture():
             # Return the current detected gesture
             return {"gesture": self.current_gesture or "No gesture detected"}
 
+        @self.app.get("/health")
+        async def health():
+            # Probed by the Esteban supervisor, the process is only useful while it reads frames
+            if not self.frame_thread.is_alive():
+                raise HTTPException(status_code=503, detail="Frame processing stopped")
+            return {"status": "ok", "frame_ring_attached": self.frame_ring is not None}
+
+        @self.app.get("/stats")
+        async def stats():
+            # Frames skipped by the motion gate versus frames sent to the recognizer
+            return {**self.motion_gate.stats(), "moving_frames_skipped": self.moving_frames_skipped}
+
         self.logger.info("Routes setup completed successfully.")
 
     def process_frame(self, frame):
         try:
-            # Convert frame data into the format required by Mediapipe
-            image = mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            self.gesture_recognizer.recognize_async(image, int(time.time() * 1e6))
+            # Run on a crop around the tracked hand when possible, the full frame otherwise
+            frame_shape = (self.frame_ring.height, self.frame_ring.width)
+            rect = self.roi_tracker.select(frame_shape) if self.roi_tracker else None
+            # Convert the shared YUV420 view into the RGB image required by Mediapipe, cropping first
+            if rect:
+                data = self.roi_tracker.crop(frame.data, rect)
+            else:
+                data = cv2.cvtColor(frame.data, cv2.COLOR_YUV2RGB_I420)
+            if not self.frame_ring.valid(frame):
+                # CameraBot recycled the slot while we were converting it
+                self.logger.warning("Frame %s overwritten during conversion, skipping.", frame.seq)
+                return
+            image = mp.Image(image_format=mp.ImageFormat.SRGB, data=data)
+            # The sensor timestamp keeps MediaPipe's clock in step with when the frame was captured
+            timestamp_ms = frame.timestamp_ns // 1_000_000
+            self.pending_frames[timestamp_ms] = (frame.seq, frame.timestamp_ns, rect, frame_shape, self.camera_move_id)
+            self.gesture_recognizer.recognize_async(image, timestamp_ms)
         except Exception as e:
             self.logger.error("Error processing frame for gesture recognition: %s", e)
 
+    def attach_frame_ring(self):
+        try:
+            self.frame_ring = FrameRing.attach(self.ring_settings["name"])
+            self.logger.info("Attached to frame ring %s.", self.ring_settings["name"])
+        except (FileNotFoundError, ValueError) as e:
+            self.logger.warning("Frame ring not available yet: %s", e)
+
+    def detach_frame_ring(self):
+        try:
+            self.frame_ring.close()
+        except BufferError:
+            pass  # A frame view is still referenced, the mapping goes away with it
+        self.frame_ring = None
+        self.last_seq = 0
+
+    def wait_for_new_frame(self, timeout=1.0):
+        """Block until CameraBot announces a frame newer than the last one seen, None on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            message = self.frame_pubsub.get_message(timeout=remaining)
+            if message is None:
+                continue
+            # Drain queued notifications, the ring itself knows the newest frame
+            while (newer := self.frame_pubsub.get_message(timeout=0)) is not None:
+                message = newer
+            if int(message["data"]) < self.last_seq:
+                # CameraBot restarted with a new ring, its sequence numbers start over
+                self.logger.warning("Frame ring %s was recreated, attaching again.", self.ring_settings["name"])
+                self.detach_frame_ring()
+                return None
+            seq = self.frame_ring.latest_seq()
+            if seq > self.last_seq:
+                self.last_seq = seq
+                return self.frame_ring.get(seq)
+
+    def captured_while_moving(self, timestamp_ns):
+        """True for frames taken while Dummy was moving the camera, they are blurred and misplace the hand."""
+        motion = self.bus.latest_camera_motion()
+        if motion is None:
+            return False
+        self.camera_move_id = motion.frame_id
+        if motion.moving:
+            return timestamp_ns >= motion.timestamp_ns
+        return timestamp_ns < motion.timestamp_ns
+
     def read_stream_and_detect(self):
+        min_interval_ns = 1e9 / self.settings["fps_streaming"]
         while True:
             try:
-                # Get the latest frame from the Redis streaming queue
-                frame_data = self.redis_conn.get("streaming_queue")
-                if frame_data:
-                    frame = np.frombuffer(frame_data, dtype=np.uint8)
-                    frame = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+                if self.frame_ring is None:
+                    self.attach_frame_ring()
+                    if self.frame_ring is None:
+                        time.sleep(1)
+                        continue
+                # Get a zero-copy view of the next frame published by CameraBot
+                frame = self.wait_for_new_frame()
+                if not frame:
+                    if self.frame_ring is not None:
+                        self.logger.warning("No new frame available in the frame ring.")
+                    continue
+                # fps_streaming caps the inference rate, measured on the sensor clock
+                if frame.timestamp_ns - self.last_inferred_ns < min_interval_ns:
+                    continue
+                if self.skip_moving_frames and self.captured_while_moving(frame.timestamp_ns):
+                    self.moving_frames_skipped += 1
+                    continue
+                # Only pay for inference when the scene changed or a hand is around
+                if self.motion_gate.should_infer(self.frame_ring.luma(frame)):
+                    self.last_inferred_ns = frame.timestamp_ns
                     self.process_frame(frame)
-                else:
-                    self.logger.warning("No frame available in Redis streaming queue.")
-                time.sleep(1 / self.settings["fps_streaming"])
 
             except Exception as e:
                 self.logger.error("Error in read_stream_and_detect loop: %s", e)
                 break
 
+    def predict_hand_positions(self):
+        """Publish extrapolated hand positions between inferences, for consumers that want a higher rate."""
+        interval = 1.0 / self.settings.get("prediction_rate_hz", 20)
+        horizon_ns = int(self.settings.get("prediction_horizon", 0.5) * 1e9)
+        while True:
+            time.sleep(interval)
+            try:
+                now_ns = sensor_time_ns()
+                with self.tracker_lock:
+                    tracker = self.hand_trackers.get(self.primary_hand_id)
+                    if tracker is None or not tracker.active or now_ns - tracker.timestamp_ns > horizon_ns:
+                        continue
+                    frame_id = tracker.frame_id
+                    x, y, vx, vy, sigma = tracker.predict(now_ns)
+                x, y = min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+                self.bus.publish(HandPositionEvent(frame_id, now_ns, x, y, True, vx, vy, sigma, True))
+            except Exception as e:
+                self.logger.error("Error publishing predicted hand position: %s", e)
+
     def run(self):
         try:
             # Start frame reading and gesture recognition in a separate thread
             self.process_init()
             self.logger.info("Starting Palmist frame processing.")
-            Thread(target=self.read_stream_and_detect).start()
+            self.frame_thread = Thread(target=self.read_stream_and_detect, daemon=True)
+            self.frame_thread.start()
+            if self.settings.get("prediction_rate_hz", 20) > 0:
+                Thread(target=self.predict_hand_positions, daemon=True).start()
 
             # Run FastAPI server
             self.logger.info("Starting Palmist FastAPI server.")
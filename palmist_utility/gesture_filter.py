@@ -0,0 +1,64 @@
+# palmist_utility/gesture_filter.py
+from collections import deque
+
+NO_GESTURE = "No gesture"
+
+
+class GestureFilter:
+    """Confidence weighted voting over the last frames, with hysteresis between gestures.
+
+    A gesture starts once its vote reaches its enter threshold and ends once it falls under its
+    exit threshold. Either change has to hold for min_dwell_frames frames in a row before it is
+    reported, so a single noisy frame never starts or ends a gesture.
+    """
+
+    def __init__(self, window=3, enter_threshold=0.5, exit_threshold=0.3, min_dwell_frames=2, thresholds=None):
+        self.frames = deque(maxlen=window)  # (gesture, score), "None" and missing hands vote for nothing
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.min_dwell_frames = min_dwell_frames
+        self.thresholds = thresholds or {}  # gesture -> {"enter": ..., "exit": ...} overrides
+        self.current = NO_GESTURE
+        self.candidate = None
+        self.candidate_frames = 0
+
+    def enter(self, gesture):
+        return self.thresholds.get(gesture, {}).get("enter", self.enter_threshold)
+
+    def exit(self, gesture):
+        return self.thresholds.get(gesture, {}).get("exit", self.exit_threshold)
+
+    def votes(self):
+        votes = {}
+        for gesture, score in self.frames:
+            if gesture not in ("None", NO_GESTURE):
+                votes[gesture] = votes.get(gesture, 0.0) + score
+        return {gesture: total / self.frames.maxlen for gesture, total in votes.items()}
+
+    def update(self, gesture, score):
+        """Add a frame, returning (gesture, vote) when the stable gesture changed, None otherwise."""
+        self.frames.append((gesture, score))
+        votes = self.votes()
+        target = self.current
+        if self.current != NO_GESTURE and votes.get(self.current, 0.0) < self.exit(self.current):
+            target = NO_GESTURE
+        # Switching needs another gesture to clear its own enter threshold and beat the current one
+        best = max(votes, key=votes.get, default=None)
+        if best is not None and best != self.current and votes[best] >= self.enter(best) \
+                and votes[best] > votes.get(self.current, 0.0):
+            target = best
+
+        if target == self.current:
+            self.candidate = None
+            self.candidate_frames = 0
+            return None
+        if target != self.candidate:
+            self.candidate = target
+            self.candidate_frames = 0
+        self.candidate_frames += 1
+        if self.candidate_frames < self.min_dwell_frames:
+            return None
+        self.current = target
+        self.candidate = None
+        self.candidate_frames = 0
+        return self.current, votes.get(self.current, 0.0)
@@ -0,0 +1,80 @@
+# palmist_utility/hand_tracks.py
+import itertools
+import numpy as np
+
+LANDMARKS = 21
+HANDEDNESS_CODES = {"Left": 0, "Right": 1}
+UNKNOWN_HANDEDNESS = 255
+
+
+def hands_from_result(result):
+    """All hands of a GestureRecognizer result as arrays.
+
+    Returns landmarks (H, 21, 2) in the coordinates of the inferred image, the top gesture name
+    of each hand, gesture scores (H,) and handedness codes (H,).
+    """
+    count = len(result.hand_landmarks)
+    landmarks = np.array([[(landmark.x, landmark.y) for landmark in hand] for hand in result.hand_landmarks],
+                         dtype=np.float32).reshape(count, LANDMARKS, 2)
+    gestures = []
+    scores = np.zeros(count, dtype=np.float32)
+    handedness = np.full(count, UNKNOWN_HANDEDNESS, dtype=np.uint8)
+    for index in range(count):
+        categories = result.gestures[index] if index < len(result.gestures) else None
+        if categories:
+            gestures.append(categories[0].category_name)
+            scores[index] = categories[0].score
+        else:
+            gestures.append("None")
+        if index < len(result.handedness) and result.handedness[index]:
+            handedness[index] = HANDEDNESS_CODES.get(result.handedness[index][0].category_name, UNKNOWN_HANDEDNESS)
+    return landmarks, gestures, scores, handedness
+
+
+class HandIdAssigner:
+    """Gives hands stable ids across frames by nearest-neighbour matching of their centroids.
+
+    A track survives max_missed frames without a match, so a hand briefly missed by the
+    detector keeps its id when it comes back.
+    """
+
+    def __init__(self, max_distance=0.15, max_missed=5):
+        self.max_distance = max_distance  # Largest centroid jump between frames, normalized
+        self.max_missed = max_missed
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.centroids = np.zeros((0, 2), dtype=np.float32)
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.next_ids = itertools.count(1)
+
+    def assign(self, centroids):
+        """Return the id of each (N, 2) centroid, creating tracks for unmatched hands."""
+        count = len(centroids)
+        assigned = np.full(count, -1, dtype=np.int64)
+        matched_tracks = np.zeros(len(self.ids), dtype=bool)
+        if count and len(self.ids):
+            distances = np.linalg.norm(centroids[:, None, :] - self.centroids[None, :, :], axis=2)
+            # Greedy global matching, closest pairs first
+            for flat in np.argsort(distances, axis=None):
+                hand, track = divmod(int(flat), len(self.ids))
+                if distances[hand, track] > self.max_distance:
+                    break
+                if assigned[hand] >= 0 or matched_tracks[track]:
+                    continue
+                assigned[hand] = self.ids[track]
+                matched_tracks[track] = True
+                self.centroids[track] = centroids[hand]
+
+        new = assigned < 0
+        assigned[new] = [next(self.next_ids) for _ in range(int(new.sum()))]
+        self.missed[matched_tracks] = 0
+        self.missed[~matched_tracks] += 1
+        keep = self.missed <= self.max_missed
+        self.ids = np.concatenate([self.ids[keep], assigned[new]])
+        self.centroids = np.concatenate([self.centroids[keep], centroids[new].astype(np.float32)])
+        self.missed = np.concatenate([self.missed[keep], np.zeros(int(new.sum()), dtype=np.int64)])
+        return assigned
+
+    def reset(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.centroids = np.zeros((0, 2), dtype=np.float32)
+        self.missed = np.zeros(0, dtype=np.int64)
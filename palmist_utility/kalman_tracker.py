@@ -0,0 +1,125 @@
+# palmist_utility/kalman_tracker.py
+import numpy as np
+
+class KalmanTracker:
+    """Constant-velocity Kalman filter on the normalized (x, y) position of one hand.
+
+    State is [x, y, vx, vy] with velocities in frame widths/heights per second. Time steps come
+    from the frame sensor timestamps, so predictions can be asked for any instant in between.
+    """
+
+    H = np.array([[1.0, 0.0, 0.0, 0.0],
+                  [0.0, 1.0, 0.0, 0.0]])
+
+    def __init__(self, process_noise=0.5, measurement_noise=0.01, initial_velocity_noise=1.0):
+        self.process_noise = process_noise  # Std of the unmodelled acceleration, per second squared
+        self.measurement_noise = measurement_noise  # Std of a landmark measurement
+        self.initial_velocity_noise = initial_velocity_noise
+        self.R = np.eye(2) * measurement_noise ** 2
+        self.state = None
+        self.P = None
+        self.timestamp_ns = None
+        self.frame_id = 0
+
+    @property
+    def active(self):
+        return self.state is not None
+
+    def reset(self):
+        self.state = None
+        self.P = None
+        self.timestamp_ns = None
+
+    def transition(self, dt):
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        # Piecewise white acceleration noise
+        q = self.process_noise ** 2
+        Q = np.zeros((4, 4))
+        Q[0, 0] = Q[1, 1] = q * dt ** 4 / 4
+        Q[0, 2] = Q[2, 0] = Q[1, 3] = Q[3, 1] = q * dt ** 3 / 2
+        Q[2, 2] = Q[3, 3] = q * dt ** 2
+        return F, Q
+
+    def update(self, x, y, timestamp_ns, frame_id=0):
+        """Fold in a measured position and return the filtered (x, y, vx, vy, sigma)."""
+        measurement = np.array([x, y])
+        if self.state is None or timestamp_ns <= self.timestamp_ns:
+            if self.state is None:
+                self.state = np.array([x, y, 0.0, 0.0])
+                self.P = np.diag([self.measurement_noise ** 2] * 2 + [self.initial_velocity_noise ** 2] * 2)
+                self.timestamp_ns = timestamp_ns
+            self.frame_id = frame_id
+            return self.estimate()
+        F, Q = self.transition((timestamp_ns - self.timestamp_ns) / 1e9)
+        state = F @ self.state
+        P = F @ self.P @ F.T + Q
+        innovation = measurement - self.H @ state
+        S = self.H @ P @ self.H.T + self.R
+        K = P @ self.H.T @ np.linalg.inv(S)
+        self.state = state + K @ innovation
+        self.P = (np.eye(4) - K @ self.H) @ P
+        self.timestamp_ns = timestamp_ns
+        self.frame_id = frame_id
+        return self.estimate()
+
+    def relocate(self, x, y, timestamp_ns, frame_id=0):
+        """Jump to a measured position keeping the velocity, for when the camera itself moved."""
+        if self.state is None:
+            return self.update(x, y, timestamp_ns, frame_id)
+        self.state = np.array([x, y, self.state[2], self.state[3]])
+        self.P[:2, :] = 0.0
+        self.P[:, :2] = 0.0
+        self.P[0, 0] = self.P[1, 1] = self.measurement_noise ** 2
+        self.timestamp_ns = timestamp_ns
+        self.frame_id = frame_id
+        return self.estimate()
+
+    def estimate(self, state=None, P=None):
+        state = self.state if state is None else state
+        P = self.P if P is None else P
+        sigma = float(np.sqrt((P[0, 0] + P[1, 1]) / 2))
+        return float(state[0]), float(state[1]), float(state[2]), float(state[3]), sigma
+
+    def predict(self, timestamp_ns):
+        """Estimate at timestamp_ns without changing the filter, None before the first measurement."""
+        if self.state is None:
+            return None
+        dt = max(0.0, (timestamp_ns - self.timestamp_ns) / 1e9)
+        F, Q = self.transition(dt)
+        return self.estimate(F @ self.state, F @ self.P @ F.T + Q)
+
+
+class HandTrackers:
+    """One KalmanTracker per hand id, so every tracked hand keeps its own smoothed motion."""
+
+    def __init__(self, **tracker_options):
+        self.tracker_options = tracker_options
+        self.trackers = {}  # hand id -> KalmanTracker
+        self.move_ids = {}  # hand id -> camera move id of its last measurement
+
+    def get(self, hand_id):
+        return self.trackers.get(hand_id)
+
+    def update(self, ids, points, timestamp_ns, frame_id=0, move_id=0):
+        """Fold in the measured (N, 2) points of the hands ids, returning their (x, y, vx, vy, sigma)."""
+        estimates = []
+        for hand_id, (x, y) in zip(ids, points):
+            hand_id = int(hand_id)
+            tracker = self.trackers.get(hand_id)
+            if tracker is None:
+                tracker = self.trackers[hand_id] = KalmanTracker(**self.tracker_options)
+            if self.move_ids.get(hand_id, move_id) != move_id:
+                # The camera moved since the last measurement, the jump is not the hand's velocity
+                estimates.append(tracker.relocate(float(x), float(y), timestamp_ns, frame_id))
+            else:
+                estimates.append(tracker.update(float(x), float(y), timestamp_ns, frame_id))
+            self.move_ids[hand_id] = move_id
+        return estimates
+
+    def retain(self, ids):
+        """Forget the hands whose ids are no longer tracked."""
+        keep = {int(hand_id) for hand_id in ids}
+        for hand_id in [hand_id for hand_id in self.trackers if hand_id not in keep]:
+            del self.trackers[hand_id]
+            self.move_ids.pop(hand_id, None)
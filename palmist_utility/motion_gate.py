@@ -0,0 +1,52 @@
+# palmist_utility/motion_gate.py
+import time
+import numpy as np
+
+class MotionGate:
+    """Cheap frame-difference pre-filter deciding whether a frame is worth running inference on."""
+
+    def __init__(self, downscale=8, pixel_threshold=25, motion_threshold=0.01, hand_hold=2.0, heartbeat_interval=2.0):
+        self.downscale = downscale  # Keep one pixel every downscale rows and columns
+        self.pixel_threshold = pixel_threshold  # Grey level change counted as motion
+        self.motion_threshold = motion_threshold  # Fraction of moving pixels that opens the gate
+        self.hand_hold = hand_hold  # Seconds the gate stays open after a hand was seen
+        self.heartbeat_interval = heartbeat_interval  # Longest time without inference
+        self.previous = None
+        self.last_inference = float("-inf")
+        self.last_hand_seen = float("-inf")
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.last_motion = 0.0
+
+    def should_infer(self, gray, now=None):
+        now = time.monotonic() if now is None else now
+        small = gray[::self.downscale, ::self.downscale].astype(np.int16)
+        previous, self.previous = self.previous, small
+
+        if previous is None or previous.shape != small.shape:
+            motion = 1.0
+        else:
+            motion = float(np.count_nonzero(np.abs(small - previous) > self.pixel_threshold)) / small.size
+        self.last_motion = motion
+
+        infer = (motion >= self.motion_threshold
+                 or now - self.last_hand_seen < self.hand_hold
+                 or now - self.last_inference >= self.heartbeat_interval)
+        if infer:
+            self.last_inference = now
+            self.frames_inferred += 1
+        else:
+            self.frames_skipped += 1
+        return infer
+
+    def hand_seen(self, now=None):
+        self.last_hand_seen = time.monotonic() if now is None else now
+
+    def stats(self):
+        total = self.frames_inferred + self.frames_skipped
+        return {
+            "frames_inferred": self.frames_inferred,
+            "frames_skipped": self.frames_skipped,
+            "skip_ratio": self.frames_skipped / total if total else 0.0,
+            "last_motion": self.last_motion,
+        }
@@ -0,0 +1,76 @@
+# palmist_utility/roi_tracker.py
+import cv2
+import numpy as np
+
+class RoiTracker:
+    """Keeps a square region of interest around the last seen hand.
+
+    Inference runs on the padded crop while the hand is tracked and falls back to the full
+    frame when it is lost or every redetect_interval frames, so new hands are still found.
+    """
+
+    def __init__(self, padding=0.5, input_size=256, redetect_interval=30, min_size=0.2):
+        self.padding = padding
+        self.input_size = input_size
+        self.redetect_interval = redetect_interval
+        self.min_size = min_size  # Smallest ROI side, as a fraction of the frame height
+        self.roi = None  # Normalized (cx, cy, side) of the next crop, side relative to frame height
+        self.frames_since_detect = 0
+
+    def select(self, frame_shape):
+        """Return the pixel rect (x0, y0, x1, y1) to run inference on, None for the full frame."""
+        if self.roi is None or self.frames_since_detect >= self.redetect_interval:
+            self.frames_since_detect = 0
+            return None
+        self.frames_since_detect += 1
+
+        height, width = frame_shape[:2]
+        cx, cy, side = self.roi
+        # Even sides and corners, so an I420 crop keeps whole chroma samples
+        side = int(min(height, width, max(side, self.min_size) * height)) & ~1
+        # Shift the square inside the frame rather than clipping it, to keep the aspect ratio
+        x0 = int(np.clip(cx * width - side / 2, 0, width - side)) & ~1
+        y0 = int(np.clip(cy * height - side / 2, 0, height - side)) & ~1
+        return (x0, y0, x0 + side, y0 + side)
+
+    def crop(self, data, rect):
+        """RGB crop of a packed (height * 3 / 2, width) I420 frame, only the rect is colour converted."""
+        height, width = data.shape[0] * 2 // 3, data.shape[1]
+        x0, y0, x1, y1 = rect
+        crop_width, crop_height = x1 - x0, y1 - y0
+        packed = np.empty(crop_width * crop_height * 3 // 2, dtype=np.uint8)
+        luma_size = crop_width * crop_height
+        packed[:luma_size].reshape(crop_height, crop_width)[:] = data[y0:y1, x0:x1]
+        chroma = data[height:].reshape(2, height // 2, width // 2)
+        chroma_size = luma_size // 4
+        for index in range(2):
+            start = luma_size + index * chroma_size
+            packed[start:start + chroma_size].reshape(crop_height // 2, crop_width // 2)[:] = \
+                chroma[index, y0 // 2:y1 // 2, x0 // 2:x1 // 2]
+        rgb = cv2.cvtColor(packed.reshape(crop_height * 3 // 2, crop_width), cv2.COLOR_YUV2RGB_I420)
+        return cv2.resize(rgb, (self.input_size, self.input_size), interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def to_frame(points, rect, frame_shape):
+        """Map (N, 2) crop-normalized landmark coordinates back to full-frame normalized space."""
+        if rect is None:
+            return points
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = rect
+        mapped = np.empty_like(points)
+        mapped[:, 0] = (x0 + points[:, 0] * (x1 - x0)) / width
+        mapped[:, 1] = (y0 + points[:, 1] * (y1 - y0)) / height
+        return mapped
+
+    def update(self, points, frame_shape):
+        """Center the next ROI on full-frame normalized landmarks of the tracked hand."""
+        height, width = frame_shape[:2]
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        cx, cy = (low + high) / 2
+        # Largest extent in pixels, expressed relative to the frame height
+        extent = max((high[0] - low[0]) * width, (high[1] - low[1]) * height) / height
+        self.roi = (cx, cy, extent * (1 + 2 * self.padding))
+
+    def lost(self):
+        self.roi = None
@@ -0,0 +1,334 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+
+PHOTO_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    name TEXT PRIMARY KEY,
+    taken_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    source TEXT NOT NULL DEFAULT 'unknown',
+    pan REAL,
+    tilt REAL
+);
+CREATE INDEX IF NOT EXISTS photos_by_time ON photos (taken_ns, name);
+CREATE INDEX IF NOT EXISTS photos_by_source ON photos (source, taken_ns, name);
+"""
+
+COLUMNS = ("name", "taken_ns", "size", "width", "height", "source", "pan", "tilt")
+
+
+def image_size(path):
+    """(width, height) read from the JPEG or PNG header, (None, None) if it cannot be parsed."""
+    try:
+        with open(path, "rb") as file:
+            head = file.read(24)
+            if head[:8] == b"\x89PNG\r\n\x1a\n":
+                return struct.unpack(">II", head[16:24])
+            if head[:2] != b"\xff\xd8":
+                return None, None
+            file.seek(2)
+            while True:
+                marker = file.read(4)
+                if len(marker) < 4 or marker[0] != 0xFF:
+                    return None, None
+                code, length = marker[1], struct.unpack(">H", marker[2:])[0]
+                # Start of frame markers carry the dimensions, the others are skipped
+                if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack(">xHH", file.read(5))
+                    return width, height
+                file.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None, None
+
+
+def encode_cursor(row):
+    return f"{row['taken_ns']}:{row['name']}"
+
+
+def decode_cursor(cursor):
+    taken_ns, name = cursor.split(":", 1)
+    return int(taken_ns), name
+
+
+class PhotoCatalog:
+    """SQLite index of the photos directory, so the gallery never has to list it.
+
+    CameraBot adds every photo it saves, the watcher reconciles files added or removed by hand.
+    Pages are read newest first with keyset cursors, so every page costs the same.
+    """
+
+    def __init__(self, db_path, photos_dir):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.db_path = db_path
+        self.photos_dir = photos_dir
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self):
+        # One connection per thread, WAL lets CameraBot write while ShowBot reads
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def describe(self, path, source="unknown", pan=None, tilt=None):
+        stat = os.stat(path)
+        width, height = image_size(path)
+        return (os.path.basename(path), stat.st_mtime_ns, stat.st_size, width, height, source, pan, tilt)
+
+    def add(self, path, source="unknown", pan=None, tilt=None):
+        """Index one photo file, replacing any previous entry of the same name."""
+        row = self.describe(path, source, pan, tilt)
+        with self.connection() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO photos ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def add_missing(self, path, source="unknown"):
+        """Index a photo unless it is already in the catalog, True when it was added."""
+        row = self.describe(path, source)
+        with self.connection() as conn:
+            return conn.execute(f"INSERT OR IGNORE INTO photos ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                row).rowcount > 0
+
+    def remove(self, name):
+        with self.connection() as conn:
+            return conn.execute("DELETE FROM photos WHERE name = ?", (name,)).rowcount > 0
+
+    def get(self, name):
+        row = self.connection().execute("SELECT * FROM photos WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def filters(self, source=None, since_ns=None, until_ns=None):
+        clauses, params = [], []
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if since_ns is not None:
+            clauses.append("taken_ns >= ?")
+            params.append(since_ns)
+        if until_ns is not None:
+            clauses.append("taken_ns < ?")
+            params.append(until_ns)
+        return clauses, params
+
+    def select(self, source=None, since_ns=None, until_ns=None):
+        """Every matching photo, oldest first."""
+        clauses, params = self.filters(source, since_ns, until_ns)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.connection().execute(f"SELECT * FROM photos {where} ORDER BY taken_ns, name", params)
+        return [dict(row) for row in rows]
+
+    def page(self, limit=50, cursor=None, source=None, since_ns=None, until_ns=None):
+        """Newest first page of photos and the cursor of the next page (None on the last one)."""
+        clauses, params = self.filters(source, since_ns, until_ns)
+        if cursor:
+            taken_ns, name = decode_cursor(cursor)
+            clauses.append("(taken_ns < ? OR (taken_ns = ? AND name < ?))")
+            params += [taken_ns, taken_ns, name]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.connection().execute(
+            f"SELECT * FROM photos {where} ORDER BY taken_ns DESC, name DESC LIMIT ?", params + [limit + 1]).fetchall()
+        photos = [dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(photos[-1]) if len(rows) > limit else None
+        return photos, next_cursor
+
+    def sources(self):
+        return [row[0] for row in self.connection().execute("SELECT DISTINCT source FROM photos ORDER BY source")]
+
+    def sync(self):
+        """Reconcile the catalog with the directory, returning the (added, removed) names."""
+        on_disk = {}
+        with os.scandir(self.photos_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(PHOTO_EXTENSIONS):
+                    on_disk[entry.name] = entry.path
+        conn = self.connection()
+        known = {row[0] for row in conn.execute("SELECT name FROM photos")}
+        removed = known - on_disk.keys()
+        added = on_disk.keys() - known
+        with conn:
+            conn.executemany("DELETE FROM photos WHERE name = ?", [(name,) for name in removed])
+            for name in added:
+                try:
+                    conn.execute(f"INSERT OR IGNORE INTO photos ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 self.describe(on_disk[name]))
+                except OSError as e:
+                    self.logger.warning("Could not index %s: %s", name, e)
+        return added, removed
+
+
+# inotify(7) flags
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+class DirectoryEvents:
+    """inotify watch of one directory, reporting (mask, name) for files written, moved or deleted."""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    @classmethod
+    def open(cls, path):
+        """Watch path, None where inotify is not available."""
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, os.fsencode(path), cls.MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"Cannot watch {path}")
+        return cls(fd)
+
+    def read(self, timeout):
+        """Events received within timeout seconds, an empty list if none."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class CatalogWatcher:
+    """Keeps the catalog in step with photos added or removed by hand.
+
+    The directory is watched with inotify and only the files named in its events are looked at,
+    photos CameraBot already indexed are left alone. Where inotify is not available the directory
+    mtime is polled every poll_interval seconds instead and a change triggers a sync. A full sync
+    also runs at startup and every interval seconds as a backstop.
+    """
+
+    def __init__(self, catalog, interval=3600.0, poll_interval=10.0, on_change=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.catalog = catalog
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.on_change = on_change  # Called with the (added, removed) names after each change
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.loop, name="catalog-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def loop(self):
+        events = None
+        try:
+            events = DirectoryEvents.open(self.catalog.photos_dir)
+        except OSError as e:
+            self.logger.warning("Cannot watch %s, polling it instead: %s", self.catalog.photos_dir, e)
+        last_mtime = self.directory_mtime()
+        self.sync()
+        next_sync = time.monotonic() + self.interval
+        try:
+            while not self.stop_event.is_set():
+                timeout = max(0.0, min(next_sync - time.monotonic(), self.poll_interval))
+                if events is not None:
+                    # Short waits so stop() is noticed quickly
+                    events = self.watch(events, min(timeout, 1.0))
+                else:
+                    self.stop_event.wait(timeout)
+                    mtime = self.directory_mtime()
+                    if mtime != last_mtime:
+                        last_mtime = mtime
+                        self.sync()
+                if time.monotonic() >= next_sync:
+                    self.sync()
+                    next_sync = time.monotonic() + self.interval
+        finally:
+            if events is not None:
+                events.close()
+
+    def watch(self, events, timeout):
+        """Apply the changes of one batch of events, returning the watch or None once it is lost."""
+        added, removed = set(), set()
+        for mask, name in events.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                self.sync()  # Events were lost
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                self.logger.warning("Lost the watch on %s, polling it instead.", self.catalog.photos_dir)
+                events.close()
+                return None
+            elif not name.lower().endswith(PHOTO_EXTENSIONS):
+                continue
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                try:
+                    if self.catalog.add_missing(os.path.join(self.catalog.photos_dir, name)):
+                        added.add(name)
+                        removed.discard(name)
+                except OSError as e:
+                    self.logger.warning("Could not index %s: %s", name, e)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                if self.catalog.remove(name):
+                    removed.add(name)
+                    added.discard(name)
+        self.changed(added, removed)
+        return events
+
+    def directory_mtime(self):
+        try:
+            return os.stat(self.catalog.photos_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def sync(self):
+        try:
+            start = time.monotonic()
+            added, removed = self.catalog.sync()
+            if added or removed:
+                self.logger.info("Photo catalog synced: %s added, %s removed in %.2fs.",
+                                 len(added), len(removed), time.monotonic() - start)
+            self.changed(added, removed)
+        except Exception as e:
+            self.logger.error("Error syncing photo catalog: %s", e)
+
+    def changed(self, added, removed):
+        if (added or removed) and self.on_change:
+            try:
+                self.on_change(added, removed)
+            except Exception as e:
+                self.logger.error("Error handling photo catalog changes: %s", e)
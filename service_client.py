@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import httpx
+
+# Service name -> key of its HTTP port in the service's own settings group
+SERVICE_PORTS = {
+    "CameraBot": "fastapi_port",
+    "Palmist": "fastapi_port",
+    "ShowBot": "port",
+    "Dummy": "api_port",
+}
+
+# Failures that happen before the request reaches the server, safe to retry for any method
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service that keeps failing."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            # Once half-open a single trial call decides whether the circuit closes again
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def failure(self):
+        with self.lock:
+            self.trial_running = False
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, elapsed, error=False):
+        self.count += 1
+        self.errors += error
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.last = elapsed
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "max_ms": 1000 * self.max,
+            "last_ms": 1000 * self.last,
+        }
+
+
+class ServiceClient:
+    """Keep-alive HTTP client for one service, with sync and async faces sharing one policy.
+
+    Every call has a strict timeout. Failures before the request reached the server are
+    retried for any method, other transport errors and 5xx only for idempotent methods, with
+    jittered exponential backoff. A circuit breaker fails fast while the service is down.
+    """
+
+    def __init__(self, name, base_url, timeout=2.0, retries=2, backoff=0.1, failure_threshold=5,
+                 reset_timeout=10.0, max_connections=4):
+        self.logger = logging.getLogger(f"{self.__class__.__name__}.{name}")
+        self.name = name
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = {}
+        self.sync_client = None
+        self.async_client = None
+
+    @classmethod
+    def for_service(cls, settings, service):
+        """Build the client of a service from the full settings object."""
+        port = settings[service][SERVICE_PORTS[service]]
+        options = settings.get("http_client", {})
+        return cls(service, f"http://localhost:{port}", **options)
+
+    def get_sync_client(self):
+        if self.sync_client is None:
+            self.sync_client = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self.sync_client
+
+    def get_async_client(self):
+        # Created lazily so it binds to the event loop of the process that uses it
+        if self.async_client is None:
+            self.async_client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self.async_client
+
+    def should_retry(self, method, error, response):
+        if isinstance(error, CONNECT_ERRORS):
+            return True
+        if method not in ("GET", "HEAD"):
+            return False
+        return error is not None or response.status_code >= 500
+
+    def retry_delay(self, attempt):
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def record(self, method, path, start, failed):
+        key = f"{method} {path}"
+        stats = self.metrics.get(key)
+        if stats is None:
+            stats = self.metrics[key] = LatencyStats()
+        stats.record(time.monotonic() - start, failed)
+        if failed:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+
+    def check_breaker(self, method, path):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable, not calling {method} {path}")
+
+    def request(self, method, path, **kwargs):
+        method = method.upper()
+        for attempt in range(self.retries + 1):
+            self.check_breaker(method, path)
+            start = time.monotonic()
+            error = response = None
+            try:
+                response = self.get_sync_client().request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            self.record(method, path, start, error is not None or response.status_code >= 500)
+            if attempt == self.retries or not self.should_retry(method, error, response):
+                break
+            time.sleep(self.retry_delay(attempt))
+        if error is not None:
+            raise error
+        return response
+
+    async def arequest(self, method, path, **kwargs):
+        method = method.upper()
+        for attempt in range(self.retries + 1):
+            self.check_breaker(method, path)
+            start = time.monotonic()
+            error = response = None
+            try:
+                response = await self.get_async_client().request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            self.record(method, path, start, error is not None or response.status_code >= 500)
+            if attempt == self.retries or not self.should_retry(method, error, response):
+                break
+            await asyncio.sleep(self.retry_delay(attempt))
+        if error is not None:
+            raise error
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    async def aget(self, path, **kwargs):
+        return await self.arequest("GET", path, **kwargs)
+
+    async def apost(self, path, **kwargs):
+        return await self.arequest("POST", path, **kwargs)
+
+    def stats(self):
+        return {
+            "service": self.name,
+            "circuit": self.breaker.state,
+            "calls": {key: stats.to_dict() for key, stats in self.metrics.items()},
+        }
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+        if self.sync_client is not None:
+            self.sync_client.close()
+            self.sync_client = None
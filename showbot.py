@@ -1,21 +1,19 @@
 import logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",handlers=[
-            logging.FileHandler("/home/pi/estevan/log/esteban.log"),
-            logging.StreamHandler()  # Optional: log to console
-            ])
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse
-import requests
+from fastapi.responses import HTMLResponse
 import redis
 import uvicorn
+from eventbus import GESTURE_STREAM, HAND_POSITION_STREAM, EventBus, GestureEvent, HandPositionEvent
+from service_client import ServiceClient
+from photo_catalog import PhotoCatalog, CatalogWatcher
+from showbot_utility.derivatives import DerivativeCache
+from showbot_utility.file_serving import serve_file, serve_open_file, serve_stream
+from showbot_utility.zip_stream import ZipArchive, ZipEntry, CrcCache
 import asyncio
 import os
-import tempfile
-import shutil
-
-# Configure logging with class name reference
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+import threading
+import time
 
 class ShowBot:
     def __init__(self, settings):
@@ -25,7 +23,11 @@ class ShowBot:
         self.palmist_port = settings["Palmist"]["fastapi_port"]
         self.dummy_port = settings["Dummy"]["api_port"]  # Set dummy port here
         self.queue_settings = settings["queue"]
-        self.photos_dir = "/home/pi/photos" 
+        self.photos_dir = settings["CameraBot"]["photos_dir"]
+        self.catalog_path = settings["CameraBot"]["photo_catalog"]
+        self.photo_channel = settings["CameraBot"]["photo_channel"]
+        self.camerabot = ServiceClient.for_service(settings, "CameraBot")
+        self.dummy = ServiceClient.for_service(settings, "Dummy")
 
 
 
@@ -37,6 +39,23 @@ class ShowBot:
             db=self.queue_settings["db"]
         )
         self.logger.info("Connected to Redis on %s:%s.", self.queue_settings["host"], self.queue_settings["port"])
+        self.bus = EventBus.from_settings(self.redis_conn, self.queue_settings)
+
+        # Thumbnails and previews, rendered when a photo is saved and on demand when missing
+        self.derivatives = DerivativeCache(self.photos_dir, self.settings["derivatives_dir"],
+                                           sizes=self.settings.get("derivative_sizes"),
+                                           max_bytes=self.settings.get("derivatives_max_bytes", 256 * 1024 * 1024),
+                                           workers=self.settings.get("derivative_workers", 1),
+                                           quality=self.settings.get("derivative_quality", 80))
+        self.zip_crcs = CrcCache()
+        threading.Thread(target=self.photo_listener, name="photo-listener", daemon=True).start()
+
+        # CameraBot indexes its own photos, the watcher picks up files added or removed by hand
+        self.catalog = PhotoCatalog(self.catalog_path, self.photos_dir)
+        self.catalog_watcher = CatalogWatcher(self.catalog, self.settings.get("catalog_sync_interval", 3600.0),
+                                              self.settings.get("catalog_poll_interval", 10.0),
+                                              on_change=self.photos_changed)
+        self.catalog_watcher.start()
 
         # Initialize FastAPI and templates
         self.app = FastAPI()
@@ -58,50 +77,74 @@ class ShowBot:
                 "index.html",
                 {"request": request, "camerabot_port": self.camerabot_port, "self_port": self.settings["port"],"dummy_port": self.dummy_port}
             )
+        @self.app.get("/api/photos")
+        async def list_photos(limit: int = 48, cursor: str = None, source: str = None,
+                              since: float = None, until: float = None):
+            """Newest first page of the photo catalog, follow next_cursor for the next page."""
+            photos, next_cursor = self.photo_page(limit, cursor, source, since, until)
+            return {"photos": photos, "next_cursor": next_cursor}
+
         @self.app.get("/gallery", response_class=HTMLResponse)
-        async def gallery(request: Request):
-            # List all photo files in the photos directory
+        async def gallery(request: Request, cursor: str = None, source: str = None):
             try:
-                photos = [
-                    f for f in os.listdir(self.photos_dir)
-                    if os.path.isfile(os.path.join(self.photos_dir, f)) and f.endswith(('.png', '.jpg', '.jpeg'))
-                ]
+                photos, next_cursor = self.photo_page(self.settings.get("gallery_page_size", 48), cursor, source)
                 return self.templates.TemplateResponse(
                     "gallery.html",
-                    {"request": request, "photos": photos, "self_port": self.settings["port"]}
+                    {"request": request, "photos": photos, "next_cursor": next_cursor, "source": source,
+                     "sources": self.catalog.sources(), "self_port": self.settings["port"]}
                 )
+            except HTTPException:
+                raise
             except Exception as e:
                 self.logger.error("Error loading gallery: %s", e)
                 return HTMLResponse("Error loading gallery.", status_code=500)
-            
+
+        # Declared before /photos/{photo_name}, which would otherwise take the request
+        @self.app.get("/photos/download_all")
+        async def download_all_photos(request: Request, source: str = None, since: float = None, until: float = None):
+            # Stored ZIP streamed straight from the photo files, Range requests resume it
+            try:
+                archive = await asyncio.to_thread(self.photo_archive, source, since, until)
+            except Exception as e:
+                self.logger.error("Error preparing photo archive: %s", e)
+                return HTMLResponse("Could not prepare the archive.", status_code=500)
+            self.logger.info("Streaming ZIP of %s photo(s), %s bytes.", len(archive.entries), archive.size)
+            return serve_stream(request, archive.iter_range, archive.size, archive.etag(),
+                                archive.last_modified_ns() / 1e9, media_type="application/zip",
+                                filename="photos.zip", cache_control="no-cache")
+
         @self.app.get("/photos/{photo_name}")
-        async def download_photo(photo_name: str):
-            # Serve the photo for download
-            file_path = os.path.join(self.photos_dir, photo_name)
-            if os.path.exists(file_path):
-                return FileResponse(file_path, filename=photo_name)
+        async def download_photo(request: Request, photo_name: str):
+            # Serve the photo for download, revalidated with its ETag
+            file_path = self.photo_path(photo_name)
+            if file_path:
+                return serve_file(request, file_path, filename=photo_name, cache_control="no-cache")
             else:
                 return HTMLResponse("Photo not found.", status_code=404)
-            
-        @self.app.get("/photos/download_all")
-        async def download_all_photos():
-            # Create a temporary ZIP file
-            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp_file:
-                zip_path = tmp_file.name
-                with shutil.ZipFile(zip_path, "w") as zipf:
-                    for photo_name in os.listdir(self.photos_dir):
-                        photo_path = os.path.join(self.photos_dir, photo_name)
-                        if os.path.isfile(photo_path) and photo_name.endswith(('.png', '.jpg', '.jpeg')):
-                            zipf.write(photo_path, arcname=photo_name)
-                self.logger.info("Created ZIP file for all photos.")
-            return FileResponse(zip_path, filename="all_photos.zip", media_type="application/zip")
 
+        @self.app.get("/photos/{photo_name}/{kind}")
+        async def photo_derivative(request: Request, photo_name: str, kind: str):
+            # Thumbnail or preview, its ETag follows the photo so browsers may keep it for a day
+            if kind not in self.derivatives.sizes or not self.photo_path(photo_name):
+                return HTMLResponse("Photo not found.", status_code=404)
+            try:
+                # Opened before serving, eviction may unlink the file at any time
+                file = await self.derivatives.open(photo_name, kind)
+            except Exception as e:
+                self.logger.error("Error rendering the %s of %s: %s", kind, photo_name, e)
+                return HTMLResponse("Could not render photo.", status_code=500)
+            return serve_open_file(request, file, media_type="image/jpeg", cache_control="public, max-age=86400")
+
+        @self.app.get("/derivatives/stats")
+        async def derivative_stats():
+            return self.derivatives.stats()
+            
         @self.app.post("/take_photo")
         async def take_photo():
             # Trigger photo capture via CameraBot's API
             try:
                 self.logger.info("Triggering photo capture on CameraBot.")
-                response = requests.get(f"http://localhost:{self.camerabot_port}/take_photo")
+                response = await self.camerabot.apost("/take_photo")
                 self.logger.info("Received response from CameraBot for photo capture.")
                 return response.json()
             except Exception as e:
@@ -117,16 +160,25 @@ class ShowBot:
 
             # Set the endpoint based on direction
             endpoint = "/move_vertical" if direction in ["up", "down"] else "/move_horizontal"
-            url = f"http://localhost:{self.dummy_port}{endpoint}"
 
             try:
                 # Make request to dummy server with the step size
-                response = requests.post(url, json={"step": step})
+                response = await self.dummy.apost(endpoint, json={"step": step})
                 return response.json()  # Return the dummy server response
             except Exception as e:
                 self.logger.error("Error moving camera: %s", e)
                 return {"error": str(e)}
 
+        @self.app.get("/health")
+        async def health():
+            # Probed by the Esteban supervisor
+            return {"status": "ok"}
+
+        @self.app.get("/client_stats")
+        async def client_stats():
+            # Latency and circuit state of the calls made to the other services
+            return [self.camerabot.stats(), self.dummy.stats()]
+
         @self.app.websocket("/ws")
         async def websocket_endpoint(websocket: WebSocket):
             await websocket.accept()
@@ -137,50 +189,97 @@ class ShowBot:
             except WebSocketDisconnect:
                 self.active_connections.remove(websocket)
 
-    async def hand_socket_listener(self):
-        last_gesture = None
-        last_hand_pos = {"x": 0, "y": 0}
+    def photo_page(self, limit, cursor=None, source=None, since=None, until=None):
+        limit = max(1, min(limit, 200))
+        try:
+            return self.catalog.page(limit, cursor, source,
+                                     since_ns=int(since * 1e9) if since is not None else None,
+                                     until_ns=int(until * 1e9) if until is not None else None)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
 
+    def photo_path(self, photo_name):
+        # Only plain names of files in the photos directory
+        file_path = os.path.join(self.photos_dir, photo_name)
+        if os.path.basename(photo_name) != photo_name:
+            return None
+        if not os.path.isfile(file_path):
+            # Deleted by hand since the last catalog sync, drop it now instead of at the next one
+            if self.catalog.remove(photo_name):
+                self.photos_changed(set(), {photo_name})
+            return None
+        return file_path
+
+    def photo_archive(self, source=None, since=None, until=None):
+        entries = []
+        for photo in self.catalog.select(source, since_ns=int(since * 1e9) if since is not None else None,
+                                         until_ns=int(until * 1e9) if until is not None else None):
+            path = os.path.join(self.photos_dir, photo["name"])
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Removed since the last catalog sync
+            entries.append(ZipEntry(photo["name"], path, stat.st_size, stat.st_mtime_ns))
+        return ZipArchive(entries, self.zip_crcs)
+
+    def photo_listener(self):
+        # CameraBot announces every saved photo, render its derivatives before anyone asks
         while True:
-            # Fetch the latest gesture
-            gesture = self.redis_conn.lindex("gesture_queue", -1)
-
-            # Fetch the latest hand position and parse it
-            hand_position_data = self.redis_conn.lindex("hand_position_queue", -1)
-            hand_pos = None
-            if hand_position_data:
-                try:
-                    # Decode and parse hand position
-                    hand_position = hand_position_data.decode("utf-8")
-                    hand_x, hand_y = map(float, hand_position.strip("Hand position: ()").split(", "))
-                    hand_pos = {"x": hand_x, "y": hand_y}
-                except ValueError as e:
-                    self.logger.error("Failed to parse hand position data: %s", e)
-            else:
-                hand_pos = {"x": 0, "y": 0}
+            try:
+                pubsub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.photo_channel)
+                for message in pubsub.listen():
+                    self.derivatives.submit(message["data"].decode())
+            except Exception as e:
+                self.logger.error("Error listening for saved photos: %s", e)
+                time.sleep(1)
 
-            # Decode gesture if it exists, else set to None
-            gesture = gesture.decode("utf-8") if gesture else None
+    def photos_changed(self, added, removed):
+        for name in removed:
+            self.derivatives.discard(name)
+        for name in added:
+            self.derivatives.submit(name)
 
+    async def hand_socket_listener(self):
+        # Redis calls block, they run in worker threads and the event loop only relays changes
+        gesture, hand_pos = None, {"x": 0, "y": 0}
+        try:
+            gesture_event, hand_position = await asyncio.gather(asyncio.to_thread(self.bus.latest_gesture),
+                                                                asyncio.to_thread(self.bus.latest_hand_position))
+            gesture, hand_pos = self.apply_event(gesture_event, gesture, hand_pos)
+            gesture, hand_pos = self.apply_event(hand_position, gesture, hand_pos)
+        except Exception as e:
+            self.logger.error("Error reading the latest gesture and hand position: %s", e)
+        last_message = None
+        last_ids = {GESTURE_STREAM: "$", HAND_POSITION_STREAM: "$"}
+
+        while True:
+            message = {
+                "gesture": gesture,
+                "hand_pos": hand_pos  # Send as dictionary with 'x' and 'y'
+            }
             # Check if there's a change in gesture or hand position
-            if gesture != last_gesture or hand_pos != last_hand_pos:
-                # Update last known values
-                last_gesture = gesture
-                last_hand_pos = hand_pos
-
-                # Create the message payload
-                message = {
-                    "gesture": gesture,
-                    "hand_pos": hand_pos  # Send as dictionary with 'x' and 'y'
-                }
-
-                # Broadcast the message
+            if message != last_message:
+                last_message = message
                 await self.broadcast(message)
 
-            # Wait before the next check
-            await asyncio.sleep(0.4)
-
+            # Wakes up as soon as Palmist publishes, instead of polling
+            try:
+                events = await asyncio.to_thread(self.bus.read, last_ids, 1000)
+            except Exception as e:
+                self.logger.error("Error reading gesture and hand position streams: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for event in events:
+                gesture, hand_pos = self.apply_event(event, gesture, hand_pos)
 
+    @staticmethod
+    def apply_event(event, gesture, hand_pos):
+        if isinstance(event, GestureEvent):
+            gesture = event.gesture
+        elif isinstance(event, HandPositionEvent):
+            hand_pos = {"x": event.x, "y": event.y} if event.present else {"x": 0, "y": 0}
+        return gesture, hand_pos
 
     async def broadcast(self, message):
         # Send the gesture and hand position to all active connections
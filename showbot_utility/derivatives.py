@@ -0,0 +1,185 @@
+# showbot_utility/derivatives.py
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from photo_catalog import PHOTO_EXTENSIONS, image_size
+
+# JPEG decoding can scale down by these factors for almost free, see cv2.IMREAD_REDUCED_*
+REDUCED_READ_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                      (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+class DerivativeCache:
+    """Thumbnails and previews of the photos, generated in a worker pool and kept on disk.
+
+    Derivatives are stored as <kind>/<photo name>.jpg, so photos differing only by extension
+    keep their own. Each derivative gets the mtime of its photo, so a replaced photo invalidates
+    its derivatives and their ETag. The cache is bounded to max_bytes, the least recently served
+    files go first.
+    """
+
+    def __init__(self, photos_dir, cache_dir, sizes=None, max_bytes=256 * 1024 * 1024, workers=1, quality=80):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.photos_dir = photos_dir
+        self.cache_dir = cache_dir
+        self.sizes = sizes or {"thumb": 320, "preview": 1280}  # kind -> longest side in pixels
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="derivatives")
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (kind, name) -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.pending = {}  # (kind, name) -> future of the generation in progress
+        self.generated = 0
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        # Pick up the derivatives of the previous run, oldest first
+        found = []
+        for kind in self.sizes:
+            os.makedirs(os.path.join(self.cache_dir, kind), exist_ok=True)
+            with os.scandir(os.path.join(self.cache_dir, kind)) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not entry.name.endswith(".jpg"):
+                        continue
+                    name = entry.name[:-len(".jpg")]
+                    if not name.lower().endswith(PHOTO_EXTENSIONS):
+                        os.remove(entry.path)  # Named after the photo's stem by older versions
+                        continue
+                    stat = entry.stat()
+                    found.append((stat.st_atime_ns, kind, name, stat.st_size))
+        for _, kind, name, size in sorted(found):
+            self.entries[(kind, name)] = size
+            self.total_bytes += size
+        self.evict()
+        self.logger.info("Derivative cache loaded, %s file(s) for %s bytes.", len(self.entries), self.total_bytes)
+
+    def path(self, name, kind):
+        return os.path.join(self.cache_dir, kind, name + ".jpg")
+
+    def lookup(self, name, kind):
+        """Path of an up to date derivative, None when it has to be generated."""
+        key = (kind, name)
+        path = self.path(name, kind)
+        try:
+            fresh = os.stat(path).st_mtime_ns == os.stat(os.path.join(self.photos_dir, name)).st_mtime_ns
+        except OSError:
+            fresh = False
+        with self.lock:
+            if fresh and key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return path
+            self.misses += 1
+        return None
+
+    def submit(self, name, kind=None):
+        """Queue the generation of one or every kind of derivative, returning the futures."""
+        futures = []
+        with self.lock:
+            for each in ([kind] if kind else self.sizes):
+                key = (each, name)
+                future = self.pending.get(key)
+                if future is None:
+                    future = self.executor.submit(self.generate, name, each)
+                    self.pending[key] = future
+                    future.add_done_callback(lambda _, key=key: self.done(key))
+                futures.append(future)
+        return futures
+
+    def done(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    async def get(self, name, kind):
+        """Path of the derivative, generated on demand when it is missing or stale."""
+        path = self.lookup(name, kind)
+        if path is None:
+            path = await asyncio.wrap_future(self.submit(name, kind)[0])
+        return path
+
+    async def open(self, name, kind):
+        """The derivative opened for reading, which keeps it readable even if it is evicted meanwhile."""
+        for _ in range(3):
+            path = await self.get(name, kind)
+            try:
+                return open(path, "rb")
+            except FileNotFoundError:
+                continue  # Evicted between the lookup and the open, render it again
+        raise FileNotFoundError(f"The {kind} of {name} keeps being evicted")
+
+    def generate(self, name, kind):
+        source = os.path.join(self.photos_dir, name)
+        stat = os.stat(source)
+        longest = self.sizes[kind]
+        width, height = image_size(source)
+        flag = cv2.IMREAD_COLOR
+        if width and height:
+            for factor, reduced_flag in REDUCED_READ_FLAGS:
+                if max(width, height) // factor >= longest:
+                    flag = reduced_flag
+                    break
+        image = cv2.imread(source, flag)
+        if image is None:
+            raise ValueError(f"Could not decode {source}")
+        scale = longest / max(image.shape[:2])
+        if scale < 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise RuntimeError(f"JPEG encoding failed for the {kind} of {name}")
+
+        path = self.path(name, kind)
+        tmp_path = path + ".part"
+        with open(tmp_path, "wb") as file:
+            file.write(jpeg)
+        # The photo's mtime marks the derivative fresh, the access time orders the next load
+        os.utime(tmp_path, ns=(time.time_ns(), stat.st_mtime_ns))
+        os.replace(tmp_path, path)
+        key = (kind, name)
+        with self.lock:
+            self.total_bytes += len(jpeg) - self.entries.pop(key, 0)
+            self.entries[key] = len(jpeg)
+            self.generated += 1
+        self.evict()
+        return path
+
+    def evict(self):
+        removed = []
+        with self.lock:
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                (kind, name), size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                removed.append(self.path(name, kind))
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning("Could not evict %s: %s", path, e)
+
+    def discard(self, name):
+        """Drop the derivatives of a photo that was removed."""
+        with self.lock:
+            for kind in self.sizes:
+                self.total_bytes -= self.entries.pop((kind, name), 0)
+        for kind in self.sizes:
+            try:
+                os.remove(self.path(name, kind))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {"files": len(self.entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes,
+                    "pending": len(self.pending), "generated": self.generated,
+                    "hits": self.hits, "misses": self.misses}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,143 @@
+# showbot_utility/file_serving.py
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+
+
+def make_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def not_modified(headers, etag, mtime):
+    """RFC 9110 conditional GET: If-None-Match wins over If-Modified-Since."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def range_applies(headers, etag, last_modified):
+    """If-Range: only honour the Range header while the representation is unchanged."""
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    return if_range == etag if if_range.startswith('"') else if_range == last_modified
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None when unsatisfiable, "ignore" otherwise.
+
+    Multiple ranges and malformed headers are ignored, the full body is then sent as allowed.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return "ignore"
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return "ignore"
+    try:
+        if not first:
+            # Suffix range, the last N bytes
+            length = int(last)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return "ignore"
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def iter_file(path, start, end):
+    yield from iter_open_file(open(path, "rb"), start, end)
+
+
+def iter_open_file(file, start, end):
+    with file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def prepare(request, etag, mtime, size, cache_control=None):
+    """Validator headers, plus either an early 304/416 response or the byte range to send (None for all)."""
+    last_modified = formatdate(mtime, usegmt=True)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Accept-Ranges": "bytes"}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if not_modified(request.headers, etag, mtime):
+        return headers, Response(status_code=304, headers=headers), None
+
+    range_header = request.headers.get("range")
+    if range_header and range_applies(request.headers, etag, last_modified):
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            return headers, Response(status_code=416, headers={"Content-Range": f"bytes */{size}"}), None
+        if byte_range != "ignore":
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return headers, None, byte_range
+    return headers, None, None
+
+
+def attachment(filename):
+    return f'attachment; filename="{filename}"'
+
+
+def serve_file(request, path, media_type=None, filename=None, cache_control=None):
+    """FileResponse with ETag/Last-Modified validators, 304 replies and single byte ranges."""
+    stat = os.stat(path)
+    headers, response, byte_range = prepare(request, make_etag(stat), stat.st_mtime, stat.st_size, cache_control)
+    if response:
+        return response
+    if byte_range:
+        if filename:
+            headers["Content-Disposition"] = attachment(filename)
+        return StreamingResponse(iter_file(path, *byte_range), status_code=206, media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers, stat_result=stat)
+
+
+def serve_open_file(request, file, media_type=None, cache_control=None):
+    """serve_file for a file that is already open, so it is served whole even if unlinked meanwhile."""
+    stat = os.fstat(file.fileno())
+    headers, response, byte_range = prepare(request, make_etag(stat), stat.st_mtime, stat.st_size, cache_control)
+    if response:
+        file.close()
+        return response
+    if byte_range:
+        return StreamingResponse(iter_open_file(file, *byte_range), status_code=206, media_type=media_type,
+                                 headers=headers)
+    headers["Content-Length"] = str(stat.st_size)
+    return StreamingResponse(iter_open_file(file, 0, stat.st_size - 1), media_type=media_type, headers=headers)
+
+
+def serve_stream(request, iter_range, size, etag, mtime, media_type=None, filename=None, cache_control=None):
+    """Like serve_file for content generated on the fly, iter_range(start, end) yields the bytes."""
+    headers, response, byte_range = prepare(request, etag, mtime, size, cache_control)
+    if response:
+        return response
+    if filename:
+        headers["Content-Disposition"] = attachment(filename)
+    if byte_range:
+        return StreamingResponse(iter_range(*byte_range), status_code=206, media_type=media_type, headers=headers)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(iter_range(0, size - 1), media_type=media_type, headers=headers)
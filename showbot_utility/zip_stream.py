@@ -0,0 +1,183 @@
+# showbot_utility/zip_stream.py
+import hashlib
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
+CHUNK_SIZE = 64 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+FLAGS = 0x0808  # Sizes and CRC in a data descriptor after the data, UTF-8 names
+
+ZipEntry = namedtuple("ZipEntry", "name path size mtime_ns")
+# One contiguous piece of the archive: static bytes, file data, a data descriptor or the central directory
+Segment = namedtuple("Segment", "offset length kind value")
+
+
+def dos_datetime(mtime_ns):
+    tm = time.localtime(max(mtime_ns // 1_000_000_000, 315532800))  # DOS dates start in 1980
+    return ((tm.tm_year - 1980) << 9) | (tm.tm_mon << 5) | tm.tm_mday, \
+        (tm.tm_hour << 11) | (tm.tm_min << 5) | (tm.tm_sec // 2)
+
+
+class ZipArchive:
+    """A stored (uncompressed) ZIP of files, streamed without building it anywhere.
+
+    Entries use data descriptors, so the layout and total size only depend on the names and
+    sizes of the files and any byte range can be produced on its own, which lets interrupted
+    downloads resume. CRCs are computed while the data streams, or by reading the file when a
+    range starts after it. ZIP64 records are added once offsets or entry counts need them.
+    """
+
+    def __init__(self, entries, crcs):
+        self.entries = list(entries)
+        self.crcs = crcs
+        self.segments = []
+        self.size = 0
+        self.layout()
+
+    def add(self, length, kind, value):
+        self.segments.append(Segment(self.size, length, kind, value))
+        self.size += length
+
+    def layout(self):
+        self.offsets = []
+        for index, entry in enumerate(self.entries):
+            self.offsets.append(self.size)
+            header = self.local_header(entry)
+            self.add(len(header), "bytes", header)
+            self.add(entry.size, "file", index)
+            self.add(16, "descriptor", index)
+        self.central_offset = self.size
+        self.central_size = sum(46 + len(entry.name.encode()) + len(self.central_extra(index))
+                                for index, entry in enumerate(self.entries))
+        self.add(self.central_size, "central", None)
+        end = self.end_records()
+        self.add(len(end), "bytes", end)
+
+    def etag(self):
+        digest = hashlib.sha1()
+        for entry in self.entries:
+            digest.update(f"{entry.name}\0{entry.size}\0{entry.mtime_ns}\n".encode())
+        return f'"zip-{digest.hexdigest()[:20]}"'
+
+    def last_modified_ns(self):
+        return max((entry.mtime_ns for entry in self.entries), default=0)
+
+    def local_header(self, entry):
+        name = entry.name.encode()
+        date, clock = dos_datetime(entry.mtime_ns)
+        return struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, FLAGS, 0, clock, date, 0, 0, 0, len(name), 0) + name
+
+    def central_extra(self, index):
+        # Only the header offset can outgrow 32 bits, every photo is far below 4 GiB
+        if self.offsets[index] < ZIP64_LIMIT:
+            return b""
+        return struct.pack("<HHQ", 0x0001, 8, self.offsets[index])
+
+    def central_records(self):
+        for index, entry in enumerate(self.entries):
+            name = entry.name.encode()
+            extra = self.central_extra(index)
+            date, clock = dos_datetime(entry.mtime_ns)
+            offset = min(self.offsets[index], ZIP64_LIMIT)
+            yield struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 45 if extra else 20, 45 if extra else 20,
+                              FLAGS, 0, clock, date, self.crc(index), entry.size, entry.size,
+                              len(name), len(extra), 0, 0, 0, 0, offset) + name + extra
+
+    def end_records(self):
+        count = len(self.entries)
+        records = b""
+        if count >= 0xFFFF or self.central_offset >= ZIP64_LIMIT or self.central_size >= ZIP64_LIMIT:
+            zip64_offset = self.central_offset + self.central_size
+            records += struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count,
+                                   self.central_size, self.central_offset)
+            records += struct.pack("<IIQI", 0x07064B50, 0, zip64_offset, 1)
+        records += struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                               min(self.central_size, ZIP64_LIMIT), min(self.central_offset, ZIP64_LIMIT), 0)
+        return records
+
+    def crc(self, index):
+        entry = self.entries[index]
+        crc = self.crcs.get(entry)
+        if crc is None:
+            crc = 0
+            with open(entry.path, "rb") as file:
+                while chunk := file.read(CHUNK_SIZE):
+                    crc = zlib.crc32(chunk, crc)
+            self.crcs.put(entry, crc)
+        return crc
+
+    def iter_range(self, start=0, end=None):
+        """Yield the bytes start..end (inclusive) of the archive."""
+        end = self.size - 1 if end is None else end
+        for segment in self.segments:
+            if segment.offset + segment.length <= start or segment.offset > end:
+                continue
+            first = max(start - segment.offset, 0)
+            last = min(end - segment.offset, segment.length - 1)
+            if segment.kind == "file":
+                yield from self.iter_file(segment.value, first, last)
+            elif segment.kind == "central":
+                yield from self.iter_central(first, last)
+            else:
+                yield self.segment_bytes(segment)[first:last + 1]
+
+    def iter_central(self, first, last):
+        # One record at a time, the directory of a large export never sits in memory
+        position = 0
+        for record in self.central_records():
+            if position + len(record) > first:
+                yield record[max(first - position, 0):last - position + 1]
+            position += len(record)
+            if position > last:
+                break
+
+    def segment_bytes(self, segment):
+        if segment.kind == "descriptor":
+            entry = self.entries[segment.value]
+            return struct.pack("<IIII", 0x08074B50, self.crc(segment.value), entry.size, entry.size)
+        return segment.value
+
+    def iter_file(self, index, first, last):
+        entry = self.entries[index]
+        whole = first == 0 and last == entry.size - 1
+        crc = 0
+        with open(entry.path, "rb") as file:
+            file.seek(first)
+            remaining = last - first + 1
+            while remaining > 0:
+                chunk = file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"{entry.path} shrank while being archived")
+                remaining -= len(chunk)
+                if whole:
+                    crc = zlib.crc32(chunk, crc)
+                yield chunk
+        if whole:
+            self.crcs.put(entry, crc)
+
+
+class CrcCache:
+    """CRC32 of recently archived files, so resumed downloads don't read them twice."""
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, entry):
+        with self.lock:
+            crc = self.values.get(entry)
+            if crc is not None:
+                self.values.move_to_end(entry)
+            return crc
+
+    def put(self, entry, crc):
+        with self.lock:
+            self.values[entry] = crc
+            self.values.move_to_end(entry)
+            while len(self.values) > self.max_entries:
+                self.values.popitem(last=False)
+
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+from camerabot_utility.capture_jobs import CaptureQueue
+
+
+class FakeRequest:
+    def __init__(self, array):
+        self.array = array
+        self.released = False
+
+    def make_array(self, stream):
+        assert stream == "main"
+        return self.array
+
+    def release(self):
+        self.released = True
+
+
+class FakeCamera:
+    def __init__(self):
+        self.requests = []
+
+    def capture_request(self):
+        request = FakeRequest(np.full((48, 64, 3), len(self.requests) * 40, dtype=np.uint8))
+        self.requests.append(request)
+        return request
+
+
+async def finish(job):
+    while job.finished is None:
+        await asyncio.sleep(0.01)
+
+
+def test_photo_is_grabbed_before_submit_returns(tmp_path):
+    camera = FakeCamera()
+    saved = []
+
+    async def scenario():
+        queue = CaptureQueue(camera, str(tmp_path), on_saved=lambda job, path: saved.append(path))
+        job = await queue.submit(source="gesture")
+        assert len(camera.requests) == 1 and camera.requests[0].released
+        await finish(job)
+        queue.shutdown()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "done" and job.saved == 1 and job.source == "gesture"
+    assert saved == job.paths and os.path.getsize(saved[0]) > 0
+
+
+def test_burst_saves_every_frame_under_its_own_name(tmp_path):
+    camera = FakeCamera()
+
+    async def scenario():
+        queue = CaptureQueue(camera, str(tmp_path))
+        job = await queue.submit(count=4, interval=0.0)
+        await finish(job)
+        queue.shutdown()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "done" and job.saved == 4 and len(camera.requests) == 4
+    assert len(set(job.paths)) == 4 and sorted(os.listdir(tmp_path)) == sorted(map(os.path.basename, job.paths))
+
+
+def test_failed_grab_fails_the_request(tmp_path):
+    class BrokenCamera:
+        def capture_request(self):
+            raise RuntimeError("camera gone")
+
+    async def scenario():
+        queue = CaptureQueue(BrokenCamera(), str(tmp_path))
+        with pytest.raises(RuntimeError):
+            await queue.submit()
+        return queue.get(1)
+
+    job = asyncio.run(scenario())
+    assert job.status == "failed" and job.error == "camera gone"
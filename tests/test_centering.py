@@ -0,0 +1,68 @@
+import pytest
+from brainy_utility.centering import CenteringController
+from eventbus import HandPositionEvent
+
+SETTINGS = {
+    "pid_pan": {"kp": 0.6, "ki": 0.1, "kd": 0.05},
+    "pid_tilt": {"kp": 0.6, "ki": 0.1, "kd": 0.05},
+    "pid_deadband": 1.0,
+    "pid_output_limit": 15.0,
+    "pid_integral_limit": 10.0,
+    "camera_fov": [66.0, 41.0],
+    "center_tolerance": 2.0,
+}
+
+
+def replay(controller, hand=(20.0, -10.0), frames=150, frame_ns=33_000_000, latency_ns=60_000_000):
+    """Closed loop against a simulated camera: a hand fixed in the world at hand (pan, tilt) degrees.
+
+    Frames are captured every frame_ns and their positions reach the controller latency_ns
+    later, while the camera follows the corrections as soon as they are commanded.
+    """
+    fov = controller.fov
+    moves = []  # (time ns, pan, tilt)
+
+    def camera_at(timestamp_ns):
+        return (sum(move[1] for move in moves if move[0] <= timestamp_ns),
+                sum(move[2] for move in moves if move[0] <= timestamp_ns))
+
+    for frame_id in range(1, frames + 1):
+        captured_ns = frame_id * frame_ns
+        pan, tilt = camera_at(captured_ns)
+        position = HandPositionEvent(frame_id, captured_ns, 0.5 - (hand[0] - pan) / fov[0],
+                                     0.5 - (hand[1] - tilt) / fov[1], True)
+        decided_ns = captured_ns + latency_ns
+        correction = controller.update(position, decided_ns)
+        if correction:
+            moves.append((decided_ns, *correction))
+    return controller.summary(), camera_at(frames * frame_ns + latency_ns)
+
+
+def test_centers_a_still_hand():
+    summary, camera = replay(CenteringController.from_settings(SETTINGS))
+    assert summary["time_to_center"] is not None and summary["time_to_center"] < 2.0
+    assert camera == (pytest.approx(20.0, abs=2.0), pytest.approx(-10.0, abs=2.0))
+    assert summary["mean_latency"] == pytest.approx(0.06)
+
+
+def test_latency_does_not_turn_into_overshoot():
+    summary, _ = replay(CenteringController.from_settings(SETTINGS), latency_ns=200_000_000)
+    assert summary["time_to_center"] is not None
+    assert max(summary["overshoot_pan"], summary["overshoot_tilt"]) < 2.0
+
+
+def test_stale_and_repeated_positions_are_skipped():
+    controller = CenteringController.from_settings(SETTINGS)
+    position = HandPositionEvent(1, 1_000_000_000, 0.8, 0.5, True)
+    assert controller.update(position, 3_000_000_000) is None
+    assert controller.update(position, 1_050_000_000) is not None
+    assert controller.update(position, 1_100_000_000) is None
+
+
+def test_predictions_only_extend_the_newest_frame():
+    controller = CenteringController.from_settings(SETTINGS)
+    controller.update(HandPositionEvent(5, 1_000_000_000, 0.8, 0.5, True), 1_050_000_000)
+    assert controller.update(HandPositionEvent(4, 1_020_000_000, 0.8, 0.5, True, predicted=True),
+                             1_060_000_000) is None
+    assert controller.update(HandPositionEvent(5, 1_020_000_000, 0.8, 0.5, True, predicted=True),
+                             1_060_000_000) is not None
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import cv2
+import numpy as np
+import pytest
+from showbot_utility.derivatives import DerivativeCache
+
+
+@pytest.fixture
+def photos(tmp_path):
+    photos_dir = tmp_path / "photos"
+    photos_dir.mkdir()
+    generator = np.random.default_rng(1)
+    cv2.imwrite(str(photos_dir / "a.jpg"), generator.integers(0, 256, (600, 800, 3), dtype=np.uint8))
+    cv2.imwrite(str(photos_dir / "a.png"), np.zeros((300, 200, 3), dtype=np.uint8))
+    return photos_dir
+
+
+def make_cache(photos, tmp_path, **options):
+    return DerivativeCache(str(photos), str(tmp_path / "cache"), sizes={"thumb": 100, "preview": 400}, **options)
+
+
+def test_photos_sharing_a_stem_keep_their_own_derivatives(photos, tmp_path):
+    cache = make_cache(photos, tmp_path)
+
+    async def scenario():
+        return await cache.get("a.jpg", "thumb"), await cache.get("a.png", "thumb")
+
+    jpg_thumb, png_thumb = asyncio.run(scenario())
+    assert jpg_thumb != png_thumb
+    assert cv2.imread(jpg_thumb).shape == (75, 100, 3)
+    assert cv2.imread(png_thumb).shape == (100, 67, 3)
+    cache.shutdown()
+
+
+def test_derivatives_follow_the_photo(photos, tmp_path):
+    cache = make_cache(photos, tmp_path)
+    path = asyncio.run(cache.get("a.jpg", "preview"))
+    assert cache.lookup("a.jpg", "preview") == path
+    os.utime(photos / "a.jpg", ns=(1, 1))
+    assert cache.lookup("a.jpg", "preview") is None
+    cache.shutdown()
+    # A new cache finds the derivatives of the previous one
+    reloaded = make_cache(photos, tmp_path)
+    assert reloaded.stats()["files"] == 1
+    reloaded.discard("a.jpg")
+    assert reloaded.stats()["files"] == 0 and not os.path.exists(path)
+    reloaded.shutdown()
+
+
+def test_opened_derivative_survives_eviction(photos, tmp_path):
+    cache = make_cache(photos, tmp_path, max_bytes=1)
+
+    async def scenario():
+        file = await cache.open("a.jpg", "preview")
+        # Rendering another derivative evicts the first one
+        await cache.get("a.png", "preview")
+        return file
+
+    file = asyncio.run(scenario())
+    with file:
+        assert not os.path.exists(cache.path("a.jpg", "preview"))
+        assert file.read(2) == b"\xff\xd8"
+    # Evicted derivatives are rendered again on the next request
+    with asyncio.run(cache.open("a.jpg", "preview")) as file:
+        assert file.read(2) == b"\xff\xd8"
+    cache.shutdown()
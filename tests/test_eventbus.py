@@ -0,0 +1,91 @@
+import struct
+import numpy as np
+import pytest
+from eventbus import (GESTURE_STREAM, HAND_DTYPE, HAND_POSITION_STREAM, HAND_PREDICTION_STREAM, CameraMotionEvent,
+                      EventBus, GestureEvent, HandPositionEvent, HandsEvent, decode_event, encode_event, stream_for)
+
+
+class FakeStreams:
+    """Just enough of redis.Redis for EventBus: entries are kept per stream, newest last."""
+
+    def __init__(self):
+        self.streams = {}
+
+    def add(self, stream, fields):
+        entries = self.streams.setdefault(stream, [])
+        entries.append((f"{len(entries) + 1}-0".encode(), fields))
+
+    def xrevrange(self, stream, count):
+        return list(reversed(self.streams.get(stream, [])))[:count]
+
+    def xread(self, last_ids, block, count):
+        response = []
+        for stream, last_id in last_ids.items():
+            entries = [entry for entry in self.streams.get(stream, []) if last_id == "0" or entry[0] > last_id]
+            if entries:
+                response.append((stream.encode(), entries[:count]))
+        return response
+
+
+@pytest.mark.parametrize("event", [
+    GestureEvent(7, 123456789, "Thumb_Up", 0.75),
+    GestureEvent(8, 1, "Shaka", 0.5),
+    HandPositionEvent(9, 2, 0.25, 0.5, True, 0.125, -0.25, 0.0625, True),
+    CameraMotionEvent(3, 4, True, 91.5, 88.0),
+])
+def test_round_trip(event):
+    assert decode_event(encode_event(event)) == event
+
+
+def test_hands_round_trip():
+    hands = np.zeros(2, dtype=HAND_DTYPE)
+    hands["id"] = [3, 4]
+    hands["cx"] = [0.25, 0.75]
+    hands["gesture"] = [3, 255]
+    decoded = decode_event(encode_event(HandsEvent(5, 6, hands)))
+    assert (decoded.frame_id, decoded.timestamp_ns) == (5, 6)
+    assert np.array_equal(decoded.hands, hands)
+    assert len(decode_event(encode_event(HandsEvent(5, 6, np.zeros(0, dtype=HAND_DTYPE)))).hands) == 0
+
+
+def test_version_1_hand_positions_still_decode():
+    record = struct.pack("<BBQQ", 1, 2, 10, 20) + struct.pack("<?ff", True, 0.5, 0.25)
+    assert decode_event(record) == HandPositionEvent(10, 20, 0.5, 0.25, True)
+
+
+def test_bad_records_raise():
+    record = encode_event(GestureEvent(1, 2, "Open_Palm", 0.9))
+    with pytest.raises(ValueError, match="version"):
+        decode_event(bytes([99]) + record[1:])
+    with pytest.raises(ValueError, match="kind"):
+        decode_event(record[:1] + bytes([42]) + record[2:])
+
+
+def test_read_skips_malformed_records_and_sorts_by_timestamp():
+    streams = FakeStreams()
+    streams.add(GESTURE_STREAM, {b"d": encode_event(GestureEvent(2, 200, "Victory", 0.9))})
+    streams.add(GESTURE_STREAM, {b"d": b"\x01"})
+    streams.add(GESTURE_STREAM, {b"legacy": b"Open_Palm"})
+    streams.add(HAND_POSITION_STREAM, {b"d": encode_event(HandPositionEvent(1, 100, 0.5, 0.5, True))})
+    bus = EventBus(streams)
+    last_ids = {GESTURE_STREAM: "0", HAND_POSITION_STREAM: "0"}
+    events = bus.read(last_ids)
+    assert [event.timestamp_ns for event in events] == [100, 200]
+    # The malformed entries are consumed all the same
+    assert last_ids == {GESTURE_STREAM: b"3-0", HAND_POSITION_STREAM: b"1-0"}
+    assert bus.read(last_ids) == []
+
+
+def test_latest_returns_none_for_malformed_records():
+    streams = FakeStreams()
+    bus = EventBus(streams)
+    assert bus.latest_gesture() is None
+    streams.add(GESTURE_STREAM, {b"d": encode_event(GestureEvent(1, 2, "Open_Palm", 0.9))})
+    assert bus.latest_gesture().gesture == "Open_Palm"
+    streams.add(GESTURE_STREAM, {b"d": b"\x02\x01"})
+    assert bus.latest_gesture() is None
+
+
+def test_predicted_positions_have_their_own_stream():
+    assert stream_for(HandPositionEvent(1, 2, 0.5, 0.5, True)) == HAND_POSITION_STREAM
+    assert stream_for(HandPositionEvent(1, 2, 0.5, 0.5, True, predicted=True)) == HAND_PREDICTION_STREAM
@@ -0,0 +1,86 @@
+import multiprocessing
+import uuid
+import cv2
+import numpy as np
+import pytest
+from camerabot_utility.file_camera import FileCamera, padded_i420
+from frame_ring import FrameRing
+
+WIDTH, HEIGHT = 96, 64
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(f"esteban_test_{uuid.uuid4().hex[:8]}", 3, (WIDTH, HEIGHT))
+    yield ring
+    ring.close()
+
+
+def pattern(seed):
+    generator = np.random.default_rng(seed)
+    return generator.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+
+def i420(bgr):
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+
+
+def test_publish_get_and_valid(ring):
+    assert ring.latest() is None
+    seq = ring.publish(i420(pattern(1)), 1000)
+    frame = ring.get(seq)
+    assert (frame.seq, frame.timestamp_ns) == (1, 1000)
+    assert np.array_equal(frame.data, i420(pattern(1)))
+    assert ring.valid(frame)
+    assert np.array_equal(ring.luma(frame), i420(pattern(1))[:HEIGHT])
+
+
+def test_recycled_slots_are_detected(ring):
+    first = ring.get(ring.publish(i420(pattern(1)), 1000))
+    for number in range(2, 5):
+        ring.publish(i420(pattern(number)), number * 1000)
+    assert not ring.valid(first)
+    assert ring.get(first.seq) is None
+    assert ring.latest().seq == 4 and ring.latest().timestamp_ns == 4000
+
+
+def test_stride_padding_is_dropped_per_plane(ring):
+    for stride in (WIDTH, 128, 160):
+        seq = ring.publish(padded_i420(pattern(stride), stride), stride)
+        assert np.array_equal(ring.get(seq).data, i420(pattern(stride)))
+
+
+def read_in_child(name, seq, results):
+    reader = FrameRing.attach(name)
+    frame = reader.get(seq)
+    results.put((frame.timestamp_ns, frame.data.tobytes()))
+    del frame
+    reader.close()
+
+
+def test_readers_attach_from_another_process(ring):
+    seq = ring.publish(i420(pattern(1)), 1000)
+    results = multiprocessing.Queue()
+    reader = multiprocessing.Process(target=read_in_child, args=(ring.shm.name, seq, results))
+    reader.start()
+    timestamp_ns, data = results.get(timeout=10)
+    reader.join()
+    assert timestamp_ns == 1000 and data == i420(pattern(1)).tobytes()
+
+
+def test_file_camera_feeds_the_ring(ring, tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (WIDTH * 2, HEIGHT * 2))
+    for number in range(5):
+        writer.write(np.full((HEIGHT * 2, WIDTH * 2, 3), number * 50, dtype=np.uint8))
+    writer.release()
+
+    camera = FileCamera(path, (WIDTH, HEIGHT), fps=1000, loop=False)
+    assert camera.stride == 128
+    published = []
+    camera.run(ring, published.append)
+    assert published == [1, 2, 3, 4, 5]
+    frame = ring.latest()
+    assert frame.data.shape == (HEIGHT * 3 // 2, WIDTH)
+    assert abs(int(ring.luma(frame).mean()) - int(i420(np.full((HEIGHT, WIDTH, 3), 200, np.uint8))[0, 0])) <= 3
+    assert ring.get(1) is None and ring.valid(frame)
@@ -0,0 +1,83 @@
+import asyncio
+from brainy_utility.engine import BehaviourEngine
+from brainy_utility.gesture_chain import Chain, ChainEvent, ChainMatcher, Step
+from brainy_utility.open_palm_behaviour import OpenPalmBehaviour
+from eventbus import GestureEvent
+
+PALM_THEN_THUMB = Chain("palm_then_thumb", (Step("Open_Palm", min_duration=0.5), Step("Thumb_Up", max_gap=1.0)))
+PALM_THEN_FIST = Chain("palm_then_fist", (Step("Open_Palm", min_duration=0.5), Step("Closed_Fist", min_duration=0.3)))
+
+
+def gesture(name, seconds):
+    return GestureEvent(0, int(seconds * 1e9), name, 0.9)
+
+
+def feed(matcher, events):
+    """Chain names completed over a list of (gesture, seconds) events."""
+    return [chain_event.chain for name, seconds in events for chain_event in matcher.feed(gesture(name, seconds))]
+
+
+def test_chain_completes_when_its_last_step_ends():
+    matcher = ChainMatcher([PALM_THEN_THUMB])
+    assert feed(matcher, [("Open_Palm", 0.0), ("Thumb_Up", 0.6), ("None", 0.7)]) == ["palm_then_thumb"]
+
+
+def test_step_held_too_short_does_not_count():
+    matcher = ChainMatcher([PALM_THEN_THUMB])
+    assert feed(matcher, [("Open_Palm", 0.0), ("Thumb_Up", 0.4), ("None", 0.5)]) == []
+    # The matcher recovers, the next attempt held long enough completes
+    assert feed(matcher, [("Open_Palm", 1.0), ("Thumb_Up", 1.6), ("None", 1.7)]) == ["palm_then_thumb"]
+
+
+def test_gap_longer_than_max_gap_breaks_the_chain():
+    matcher = ChainMatcher([PALM_THEN_THUMB])
+    assert feed(matcher, [("Open_Palm", 0.0), ("None", 0.6), ("Thumb_Up", 1.8), ("None", 2.0)]) == []
+    matcher = ChainMatcher([PALM_THEN_THUMB])
+    assert feed(matcher, [("Open_Palm", 0.0), ("None", 0.6), ("No gesture", 1.0), ("Thumb_Up", 1.4),
+                          ("None", 1.5)]) == ["palm_then_thumb"]
+
+
+def test_other_gesture_in_between_breaks_the_chain():
+    matcher = ChainMatcher([PALM_THEN_THUMB])
+    assert feed(matcher, [("Open_Palm", 0.0), ("Victory", 0.6), ("Thumb_Up", 0.8), ("None", 0.9)]) == []
+
+
+def test_chains_sharing_a_prefix_are_told_apart():
+    matcher = ChainMatcher([PALM_THEN_THUMB, PALM_THEN_FIST])
+    assert feed(matcher, [("Open_Palm", 0.0), ("Closed_Fist", 0.6), ("None", 1.0)]) == ["palm_then_fist"]
+    assert feed(matcher, [("Open_Palm", 2.0), ("Thumb_Up", 2.6), ("None", 2.7)]) == ["palm_then_thumb"]
+
+
+def test_tick_fires_once_while_the_last_step_is_held():
+    matcher = ChainMatcher([PALM_THEN_FIST])
+    assert feed(matcher, [("Open_Palm", 0.0), ("Closed_Fist", 0.6)]) == []
+    assert matcher.tick(int(0.8 * 1e9)) == []  # Held 0.2 s of the 0.3 s needed
+    assert matcher.tick(int(1.0 * 1e9)) == [ChainEvent("palm_then_fist", int(1.0 * 1e9))]
+    assert matcher.tick(int(1.2 * 1e9)) == []
+    # Already reported, ending the segment does not report it again
+    assert feed(matcher, [("None", 1.5)]) == []
+
+
+class FakeMotors:
+    def __init__(self):
+        self.moves = []
+
+    async def move_to(self, pan=None, tilt=None, wait=True):
+        self.moves.append((pan, tilt))
+        return pan, tilt
+
+
+def test_palm_then_fist_sends_the_camera_home():
+    async def main():
+        motors = FakeMotors()
+        behaviour = OpenPalmBehaviour(None, motors, centering=None, cooldown=0, home=(80.0, 100.0))
+        engine = BehaviourEngine(bus=None, behaviours=[behaviour])
+        for name, seconds in [("Open_Palm", 0.0), ("Closed_Fist", 0.7)]:
+            engine.dispatch(gesture(name, seconds))
+        engine.active_task.cancel()  # Centering started on the open palm, never given a hand
+        for chain_event in engine.chains.tick(int(1.3 * 1e9)):
+            engine.arbitrate(chain_event)
+        await engine.active_task
+        return motors.moves
+
+    assert asyncio.run(main()) == [(80.0, 100.0)]
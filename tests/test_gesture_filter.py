@@ -0,0 +1,42 @@
+import pytest
+from palmist_utility.gesture_filter import GestureFilter, NO_GESTURE
+
+
+def feed(gesture_filter, frames):
+    return [gesture_filter.update(gesture, score) for gesture, score in frames]
+
+
+def test_single_noisy_frame_is_ignored():
+    gesture_filter = GestureFilter(window=3, enter_threshold=0.5, min_dwell_frames=2)
+    assert feed(gesture_filter, [("None", 0.0), ("Thumb_Up", 0.9), ("None", 0.0), ("None", 0.0)]) == [None] * 4
+    assert gesture_filter.current == NO_GESTURE
+
+
+def test_gesture_starts_after_dwell_and_ends_under_exit_threshold():
+    gesture_filter = GestureFilter(window=3, enter_threshold=0.5, exit_threshold=0.3, min_dwell_frames=2)
+    changes = feed(gesture_filter, [("Thumb_Up", 0.9)] * 3)
+    assert changes[:2] == [None, None]
+    assert changes[2] == ("Thumb_Up", pytest.approx(0.9))
+    # Hysteresis: one frame missing keeps the vote above the exit threshold
+    assert gesture_filter.update("None", 0.0) is None
+    assert gesture_filter.current == "Thumb_Up"
+    changes = feed(gesture_filter, [("None", 0.0)] * 3)
+    assert (NO_GESTURE, 0.0) in changes
+    assert gesture_filter.current == NO_GESTURE
+
+
+def test_switching_needs_to_beat_the_current_gesture():
+    gesture_filter = GestureFilter(window=3, min_dwell_frames=1)
+    feed(gesture_filter, [("Open_Palm", 0.9)] * 3)
+    assert gesture_filter.current == "Open_Palm"
+    gesture_filter.update("Victory", 0.9)
+    assert gesture_filter.current == "Open_Palm"
+    assert gesture_filter.update("Victory", 0.9) == ("Victory", pytest.approx(0.6))
+
+
+def test_per_gesture_thresholds():
+    gesture_filter = GestureFilter(window=2, enter_threshold=0.5, min_dwell_frames=1,
+                                   thresholds={"Pointing_Up": {"enter": 0.95}})
+    assert feed(gesture_filter, [("Pointing_Up", 0.9)] * 4) == [None] * 4
+    assert gesture_filter.update("Victory", 0.9) is None
+    assert gesture_filter.update("Victory", 0.9) == ("Victory", pytest.approx(0.9))
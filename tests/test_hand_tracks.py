@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+import numpy as np
+from palmist_utility.hand_tracks import LANDMARKS, UNKNOWN_HANDEDNESS, HandIdAssigner, hands_from_result
+
+
+def centroids(*points):
+    return np.array(points, dtype=np.float32).reshape(-1, 2)
+
+
+def test_ids_follow_hands_across_frames():
+    assigner = HandIdAssigner(max_distance=0.15)
+    first = assigner.assign(centroids((0.2, 0.5), (0.8, 0.5)))
+    # Listed in the other order and moved a little, each hand keeps its id
+    second = assigner.assign(centroids((0.75, 0.52), (0.25, 0.48)))
+    assert list(second) == [first[1], first[0]]
+
+
+def test_far_jump_is_a_new_hand():
+    assigner = HandIdAssigner(max_distance=0.15)
+    [first] = assigner.assign(centroids((0.2, 0.5)))
+    [second] = assigner.assign(centroids((0.6, 0.5)))
+    assert second != first
+
+
+def test_closest_pairs_are_matched_first():
+    assigner = HandIdAssigner(max_distance=0.3)
+    a, b = assigner.assign(centroids((0.3, 0.5), (0.5, 0.5)))
+    # The hand at 0.42 is closer to b, even though it is listed first and also within reach of a
+    ids = assigner.assign(centroids((0.42, 0.5), (0.28, 0.5)))
+    assert list(ids) == [b, a]
+
+
+def test_missed_hand_keeps_its_id_for_a_while():
+    assigner = HandIdAssigner(max_distance=0.15, max_missed=2)
+    [hand] = assigner.assign(centroids((0.5, 0.5)))
+    for _ in range(2):
+        assert len(assigner.assign(centroids())) == 0
+    [back] = assigner.assign(centroids((0.52, 0.5)))
+    assert back == hand
+    for _ in range(3):
+        assigner.assign(centroids())
+    [gone] = assigner.assign(centroids((0.52, 0.5)))
+    assert gone != hand
+    assert list(assigner.ids) == [gone]
+
+
+def test_hands_from_result():
+    def category(name, score=0.0):
+        return SimpleNamespace(category_name=name, score=score)
+
+    landmarks = [[SimpleNamespace(x=0.01 * index, y=0.5) for index in range(LANDMARKS)] for _ in range(2)]
+    result = SimpleNamespace(hand_landmarks=landmarks, gestures=[[category("Open_Palm", 0.8)], []],
+                             handedness=[[category("Right")], []])
+    points, gestures, scores, handedness = hands_from_result(result)
+    assert points.shape == (2, LANDMARKS, 2)
+    assert gestures == ["Open_Palm", "None"]
+    assert list(scores) == [np.float32(0.8), 0.0]
+    assert list(handedness) == [1, UNKNOWN_HANDEDNESS]
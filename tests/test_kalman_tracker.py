@@ -0,0 +1,80 @@
+import pytest
+from palmist_utility.kalman_tracker import HandTrackers, KalmanTracker
+
+FRAME_NS = 33_000_000
+
+
+def test_first_measurement_starts_still():
+    tracker = KalmanTracker()
+    assert not tracker.active
+    x, y, vx, vy, sigma = tracker.update(0.4, 0.6, FRAME_NS, frame_id=1)
+    assert (x, y, vx, vy) == (0.4, 0.6, 0.0, 0.0)
+    assert sigma == pytest.approx(0.01)
+    assert tracker.active
+
+
+def test_converges_on_constant_velocity():
+    tracker = KalmanTracker()
+    for frame in range(60):
+        estimate = tracker.update(0.1 + 0.3 * frame * FRAME_NS / 1e9, 0.5, frame * FRAME_NS)
+    assert estimate[2] == pytest.approx(0.3, abs=0.02)
+    assert estimate[3] == pytest.approx(0.0, abs=0.02)
+
+
+def test_predict_extrapolates_without_changing_the_filter():
+    tracker = KalmanTracker()
+    for frame in range(60):
+        tracker.update(0.1 + 0.3 * frame * FRAME_NS / 1e9, 0.5, frame * FRAME_NS)
+    state, timestamp_ns = tracker.state.copy(), tracker.timestamp_ns
+    near = tracker.predict(timestamp_ns + FRAME_NS // 2)
+    far = tracker.predict(timestamp_ns + 10 * FRAME_NS)
+    assert near[0] == pytest.approx(state[0] + 0.3 * FRAME_NS / 2e9, abs=0.005)
+    assert far[4] > near[4]  # Uncertainty grows with the horizon
+    assert (tracker.state == state).all() and tracker.timestamp_ns == timestamp_ns
+
+
+def test_old_measurements_do_not_move_the_state():
+    tracker = KalmanTracker()
+    tracker.update(0.5, 0.5, 2 * FRAME_NS, frame_id=2)
+    assert tracker.update(0.9, 0.9, FRAME_NS, frame_id=1)[:2] == (0.5, 0.5)
+
+
+def test_relocate_keeps_velocity():
+    tracker = KalmanTracker()
+    for frame in range(30):
+        tracker.update(0.1 + 0.3 * frame * FRAME_NS / 1e9, 0.5, frame * FRAME_NS)
+    velocity = tracker.state[2]
+    x, y, vx, _, _ = tracker.relocate(0.7, 0.2, 30 * FRAME_NS)
+    assert (x, y, vx) == (0.7, 0.2, velocity)
+
+
+def test_predict_before_any_measurement():
+    assert KalmanTracker().predict(FRAME_NS) is None
+
+
+def test_each_hand_keeps_its_own_track():
+    trackers = HandTrackers(process_noise=0.5, measurement_noise=0.01)
+    for step in range(1, 11):
+        # Hand 1 moves right, hand 2 stays still
+        trackers.update([1, 2], [(0.1 + 0.05 * step, 0.5), (0.8, 0.5)], step * 100_000_000, frame_id=step)
+    assert trackers.get(1).estimate()[2] == pytest.approx(0.5, abs=0.05)
+    assert trackers.get(2).estimate()[2] == pytest.approx(0.0, abs=0.01)
+    # Measured alone, hand 2 is not mistaken for hand 1 jumping back
+    x, _, vx, _, _ = trackers.update([2], [(0.8, 0.5)], 1_100_000_000, frame_id=11)[0]
+    assert (x, vx) == (pytest.approx(0.8, abs=0.01), pytest.approx(0.0, abs=0.01))
+
+
+def test_camera_moves_relocate_only_the_measured_hands():
+    trackers = HandTrackers()
+    trackers.update([1], [(0.2, 0.2)], 0, move_id=1)
+    trackers.update([1], [(0.3, 0.2)], 100_000_000, move_id=1)
+    velocity = trackers.get(1).estimate()[2]
+    x, _, vx, _, _ = trackers.update([1], [(0.7, 0.2)], 200_000_000, move_id=2)[0]
+    assert x == 0.7 and vx == velocity
+
+
+def test_dropped_hands_are_forgotten():
+    trackers = HandTrackers()
+    trackers.update([1, 2], [(0.2, 0.2), (0.6, 0.6)], 0)
+    trackers.retain([2])
+    assert trackers.get(1) is None and trackers.get(2).active
@@ -0,0 +1,85 @@
+import os
+import pytest
+from esteban_utility import log_index
+from esteban_utility.log_index import LogIndex
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+def write_log(path, count):
+    with open(path, "a") as file:
+        for number in range(count):
+            level = LEVELS[number % len(LEVELS)]
+            file.write(f"2024-05-01 10:{number // 60 % 60:02d}:{number % 60:02d},000 - {level} - "
+                       f"Service{number % 3} - record {number} - with separator\n")
+            if number % 50 == 0:
+                file.write("Traceback (most recent call last):\n  more context\n")
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(log_index, "BLOCK_SIZE", 1024)
+
+
+def messages(records):
+    return [int(record["message"].split()[1]) for record in records]
+
+
+def test_pages_cover_every_record_newest_first(tmp_path, small_blocks):
+    path = tmp_path / "esteban.log"
+    write_log(path, 500)
+    index = LogIndex(str(path))
+    seen, cursor = [], None
+    while True:
+        records, cursor = index.query(limit=37, cursor=cursor)
+        seen += messages(records)
+        if cursor is None:
+            break
+    assert seen == list(range(499, -1, -1))
+    assert len(index.blocks) > 10
+
+
+def test_records_keep_separators_and_continuation_lines(tmp_path, small_blocks):
+    path = tmp_path / "esteban.log"
+    write_log(path, 51)
+    records, _ = LogIndex(str(path)).query(limit=1, cursor=None)
+    assert records[0]["message"] == "record 50 - with separator\nTraceback (most recent call last):\n  more context"
+    assert records[0]["type"] == "WARNING" and records[0]["service"] == "Service2"
+
+
+def test_filters(tmp_path, small_blocks):
+    path = tmp_path / "esteban.log"
+    write_log(path, 500)
+    index = LogIndex(str(path))
+    records, _ = index.query(limit=1000, levels="ERROR,warning")
+    assert {record["type"] for record in records} == {"ERROR", "WARNING"}
+    assert len(records) == 250
+    records, _ = index.query(limit=1000, since="2024-05-01T10:02:00", until="2024-05-01 10:03")
+    assert messages(records) == list(range(179, 119, -1))
+    records, _ = index.query(limit=1000, service="service1")
+    assert all(number % 3 == 1 for number in messages(records))
+
+
+def test_index_grows_with_the_file(tmp_path, small_blocks):
+    path = tmp_path / "esteban.log"
+    write_log(path, 100)
+    index = LogIndex(str(path))
+    index.query(limit=1)
+    with open(path, "a") as file:
+        file.write("2024-05-01 11:00:00,000 - ERROR - Late - record 1000\n")
+        file.write("2024-05-01 11:00:01,000 - ERROR - Late - partial")
+    records, _ = index.query(limit=1)
+    assert messages(records) == [1000]
+
+
+def test_cursor_of_a_rotated_file_is_rejected(tmp_path, small_blocks):
+    path = tmp_path / "esteban.log"
+    write_log(path, 100)
+    index = LogIndex(str(path))
+    _, cursor = index.query(limit=10)
+    os.rename(path, tmp_path / "esteban_old.log")
+    write_log(path, 10)
+    with pytest.raises(ValueError):
+        index.query(limit=10, cursor=cursor)
+    records, _ = index.query(limit=100)
+    assert len(records) == 10
@@ -0,0 +1,79 @@
+import glob
+import gzip
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from esteban_utility.log_pipeline import LogCollector
+
+
+def collector(path, **options):
+    return LogCollector(queue.Queue(), multiprocessing.Value("Q", 0), str(path), console=False, **options)
+
+
+def finish(log_collector):
+    log_collector.file.close()
+    for compressor in log_collector.compressors:
+        compressor.join()
+
+
+def rotated(path):
+    return sorted(glob.glob(str(path).replace(".log", "_*.log.gz")))
+
+
+def record(message):
+    return logging.makeLogRecord({"name": "Test", "levelno": logging.INFO, "levelname": "INFO", "msg": message})
+
+
+def test_rotates_past_max_bytes_and_keeps_the_newest_backups(tmp_path):
+    path = tmp_path / "esteban.log"
+    log_collector = collector(path, max_bytes=100, backup_count=2)
+    log_collector.open()
+    lines = [f"line {number:02d} " + "x" * 60 + "\n" for number in range(5)]
+    for line in lines:
+        log_collector.write(line)
+    finish(log_collector)
+    # Every line fills a file past half of max_bytes, so each write after the first rotates
+    assert path.read_text() == lines[-1]
+    backups = rotated(path)
+    assert len(backups) == 2
+    assert [gzip.open(backup, "rt").read() for backup in backups] == lines[2:4]
+    assert not glob.glob(str(tmp_path / "esteban_*.log"))  # Compressed copies replace the rotated files
+
+
+def test_rotates_after_rotate_interval(tmp_path):
+    path = tmp_path / "esteban.log"
+    log_collector = collector(path, rotate_interval=60)
+    log_collector.open()
+    log_collector.write("old\n")
+    log_collector.write("same file\n")
+    log_collector.opened_at -= 61
+    log_collector.write("new\n")
+    finish(log_collector)
+    assert path.read_text() == "new\n"
+    assert [gzip.open(backup, "rt").read() for backup in rotated(path)] == ["old\nsame file\n"]
+
+
+def test_stale_file_is_rotated_at_startup_and_records_are_batched(tmp_path):
+    path = tmp_path / "esteban.log"
+    path.write_text("yesterday\n")
+    stale = time.time() - 7200
+    os.utime(path, (stale, stale))
+    log_collector = collector(path, rotate_interval=3600)
+    for number in range(3):
+        log_collector.queue.put(record(f"record {number}"))
+    log_collector.queue.put(None)
+    log_collector.run()
+    assert [line.split(" - ", 3)[-1] for line in path.read_text().splitlines()] == \
+        ["record 0", "record 1", "record 2"]
+    assert [gzip.open(backup, "rt").read() for backup in rotated(path)] == ["yesterday\n"]
+
+
+def test_reports_dropped_records(tmp_path):
+    path = tmp_path / "esteban.log"
+    log_collector = collector(path)
+    log_collector.dropped.value = 4
+    log_collector.queue.put(None)
+    log_collector.run()
+    assert "4 log record(s) dropped" in path.read_text()
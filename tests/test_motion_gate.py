@@ -0,0 +1,47 @@
+import numpy as np
+from palmist_utility.motion_gate import MotionGate
+
+
+def still(value=100):
+    return np.full((64, 64), value, dtype=np.uint8)
+
+
+def moved():
+    frame = still()
+    frame[:32, :32] = 200
+    return frame
+
+
+def gate():
+    return MotionGate(downscale=4, pixel_threshold=25, motion_threshold=0.05, hand_hold=2.0, heartbeat_interval=5.0)
+
+
+def test_still_scene_is_skipped_until_the_heartbeat():
+    motion_gate = gate()
+    assert motion_gate.should_infer(still(), now=0.0)  # Nothing to compare against yet
+    assert not motion_gate.should_infer(still(), now=1.0)
+    assert not motion_gate.should_infer(still(110), now=2.0)  # Under the pixel threshold
+    assert motion_gate.should_infer(still(), now=5.0)
+    assert motion_gate.stats()["frames_skipped"] == 2
+
+
+def test_motion_opens_the_gate():
+    motion_gate = gate()
+    motion_gate.should_infer(still(), now=0.0)
+    assert motion_gate.should_infer(moved(), now=0.1)
+    assert motion_gate.last_motion == 0.25
+    assert not motion_gate.should_infer(moved(), now=0.2)
+
+
+def test_gate_stays_open_while_a_hand_was_seen_recently():
+    motion_gate = gate()
+    motion_gate.should_infer(still(), now=0.0)
+    motion_gate.hand_seen(now=0.0)
+    assert motion_gate.should_infer(still(), now=1.9)
+    assert not motion_gate.should_infer(still(), now=2.1)
+
+
+def test_resolution_change_counts_as_motion():
+    motion_gate = gate()
+    motion_gate.should_infer(still(), now=0.0)
+    assert motion_gate.should_infer(np.full((32, 32), 100, dtype=np.uint8), now=0.1)
@@ -0,0 +1,82 @@
+import threading
+import pytest
+from dummy_utility.motion_planner import Axis, MotionPlanner
+
+DT = 0.02
+MAX_VELOCITY = 90.0
+MAX_ACCELERATION = 360.0
+
+
+def run(axis, steps, retarget=None):
+    """Step an axis, returning the velocity it actually moved at during each step.
+
+    retarget maps a step index to a new target set before that step.
+    """
+    positions = [axis.position]
+    initial = axis.velocity
+    for index in range(steps):
+        if retarget and index in retarget:
+            axis.target = retarget[index]
+        axis.step(DT, MAX_VELOCITY, MAX_ACCELERATION)
+        positions.append(axis.position)
+    return [initial] + [(after - before) / DT for before, after in zip(positions, positions[1:])] + [0.0]
+
+
+def assert_within_limits(velocities):
+    assert max(abs(velocity) for velocity in velocities) <= MAX_VELOCITY + 1e-9
+    changes = [abs(after - before) for before, after in zip(velocities, velocities[1:])]
+    assert max(changes) <= MAX_ACCELERATION * DT + 1e-6
+
+
+@pytest.mark.parametrize("target", [90.01, 95.0, 50.3, 180.0, 0.0])
+def test_reaches_the_target_within_the_limits(target):
+    axis = Axis(90, 0, 180)
+    axis.target = target
+    velocities = run(axis, 300)
+    assert axis.idle() and axis.position == target
+    assert_within_limits(velocities)
+
+
+def test_retarget_at_cruise_speed_brakes_through_the_target():
+    axis = Axis(0, 0, 180)
+    axis.target = 180
+    run(axis, 60)
+    passed = axis.position
+    assert axis.velocity == pytest.approx(MAX_VELOCITY)
+    # The new target is just behind the axis, it cannot stop on it and has to come back
+    velocities = run(axis, 300, retarget={0: passed - 1.0})
+    assert axis.idle() and axis.position == passed - 1.0
+    assert max(velocities) > 0 and min(velocities) < 0
+    assert_within_limits(velocities)
+
+
+def test_velocity_mode_brakes_before_the_end_of_travel():
+    axis = Axis(150, 0, 180)
+    axis.commanded_velocity = MAX_VELOCITY
+    velocities = run(axis, 100)
+    assert axis.position <= 180 and axis.velocity == pytest.approx(0.0, abs=1e-6)
+    assert_within_limits(velocities)
+
+
+def test_planner_reports_moving_and_settled():
+    states = []
+    settled = threading.Event()
+
+    def on_state(moving, pan, tilt):
+        states.append((moving, round(pan, 3), round(tilt, 3)))
+        if not moving:
+            settled.set()
+
+    writes = []
+    planner = MotionPlanner(lambda pan, tilt: writes.append((pan, tilt)), max_velocity=900.0,
+                            max_acceleration=9000.0, settle_time=0.05, on_state=on_state)
+    planner.start()
+    try:
+        assert planner.set_target(pan=100.0, tilt=200.0) == (100.0, 180.0)
+        assert settled.wait(2.0)
+    finally:
+        planner.stop()
+    assert states[0][0] is True
+    assert states[-1] == (False, 100.0, 180.0)
+    assert writes[-1] == (100.0, 180.0)
+    assert planner.pose()["settled"]
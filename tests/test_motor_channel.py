@@ -0,0 +1,99 @@
+import asyncio
+import math
+import time
+import pytest
+from dummy_utility.simulated_servos import SimulatedServoController
+from motor_channel import (CHANNEL_VERSION, COMMAND, OP_ABSOLUTE, OP_RELATIVE, REPLY, STATUS_ERROR, STATUS_OK,
+                           MotorChannelClient, MotorChannelServer)
+
+
+@pytest.fixture
+def controller():
+    controller = SimulatedServoController(max_velocity=900.0, max_acceleration=9000.0, settle_time=0.0)
+    yield controller
+    controller.stop()
+
+
+def run_channel(controller, path, scenario):
+    async def main():
+        server = MotorChannelServer(controller, path)
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+async def read_replies(reader, count):
+    return [REPLY.unpack(await asyncio.wait_for(reader.readexactly(REPLY.size), 1.0)) for _ in range(count)]
+
+
+def test_queued_commands_merge_into_one_target(controller, tmp_path):
+    async def scenario(server):
+        reader, writer = await asyncio.open_unix_connection(server.path)
+        # Everything sent in one write is read before the applier runs, so it becomes one move
+        writer.write(COMMAND.pack(CHANNEL_VERSION, OP_RELATIVE, 1, 10.0, 0.0)
+                     + COMMAND.pack(CHANNEL_VERSION, OP_RELATIVE, 2, 5.0, -5.0)
+                     + COMMAND.pack(CHANNEL_VERSION, OP_ABSOLUTE, 3, math.nan, 60.0))
+        replies = await read_replies(reader, 3)
+        writer.close()
+        return replies, server.stats()
+
+    replies, stats = run_channel(controller, str(tmp_path / "motor.sock"), scenario)
+    assert [reply[:3] for reply in replies] == [(CHANNEL_VERSION, STATUS_OK, seq) for seq in (1, 2, 3)]
+    assert {reply[3:] for reply in replies} == {(105.0, 60.0)}
+    assert stats == {"commands_received": 3, "moves_applied": 1}
+    assert controller.targets == [(105.0, 60.0)]
+
+
+def test_bad_frames_are_rejected(controller, tmp_path):
+    async def scenario(server):
+        reader, writer = await asyncio.open_unix_connection(server.path)
+        writer.write(COMMAND.pack(CHANNEL_VERSION + 1, OP_RELATIVE, 7, 1.0, 1.0)
+                     + COMMAND.pack(CHANNEL_VERSION, 99, 8, 1.0, 1.0))
+        replies = await read_replies(reader, 2)
+        writer.close()
+        return replies
+
+    replies = run_channel(controller, str(tmp_path / "motor.sock"), scenario)
+    assert [reply[1:3] for reply in replies] == [(STATUS_ERROR, 7), (STATUS_ERROR, 8)]
+    assert controller.targets == []
+
+
+def test_client_gets_the_applied_angles_and_servos_follow(controller, tmp_path):
+    async def scenario(server):
+        client = MotorChannelClient(server.path)
+        applied = [await client.move(pan=30.0, tilt=-20.0), await client.move_to(tilt=100.0)]
+        assert await client.move(pan=1.0, wait=False) is None
+        applied.append(await client.move(pan=1.0))
+        await client.close()
+        return applied
+
+    applied = run_channel(controller, str(tmp_path / "motor.sock"), scenario)
+    assert applied == [(120.0, 70.0), (120.0, 100.0), (122.0, 100.0)]
+    deadline = time.monotonic() + 2.0
+    while controller.pose()["pan"] != 122.0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert controller.writes[-1] == (122.0, 100.0)
+
+
+def test_failed_moves_reach_the_client_as_errors(tmp_path):
+    class BrokenController(SimulatedServoController):
+        def move_to(self, horiz_angle, vert_angle):
+            raise RuntimeError("servo unplugged")
+
+    controller = BrokenController()
+
+    async def scenario(server):
+        client = MotorChannelClient(server.path)
+        try:
+            with pytest.raises(RuntimeError, match="rejected"):
+                await client.move(pan=5.0)
+        finally:
+            await client.close()
+
+    try:
+        run_channel(controller, str(tmp_path / "motor.sock"), scenario)
+    finally:
+        controller.stop()
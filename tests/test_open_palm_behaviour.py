@@ -0,0 +1,48 @@
+import numpy as np
+from brainy_utility.open_palm_behaviour import OpenPalmBehaviour
+from eventbus import HAND_DTYPE, HandPositionEvent, HandsEvent, gesture_code
+
+
+def hands_event(frame_id, *hands):
+    """HandsEvent from (cx, cy, gesture) rows, each hand a 0.2 wide box around its centroid."""
+    rows = np.zeros(len(hands), dtype=HAND_DTYPE)
+    for row, (cx, cy, gesture) in zip(rows, hands):
+        row["cx"], row["cy"] = cx, cy
+        row["x0"], row["y0"], row["x1"], row["y1"] = cx - 0.1, cy - 0.1, cx + 0.1, cy + 0.1
+        row["gesture"] = gesture_code(gesture)
+        row["score"] = 0.9
+    return HandsEvent(frame_id, frame_id * 1000, rows)
+
+
+def position(frame_id, x, y, predicted=False):
+    return HandPositionEvent(frame_id, frame_id * 1000 + (500 if predicted else 0), x, y, True, predicted=predicted)
+
+
+def behaviour():
+    return OpenPalmBehaviour(None, motors=None, centering=None)
+
+
+def test_primary_hand_is_followed_when_it_shows_the_palm():
+    palm = behaviour()
+    palm.observe(hands_event(1, (0.3, 0.5, "Open_Palm"), (0.7, 0.5, "None")))
+    measured = position(1, 0.32, 0.55)
+    assert palm.palm_position(measured) is measured
+    predicted = position(1, 0.33, 0.55, predicted=True)
+    assert palm.palm_position(predicted) is predicted
+
+
+def test_other_hand_showing_the_palm_is_followed():
+    palm = behaviour()
+    palm.observe(hands_event(1, (0.3, 0.5, "Open_Palm"), (0.7, 0.5, "None")))
+    followed = palm.palm_position(position(1, 0.7, 0.5))
+    assert (followed.x, followed.y) == (np.float32(0.3), np.float32(0.5))
+    assert not followed.predicted
+    # Predictions extrapolate the primary hand, not the one showing the palm
+    assert palm.palm_position(position(1, 0.71, 0.5, predicted=True)) is None
+
+
+def test_without_hands_of_the_same_frame_the_primary_hand_is_kept():
+    palm = behaviour()
+    palm.observe(hands_event(1, (0.3, 0.5, "Open_Palm")))
+    measured = position(2, 0.7, 0.5)
+    assert palm.palm_position(measured) is measured
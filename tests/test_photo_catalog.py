@@ -0,0 +1,119 @@
+import os
+import time
+import cv2
+import numpy as np
+import pytest
+from photo_catalog import CatalogWatcher, DirectoryEvents, PhotoCatalog
+
+
+@pytest.fixture
+def photos(tmp_path):
+    photos_dir = tmp_path / "photos"
+    photos_dir.mkdir()
+    return photos_dir
+
+
+def save_photo(photos_dir, name, mtime, size=(40, 30)):
+    path = str(photos_dir / name)
+    cv2.imwrite(path, np.zeros((size[1], size[0], 3), dtype=np.uint8))
+    os.utime(path, ns=(mtime, mtime))
+    return path
+
+
+def test_add_reads_size_and_dimensions(photos, tmp_path):
+    catalog = PhotoCatalog(str(tmp_path / "catalog.db"), str(photos))
+    catalog.add(save_photo(photos, "a.jpg", 1_000, (64, 48)), source="gesture", pan=90.0, tilt=80.0)
+    catalog.add(save_photo(photos, "b.png", 2_000, (32, 16)))
+    photo = catalog.get("a.jpg")
+    assert (photo["taken_ns"], photo["width"], photo["height"], photo["source"], photo["pan"]) == \
+        (1_000, 64, 48, "gesture", 90.0)
+    assert (catalog.get("b.png")["width"], catalog.get("b.png")["height"]) == (32, 16)
+
+
+def test_pages_newest_first_with_filters(photos, tmp_path):
+    catalog = PhotoCatalog(str(tmp_path / "catalog.db"), str(photos))
+    for number in range(7):
+        catalog.add(save_photo(photos, f"p{number}.jpg", number * 1_000), source="gesture" if number % 2 else "manual")
+    names, cursor = [], None
+    while True:
+        page, cursor = catalog.page(limit=3, cursor=cursor)
+        names += [photo["name"] for photo in page]
+        if cursor is None:
+            break
+    assert names == [f"p{number}.jpg" for number in range(6, -1, -1)]
+    page, _ = catalog.page(limit=10, source="gesture", since_ns=2_000)
+    assert [photo["name"] for photo in page] == ["p5.jpg", "p3.jpg"]
+    assert catalog.sources() == ["gesture", "manual"]
+
+
+def test_sync_reconciles_files_changed_by_hand(photos, tmp_path):
+    catalog = PhotoCatalog(str(tmp_path / "catalog.db"), str(photos))
+    catalog.add(save_photo(photos, "kept.jpg", 1_000), source="gesture")
+    catalog.add(save_photo(photos, "deleted.jpg", 2_000))
+    os.remove(photos / "deleted.jpg")
+    save_photo(photos, "copied.jpg", 3_000)
+    (photos / "notes.txt").write_text("not a photo")
+    assert catalog.sync() == ({"copied.jpg"}, {"deleted.jpg"})
+    assert catalog.get("kept.jpg")["source"] == "gesture"
+    assert catalog.sync() == (set(), set())
+    assert catalog.remove("kept.jpg") and not catalog.remove("kept.jpg")
+
+
+def test_add_missing_keeps_the_existing_entry(photos, tmp_path):
+    catalog = PhotoCatalog(str(tmp_path / "catalog.db"), str(photos))
+    path = save_photo(photos, "a.jpg", 1_000)
+    catalog.add(path, source="gesture")
+    assert not catalog.add_missing(path)
+    assert catalog.get("a.jpg")["source"] == "gesture"
+    assert catalog.add_missing(save_photo(photos, "b.jpg", 2_000))
+    assert catalog.get("b.jpg")["source"] == "unknown"
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def watch(catalog, **kwargs):
+    changes = []
+    watcher = CatalogWatcher(catalog, interval=3600.0, on_change=lambda added, removed: changes.append((added, removed)),
+                             **kwargs)
+    watcher.start()
+    return watcher, changes
+
+
+def test_watcher_picks_up_photos_added_and_removed_by_hand(photos, tmp_path, monkeypatch):
+    catalog = PhotoCatalog(str(tmp_path / "catalog.db"), str(photos))
+    save_photo(photos, "existing.jpg", 1_000)
+    syncs = []
+    sync = catalog.sync
+    monkeypatch.setattr(catalog, "sync", lambda: syncs.append(1) or sync())
+    watcher, changes = watch(catalog)
+    try:
+        assert wait_until(lambda: changes == [({"existing.jpg"}, set())])
+        save_photo(photos, "copied.jpg", 2_000)
+        (photos / "notes.txt").write_text("not a photo")
+        assert wait_until(lambda: catalog.get("copied.jpg") is not None)
+        os.remove(photos / "existing.jpg")
+        assert wait_until(lambda: catalog.get("existing.jpg") is None)
+    finally:
+        watcher.stop()
+        watcher.thread.join(timeout=5)
+    assert ({"copied.jpg"}, set()) in changes and (set(), {"existing.jpg"}) in changes
+    # Only the startup pass listed the whole directory
+    assert len(syncs) == 1
+
+
+def test_watcher_polls_the_directory_without_inotify(photos, tmp_path, monkeypatch):
+    monkeypatch.setattr(DirectoryEvents, "open", classmethod(lambda cls, path: None))
+    catalog = PhotoCatalog(str(tmp_path / "catalog.db"), str(photos))
+    watcher, changes = watch(catalog, poll_interval=0.05)
+    try:
+        time.sleep(0.1)
+        save_photo(photos, "copied.jpg", 2_000)
+        assert wait_until(lambda: changes == [({"copied.jpg"}, set())])
+    finally:
+        watcher.stop()
+        watcher.thread.join(timeout=5)
@@ -0,0 +1,56 @@
+import pytest
+from brainy_utility.pid import PID
+
+
+def test_proportional_output():
+    pid = PID(kp=0.5)
+    assert pid.update(10.0, 0.0) == pytest.approx(5.0)
+
+
+def test_deadband_outputs_nothing():
+    pid = PID(kp=1.0, ki=1.0, deadband=1.0)
+    assert pid.update(0.5, 0.0) == 0.0
+    assert pid.update(-1.0, 0.1) == 0.0
+    assert pid.integral == 0.0
+
+
+def test_repeated_or_out_of_order_timestamps_are_ignored():
+    pid = PID(kp=1.0)
+    pid.update(5.0, 1.0)
+    assert pid.update(5.0, 1.0) == 0.0
+    assert pid.update(5.0, 0.5) == 0.0
+    assert pid.last_time == 1.0
+
+
+def test_integral_accumulates_on_timestamps():
+    pid = PID(kp=0.0, ki=1.0)
+    pid.update(2.0, 0.0)
+    pid.update(2.0, 0.5)
+    assert pid.integral == pytest.approx(1.0)
+    assert pid.update(2.0, 1.0) == pytest.approx(1.0)
+
+
+def test_output_limit_stops_windup():
+    pid = PID(kp=1.0, ki=1.0, output_limit=5.0)
+    for step in range(50):
+        assert pid.update(20.0, step * 0.1) == 5.0
+    assert pid.integral == 0.0
+    # Once the error flips, the output follows at once instead of unwinding a stored integral
+    assert pid.update(-2.0, 5.1) < 0
+
+
+def test_integral_limit():
+    pid = PID(kp=0.0, ki=1.0, integral_limit=3.0)
+    for step in range(20):
+        pid.update(2.0, step * 1.0)
+    assert pid.integral == 3.0
+
+
+def test_replay_is_deterministic():
+    errors = [(12.0, 0.0), (9.0, 0.033), (5.5, 0.066), (2.0, 0.1), (-0.5, 0.133), (-1.5, 0.166)]
+
+    def replay():
+        pid = PID(kp=0.6, ki=0.1, kd=0.05, deadband=1.0, output_limit=15.0, integral_limit=10.0)
+        return [pid.update(error, timestamp) for error, timestamp in errors]
+
+    assert replay() == replay()
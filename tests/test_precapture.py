@@ -0,0 +1,33 @@
+import asyncio
+from camerabot_utility.precapture import PreCaptureBuffer
+
+MS = 1_000_000
+
+
+def test_bounded_by_frames_and_bytes():
+    buffer = PreCaptureBuffer(max_frames=3, max_bytes=10)
+    for number in range(5):
+        buffer.add(number * MS, b"x" * 3)
+    assert [timestamp for timestamp, _ in buffer.window(0, 10 * MS)] == [2 * MS, 3 * MS, 4 * MS]
+    buffer.add(5 * MS, b"x" * 8)
+    assert buffer.stats()["frames"] == 1 and buffer.stats()["bytes"] == 8
+
+
+def test_best_frame_around_the_gesture():
+    buffer = PreCaptureBuffer()
+    for number, size in enumerate((50, 10, 30, 20, 90)):
+        buffer.add(number * 100 * MS, b"x" * size)
+    # The gesture frame's sensor timestamp selects the frames, their JPEG size picks the sharpest
+    assert buffer.best(200 * MS, 100 * MS) == (200 * MS, b"x" * 30)
+    assert buffer.best(2000 * MS, 100 * MS) is None
+
+
+def test_wait_for_frames_after_the_gesture():
+    buffer = PreCaptureBuffer()
+    buffer.add(100 * MS, b"x")
+
+    async def scenario():
+        asyncio.get_running_loop().call_later(0.05, buffer.add, 300 * MS, b"y")
+        return await buffer.wait_for(250 * MS, timeout=1.0), await buffer.wait_for(900 * MS, timeout=0.1)
+
+    assert asyncio.run(scenario()) == (True, False)
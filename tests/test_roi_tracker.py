@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+import pytest
+from palmist_utility.roi_tracker import RoiTracker
+
+HEIGHT, WIDTH = 120, 160
+
+
+def test_full_frame_until_a_hand_is_tracked():
+    tracker = RoiTracker()
+    assert tracker.select((HEIGHT, WIDTH)) is None
+    tracker.update(np.array([[0.5, 0.5], [0.6, 0.6]]), (HEIGHT, WIDTH))
+    assert tracker.select((HEIGHT, WIDTH)) is not None
+    tracker.lost()
+    assert tracker.select((HEIGHT, WIDTH)) is None
+
+
+def test_roi_is_square_even_and_inside_the_frame():
+    tracker = RoiTracker(padding=0.5, min_size=0.2)
+    # A hand against the right edge, the square is shifted back inside
+    tracker.update(np.array([[0.9, 0.4], [0.99, 0.55]]), (HEIGHT, WIDTH))
+    x0, y0, x1, y1 = tracker.select((HEIGHT, WIDTH))
+    assert x1 - x0 == y1 - y0
+    assert 0 <= x0 and x1 <= WIDTH and 0 <= y0 and y1 <= HEIGHT
+    assert x0 % 2 == y0 % 2 == (x1 - x0) % 2 == 0
+    assert x1 == WIDTH or x1 == WIDTH - 1
+
+
+def test_redetects_on_the_full_frame_periodically():
+    tracker = RoiTracker(redetect_interval=3)
+    tracker.update(np.array([[0.4, 0.4], [0.5, 0.5]]), (HEIGHT, WIDTH))
+    selected = [tracker.select((HEIGHT, WIDTH)) for _ in range(8)]
+    assert [rect is None for rect in selected] == [False, False, False, True, False, False, False, True]
+
+
+def test_landmarks_map_back_to_the_frame():
+    rect = (40, 20, 100, 80)
+    points = np.array([[0.0, 0.0], [1.0, 1.0], [0.5, 0.25]])
+    mapped = RoiTracker.to_frame(points, rect, (HEIGHT, WIDTH))
+    assert mapped == pytest.approx(np.array([[40 / WIDTH, 20 / HEIGHT], [100 / WIDTH, 80 / HEIGHT],
+                                             [70 / WIDTH, 35 / HEIGHT]]))
+    assert RoiTracker.to_frame(points, None, (HEIGHT, WIDTH)) is points
+
+
+def test_crop_converts_only_the_rect_of_an_i420_frame():
+    generator = np.random.default_rng(3)
+    bgr = cv2.resize(generator.integers(0, 256, (HEIGHT // 8, WIDTH // 8, 3), dtype=np.uint8), (WIDTH, HEIGHT))
+    i420 = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+    tracker = RoiTracker(input_size=32)
+    rect = (40, 20, 104, 84)
+    crop = tracker.crop(i420, rect)
+    assert crop.shape == (32, 32, 3)
+    x0, y0, x1, y1 = rect
+    expected = cv2.resize(cv2.cvtColor(i420, cv2.COLOR_YUV2RGB_I420)[y0:y1, x0:x1], (32, 32),
+                          interpolation=cv2.INTER_AREA)
+    assert np.abs(crop.astype(int) - expected).max() <= 2
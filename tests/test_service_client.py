@@ -0,0 +1,93 @@
+import httpx
+import pytest
+import service_client
+from service_client import CircuitBreaker, CircuitOpenError, ServiceClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(service_client.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0)
+    for _ in range(2):
+        breaker.failure()
+    assert breaker.state == "closed"
+    breaker.success()
+    for _ in range(3):
+        breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0)
+    breaker.failure()
+    clock.now += 10.0
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    clock.now += 10.0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def make_client(handler, **options):
+    client = ServiceClient("Test", "http://test", backoff=0.0, **options)
+    client.sync_client = httpx.Client(base_url="http://test", transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_only_idempotent_requests_are_retried_on_server_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(503)
+
+    client = make_client(handler, retries=2, failure_threshold=100)
+    assert client.get("/status").status_code == 503
+    assert client.post("/take_photo").status_code == 503
+    assert calls == ["GET", "GET", "GET", "POST"]
+
+
+def test_connect_errors_are_retried_for_any_method():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200)
+
+    assert make_client(handler, retries=2).post("/take_photo").status_code == 200
+    assert calls == ["POST", "POST"]
+
+
+def test_open_circuit_fails_fast(clock):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(500)
+
+    client = make_client(handler, retries=0, failure_threshold=2)
+    client.get("/a")
+    client.get("/a")
+    with pytest.raises(CircuitOpenError):
+        client.get("/a")
+    assert len(calls) == 2
+    assert client.stats()["calls"]["GET /a"]["errors"] == 2
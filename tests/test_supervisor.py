@@ -0,0 +1,111 @@
+import os
+import signal
+import pytest
+from esteban_utility import supervisor as supervisor_module
+from esteban_utility.supervisor import Service, Supervisor, exit_reason
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+class ExitedProcess:
+    pid = 4242
+
+    def __init__(self, exitcode):
+        self.exitcode = exitcode
+
+    def join(self, timeout=None):
+        pass
+
+    def is_alive(self):
+        return False
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(supervisor_module, "time", clock)
+    return clock
+
+
+def services(dependencies):
+    return [Service(name, lambda: None, depends_on) for name, depends_on in dependencies.items()]
+
+
+def test_dependencies_start_first():
+    order = Supervisor(services({"Brainy": ("Palmist", "Dummy"), "Palmist": ("CameraBot",), "Dummy": ("Redis",),
+                                 "CameraBot": ("Redis",), "Redis": ()})).order
+    names = [service.name for service in order]
+    assert names == ["Redis", "CameraBot", "Palmist", "Dummy", "Brainy"]
+
+
+def test_unknown_dependency_and_cycles_are_rejected():
+    with pytest.raises(ValueError, match="Unknown dependency Redis of CameraBot"):
+        Supervisor(services({"CameraBot": ("Redis",)}))
+    with pytest.raises(ValueError, match="Dependency cycle: A -> B -> C -> A"):
+        Supervisor(services({"A": ("B",), "B": ("C",), "C": ("A",)}))
+
+
+def crash(supervisor, service, clock, uptime, exitcode=1):
+    """Run the service for uptime seconds then let it exit, returning the restart delay."""
+    service.process = ExitedProcess(exitcode)
+    service.started_at = clock.now
+    clock.now += uptime
+    supervisor.reap(service)
+    return service.restart_at - clock.now
+
+
+def test_repeated_crashes_back_off_exponentially_up_to_the_cap(clock):
+    supervisor = Supervisor(services({"Dummy": ()}), backoff_initial=0.5, backoff_max=4.0, stable_after=30.0)
+    dummy = supervisor.services["Dummy"]
+    delays = [crash(supervisor, dummy, clock, 1.0) for _ in range(7)]
+    assert delays == [0.0, 0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+    assert (dummy.crashes, dummy.restarts, dummy.last_exit) == (7, 7, "exited with code 1")
+
+
+def test_a_stable_run_resets_the_backoff(clock):
+    supervisor = Supervisor(services({"Dummy": ()}), backoff_initial=0.5, stable_after=30.0)
+    dummy = supervisor.services["Dummy"]
+    assert [crash(supervisor, dummy, clock, 1.0) for _ in range(3)] == [0.0, 0.5, 1.0]
+    assert crash(supervisor, dummy, clock, 30.0) == 0.0
+    assert dummy.crashes == 1
+    assert crash(supervisor, dummy, clock, 1.0) == 0.5
+
+
+def test_requested_restart_does_not_back_off(clock):
+    supervisor = Supervisor(services({"Dummy": ()}), backoff_initial=0.5)
+    dummy = supervisor.services["Dummy"]
+    for _ in range(3):
+        crash(supervisor, dummy, clock, 1.0)
+    dummy.process = ExitedProcess(None)
+    dummy.process.terminate = lambda: None
+    supervisor.restart("Dummy")
+    assert dummy.kill_reason == "restart requested"
+    assert crash(supervisor, dummy, clock, 1.0, exitcode=-signal.SIGTERM) == 0.0
+    assert dummy.last_exit == "restart requested"
+    with pytest.raises(KeyError):
+        supervisor.restart("Redis")
+
+
+def test_exit_reasons():
+    assert exit_reason(None) is None
+    assert exit_reason(3) == "exited with code 3"
+    assert exit_reason(-signal.SIGKILL) == "killed by SIGKILL"
+
+
+def test_reaps_a_real_process():
+    supervisor = Supervisor([Service("Crasher", lambda: os._exit(3))])
+    crasher = supervisor.services["Crasher"]
+    supervisor.spawn(crasher)
+    crasher.process.join(5)
+    supervisor.reap(crasher)
+    assert crasher.process is None and crasher.last_exit == "exited with code 3"
+    assert crasher.to_dict()["state"] == "waiting"
@@ -0,0 +1,87 @@
+import threading
+import time
+import pytest
+from dummy_utility.tone_sequencer import ToneSequencer
+
+
+class RecordingBuzzer:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.first_tone = threading.Event()
+
+    def tone_on(self, frequency):
+        with self.lock:
+            self.calls.append(frequency)
+        self.first_tone.set()
+
+    def tone_off(self):
+        with self.lock:
+            self.calls.append(0)
+
+    def tones(self):
+        with self.lock:
+            return [call for call in self.calls if call]
+
+
+PATTERNS = {"short": [(100, 0.01), (0, 0.01), (200, 0.01)], "long": [(300, 5.0), (400, 5.0)],
+            "beep": [(500, 0.01)]}
+
+
+@pytest.fixture
+def buzzer():
+    return RecordingBuzzer()
+
+
+@pytest.fixture
+def sequencer(buzzer):
+    sequencer = ToneSequencer(buzzer, PATTERNS, max_queued=2)
+    yield sequencer
+    sequencer.close()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_patterns_play_in_order_and_end_silent(sequencer, buzzer):
+    assert sequencer.play("short") and sequencer.play("beep")
+    assert wait_until(lambda: sequencer.stats()["played"] == 2)
+    assert buzzer.tones() == [100, 200, 500]
+    assert buzzer.calls[-1] == 0
+
+
+def test_unknown_pattern_is_refused(sequencer):
+    assert not sequencer.play("fanfare")
+
+
+def test_full_queue_refuses_and_counts_drops(sequencer, buzzer):
+    assert sequencer.play("long")
+    assert buzzer.first_tone.wait(2.0)
+    assert sequencer.play("beep") and sequencer.play("beep")
+    assert not sequencer.play("beep")
+    assert sequencer.stats()["dropped"] == 1
+
+
+def test_interrupt_cuts_the_current_pattern_and_drops_the_queue(sequencer, buzzer):
+    sequencer.play("long")
+    assert buzzer.first_tone.wait(2.0)
+    sequencer.play("short")
+    start = time.monotonic()
+    assert sequencer.play("beep", interrupt=True)
+    assert wait_until(lambda: sequencer.stats()["played"] == 2)
+    assert time.monotonic() - start < 1.0
+    # The second note of "long" and the queued "short" never play
+    assert buzzer.tones() == [300, 500]
+
+
+def test_stop_silences_the_buzzer(sequencer, buzzer):
+    sequencer.play("long")
+    assert buzzer.first_tone.wait(2.0)
+    sequencer.stop()
+    assert wait_until(lambda: sequencer.stats()["playing"] is None)
+    assert buzzer.calls[-1] == 0
+    assert buzzer.tones() == [300]
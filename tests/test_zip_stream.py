@@ -0,0 +1,62 @@
+import io
+import os
+import random
+import zipfile
+import pytest
+from showbot_utility.zip_stream import CrcCache, ZipArchive, ZipEntry
+
+
+@pytest.fixture
+def entries(tmp_path):
+    generator = random.Random(7)
+    entries = []
+    for number, size in enumerate((0, 1, 1000, 200_000)):
+        path = tmp_path / f"photo_{number}.jpg"
+        path.write_bytes(generator.randbytes(size))
+        stat = os.stat(path)
+        entries.append(ZipEntry(path.name, str(path), stat.st_size, stat.st_mtime_ns))
+    return entries
+
+
+def test_archive_is_a_valid_zip(entries):
+    archive = ZipArchive(entries, CrcCache())
+    data = b"".join(archive.iter_range())
+    assert len(data) == archive.size
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        for entry in entries:
+            with open(entry.path, "rb") as file:
+                assert zip_file.read(entry.name) == file.read()
+
+
+def test_ranges_match_the_full_archive(entries):
+    full = b"".join(ZipArchive(entries, CrcCache()).iter_range())
+    generator = random.Random(3)
+    for _ in range(100):
+        # A fresh cache each time, so CRCs of files the range starts after are read from disk
+        archive = ZipArchive(entries, CrcCache())
+        start = generator.randrange(archive.size)
+        end = generator.randrange(start, archive.size)
+        assert b"".join(archive.iter_range(start, end)) == full[start:end + 1]
+
+
+def test_streaming_fills_the_crc_cache(entries):
+    crcs = CrcCache()
+    b"".join(ZipArchive(entries, crcs).iter_range())
+    assert all(crcs.get(entry) is not None for entry in entries)
+
+
+def test_etag_follows_the_entries(entries):
+    etag = ZipArchive(entries, CrcCache()).etag()
+    assert ZipArchive(entries, CrcCache()).etag() == etag
+    changed = entries[:-1] + [entries[-1]._replace(mtime_ns=entries[-1].mtime_ns + 1)]
+    assert ZipArchive(changed, CrcCache()).etag() != etag
+
+
+def test_crc_cache_evicts_least_recently_used():
+    crcs = CrcCache(max_entries=2)
+    crcs.put("a", 1)
+    crcs.put("b", 2)
+    crcs.get("a")
+    crcs.put("c", 3)
+    assert crcs.get("b") is None and crcs.get("a") == 1 and crcs.get("c") == 3